@@ -1,144 +1,174 @@
-from flask import Flask, jsonify, request
-from sklearn.preprocessing import MinMaxScaler
+from functools import wraps
 
-from py.getstock import StockData  # 導入取得股價資訊的類別程式
-from datetime import datetime, timedelta
-from tensorflow.keras.models import load_model
-import pandas as pd
-import numpy as np
+from flask import Flask, Response, jsonify, make_response, request
 
+from py import history_format  # /gethistory 的回應格式與分頁
+from py import http_cache  # ETag 與 Cache-Control
+from py import resampling  # 週/月線彙整與降採樣
+from py import stock_service as service  # 股票 API 共用的服務層
 
-# 創建時間序列數據集
-def create_dataset(data, time_steps=30, future_days=5):
-    X, y = [], []
-    for i in range(len(data) - time_steps - future_days + 1):
-        X.append(data[i:(i + time_steps), :-1])
-        y.append(data[(i + time_steps):(i + time_steps + future_days), -1])  # 未來五天的收盤價
-    return np.array(X), np.array(y)
 
 app = Flask(__name__)
 
+# 啟動時載入並暖機模型，之後所有請求共用；模型檔更新時自動熱替換
+# 以 gunicorn 預先載入模式啟動時只在主行程載入一次，由 fork 出的 worker 共用
+service.load_models()
+
+
+def cached(policy):
+    # policy(路由參數..., request.args) 回傳 (ETag 或 None, Cache-Control)，ETag 不需要先算出回應；
+    # If-None-Match 相符時直接回 304，不重新計算。沒有事先的 ETag 時以回應內容計算，仍可省下傳輸
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            etag, cache_control = policy(*kwargs.values(), request.args)
+            if http_cache.is_not_modified(request.headers.get('If-None-Match'), etag):
+                return Response(status=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+            response = make_response(view(**kwargs))
+            if response.status_code != 200:
+                response.headers['Cache-Control'] = http_cache.NO_STORE  # 錯誤回應不快取
+            elif 'Cache-Control' not in response.headers:
+                if etag is None and not response.is_streamed:
+                    etag = http_cache.body_etag(response.get_data())
+                    if http_cache.is_not_modified(request.headers.get('If-None-Match'), etag):
+                        return Response(status=304, headers={"ETag": etag, "Cache-Control": cache_control})
+                response.headers['Cache-Control'] = cache_control
+                if etag is not None:
+                    response.headers['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+def no_store(view):
+    @wraps(view)
+    def wrapper(**kwargs):
+        response = make_response(view(**kwargs))
+        response.headers['Cache-Control'] = http_cache.NO_STORE
+        return response
+    return wrapper
+
+
 @app.route("/<stock_code>/getcurrent")
+@cached(service.current_cache_policy)
 def get_stock_data(stock_code):
-    stock_data = StockData(stock_code)  # 每次請求都實例化新的股票數據對象
-    current_data = stock_data.fetch_current_data()  # 獲取當前股票資訊
+    current_data = service.current_data(stock_code)  # 獲取當前股票資訊
     return jsonify({"stock_code": stock_code, "current_data": current_data})
 
 @app.route("/<stock_code>/gethistory")
+@cached(service.history_cache_policy)
 def get_history_data(stock_code):
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    stock_data = StockData(stock_code)
     
+    # format=records(預設)/columns/ndjson/arrow，limit 與 cursor 用來分頁
+    # resolution=day(預設)/week/month 彙整K棒，max_points 限制圖表的點數
+    try:
+        fmt, limit, cursor = history_format.parse_history_args(request.args)
+        resolution, max_points = resampling.parse_resolution_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     # 獲取歷史股票資訊
-    historical_data = stock_data.fetch_historical_data(start_date, end_date)
+    historical_data, next_cursor = service.history_page(
+        stock_code, start_date, end_date, limit, cursor, resolution, max_points)
     
     # 檢查是否收到有效的數據
     if historical_data is None or historical_data.empty:
         return jsonify({"error": "No data received"}), 400
 
-    # 將 pandas DataFrame 轉為 dict，然後自動轉換為 JSON
-    return jsonify({
-        "stock_code": stock_code,
-        "historical_data": historical_data.to_dict('records')
-    })
+    if fmt == 'records':
+        # 將 pandas DataFrame 轉為 dict，然後自動轉換為 JSON
+        payload = {"stock_code": stock_code, "historical_data": historical_data.to_dict('records')}
+        if limit is not None:
+            payload["next_cursor"] = next_cursor
+        body, headers = jsonify(payload).get_data(), {"Content-Type": "application/json"}
+    else:
+        body, headers = history_format.render(stock_code, historical_data, fmt, next_cursor)
+
+    # 壓縮與否由 Accept-Encoding 決定，共用快取需要依它分開存放
+    headers["Vary"] = "Accept-Encoding"
+    if history_format.accepts_gzip(request.headers.get('Accept-Encoding')):
+        body = history_format.gzip_body(body, headers)
+    # ndjson 的 body 是 iterator，會以 chunked transfer 分段送出
+    return Response(body, headers=headers)
     
+
 @app.route("/<stock_code>/getpredict5")
+@cached(lambda stock_code, args: service.prediction_cache_policy(stock_code, args, [5]))
 def get_predict_five_data(stock_code):
-    end_date = datetime.now().strftime('%Y-%m-%d')  # 獲取今天的日期
-    start_date = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')  # 獲取90天前的日期
-    stock_data = StockData(stock_code)
-    
-    # 獲取近90天股票資訊
-    data = stock_data.fetch_historical_data(start_date, end_date)
-    data.index = pd.to_datetime(data['date'])
-    data = stock_data.add_technical_indicators(data)
-    data.bfill(inplace=True);  # 使用向後填充處理缺失值
-    # 儲存處理後的數據集到CSV
-    pd.DataFrame(data).to_csv('TSLA_history_cleaned.csv', index=True)
-    
-    model = load_model('../backend/py/model_2.keras')  # 載入模型檔
-    
-    # 選擇特徵
-    features = ['open', 'high', 'low', 'close', 'volume', 'macdhist', 'RSI', 'MOM', 'slowk', 'slowd']
-    X = data[features]
-    
-    # 初始化MinMaxScaler並擬合數據
-    scaler = MinMaxScaler()
-    data = scaler.fit_transform(X)
+    predictions = service.predict_symbol(stock_code, 5)
 
-    # 創建時間序列數據集
-    X_series, _ = create_dataset(data, time_steps=30, future_days=5)
-
-    # 使用最後一個時間窗口的數據進行預測
-    predictions = model.predict(X_series[-1].reshape(1, -1, X_series.shape[-1]))
+    # 將預測結果轉為 dict，然後自動轉換為 JSON
+    return jsonify({
+        "stock_code": stock_code,
+        "predict_data": predictions
+    })
 
-    # 確保predictions是二維數組
-    predictions = predictions.reshape(-1, 1)
 
-    # 如果預測的是多個特徵，創建一個足夠大的數組用於反標準化
-    full_predictions = np.zeros((predictions.shape[0], len(features)))
+@app.route("/<stock_code>/getpredict")
+@cached(lambda stock_code, args: service.prediction_cache_policy(stock_code, args, [1]))
+def get_predict_data(stock_code):
+    predictions = service.predict_symbol(stock_code, 1)
 
-    # 將預測值填充到相應的特徵位置，假設預測的是第四個特徵
-    full_predictions[:, 3] = predictions.flatten()
+    # 將預測結果轉為 dict，然後自動轉換為 JSON
+    return jsonify({
+        "stock_code": stock_code,
+        "predict_data": predictions[0]
+    })
 
-    # 反正規化預測結果
-    predictions = scaler.inverse_transform(full_predictions)[:, 3].tolist()
 
-    # 將預測結果轉為 dict，然後自動轉換為 JSON
+@app.route("/<stock_code>/getpredictall")
+@cached(service.prediction_cache_policy)
+def get_predict_all_data(stock_code):
+    # 一次回傳所有預測天數，特徵只準備一次，例如 {"1": 250.1, "5": [...]}
+    predictions = service.predict_horizons(stock_code)
     return jsonify({
         "stock_code": stock_code,
-        "predict_data": predictions
+        "predict_data": service.format_horizons(predictions)
     })
-    
-    
-@app.route("/<stock_code>/getpredict")
-def get_predict_data(stock_code):
-    end_date = datetime.now().strftime('%Y-%m-%d')  # 獲取今天的日期
-    start_date = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')  # 獲取90天前的日期
-    stock_data = StockData(stock_code)
-    
-    # 獲取近90天股票資訊
-    data = stock_data.fetch_historical_data(start_date, end_date)
-    data.index = pd.to_datetime(data['date'])
-    data = stock_data.add_technical_indicators(data)
-    data.bfill(inplace=True);  # 使用向後填充處理缺失值
-    # 儲存處理後的數據集到CSV
-    pd.DataFrame(data).to_csv('TSLA_history_cleaned.csv', index=True)
-    
-    model = load_model('../backend/py/model.keras')  # 載入模型檔
-    
-    # 選擇特徵
-    features = ['open', 'high', 'low', 'close', 'volume', 'macdhist', 'RSI', 'MOM', 'slowk', 'slowd']
-    X = data[features]
-    
-    # 初始化MinMaxScaler並擬合數據
-    scaler = MinMaxScaler()
-    data = scaler.fit_transform(X)
 
-    # 創建時間序列數據集
-    X_series, _ = create_dataset(data, time_steps=30)
 
-    # 使用最後一個時間窗口的數據進行預測
-    predictions = model.predict(X_series[-1].reshape(1, -1, X_series.shape[-1]))
+@app.route("/predict/batch")
+@cached(service.batch_cache_policy)
+def get_batch_predict_data():
+    # 例如 /predict/batch?symbols=TSLA,NVDA,2618.TW&horizon=5
+    try:
+        symbols, horizon = service.parse_batch_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    predict_data, errors = service.predict_batch(symbols, horizon)
+    response = jsonify({
+        "horizon": horizon,
+        "predict_data": predict_data,
+        "errors": errors
+    })
+    if errors:
+        # 個別股票失敗可能只是上游暫時錯誤，不讓用戶端快取不完整的結果
+        response.headers['Cache-Control'] = http_cache.NO_STORE
+    return response
 
-    # 確保predictions是二維數組
-    predictions = predictions.reshape(-1, 1)
 
-    # 如果預測的是多個特徵，創建一個足夠大的數組用於反標準化
-    full_predictions = np.zeros((predictions.shape[0], len(features)))
+@app.route("/ready")
+@no_store
+def get_ready():
+    # 模型載入並暖機完成前回傳 503，供負載平衡器判斷是否可以送流量
+    ready, status = service.readiness()
+    return jsonify(status), 200 if ready else 503
 
-    # 將預測值填充到相應的特徵位置，假設預測的是第四個特徵
-    full_predictions[:, 3] = predictions.flatten()
 
-    # 反正規化預測結果
-    predictions = scaler.inverse_transform(full_predictions)[:, 3]
+@app.route("/metrics/inference")
+@no_store
+def get_inference_metrics():
+    return jsonify(service.inference_metrics())
 
-    # 將預測結果轉為 dict，然後自動轉換為 JSON
-    return jsonify({
-        "stock_code": stock_code,
-        "predict_data": predictions[0]
-    })
+
+@app.route("/metrics/cache")
+@no_store
+def get_cache_metrics():
+    return jsonify(service.cache_metrics())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,268 @@
+'''
+非同步(ASGI)伺服器模式，提供與 app.py 相同的路由。
+上游抓取在 I/O 執行緒池中並行等待，技術指標計算交給有上限的計算執行緒池，
+模型推論交給推論佇列，事件迴圈本身不會被阻塞，單一股票的上游變慢也不會拖住其他請求。
+
+啟動方式(在 backend 目錄下)：uvicorn asgi:app --port 5000
+'''
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from functools import wraps
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.http import http_date
+
+from py import history_format  # /gethistory 的回應格式與分頁
+from py import http_cache  # ETag 與 Cache-Control
+from py import resampling  # 週/月線彙整與降採樣
+from py import stock_service as service  # 股票 API 共用的服務層
+
+
+# 執行緒池大小與上游逾時秒數
+IO_WORKERS = int(os.environ.get('ASYNC_IO_WORKERS', 32))
+CPU_WORKERS = int(os.environ.get('ASYNC_CPU_WORKERS', os.cpu_count() or 1))
+UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 20))
+
+io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='upstream')
+cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix='compute')
+
+
+class JSONResponseCompat(JSONResponse):
+    # 日期格式與 Flask 的 jsonify 相同，前端不需要修改
+    def render(self, content):
+        return render_json(content)
+
+
+def render_json(content):
+    return json.dumps(content, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return http_date(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def run_io(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(io_pool, fn, *args), UPSTREAM_TIMEOUT)
+
+
+async def run_cpu(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_pool, fn, *args)
+
+
+def cached(policy):
+    # 與 app.py 的 cached 相同：事先算出的 ETag 相符時直接回 304，不執行路由本身
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            etag, cache_control = await run_io(policy, *request.path_params.values(), request.query_params)
+            if_none_match = request.headers.get('if-none-match')
+            if http_cache.is_not_modified(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+            response = await handler(request)
+            if response.status_code != 200:
+                response.headers['Cache-Control'] = http_cache.NO_STORE  # 錯誤回應不快取
+            elif 'cache-control' not in response.headers:
+                if etag is None and not isinstance(response, StreamingResponse):
+                    etag = http_cache.body_etag(response.body)
+                    if http_cache.is_not_modified(if_none_match, etag):
+                        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+                response.headers['Cache-Control'] = cache_control
+                if etag is not None:
+                    response.headers['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+def no_store(handler):
+    @wraps(handler)
+    async def wrapper(request):
+        response = await handler(request)
+        response.headers['Cache-Control'] = http_cache.NO_STORE
+        return response
+    return wrapper
+
+
+async def prepare(stock_code, horizons):
+    # 查快取與補抓日線是 I/O，準備特徵是計算；所有天數都命中快取時不準備特徵
+    keys, cached = await run_io(service.lookup_predictions, stock_code, horizons)
+    if len(cached) == len(horizons):
+        return keys, cached, None
+    await run_io(service.fetch_bars, stock_code)
+    return keys, cached, await run_cpu(service.pipeline.prepare, stock_code)
+
+
+async def infer(prepared, horizon, snapshot):
+    return await asyncio.wrap_future(service.pipeline.submit(prepared, horizon, snapshot))
+
+
+async def predict_horizons(stock_code, horizons):
+    keys, results, prepared = await prepare(stock_code, horizons)
+    missing = [horizon for horizon in horizons if horizon not in results]
+    # 正規化、推論與快取鍵都使用同一份模型快照
+    snapshots = {horizon: service.pipeline.snapshot(horizon) for horizon in missing}
+    outputs = await asyncio.gather(*(infer([prepared], horizon, snapshots[horizon]) for horizon in missing))
+    for horizon, (predictions,) in zip(missing, outputs):
+        results[horizon] = service.store_prediction(keys[horizon], snapshots[horizon], predictions)
+    return results
+
+
+async def predict_symbol(stock_code, horizon):
+    return (await predict_horizons(stock_code, [horizon]))[horizon]
+
+
+@cached(service.current_cache_policy)
+async def get_stock_data(request):
+    stock_code = request.path_params['stock_code']
+    current_data = await run_io(service.current_data, stock_code)
+    return JSONResponseCompat({"stock_code": stock_code, "current_data": current_data})
+
+
+@cached(service.history_cache_policy)
+async def get_history_data(request):
+    stock_code = request.path_params['stock_code']
+    start_date = request.query_params.get('start_date')
+    end_date = request.query_params.get('end_date')
+    try:
+        fmt, limit, cursor = history_format.parse_history_args(request.query_params)
+        resolution, max_points = resampling.parse_resolution_args(request.query_params)
+    except ValueError as e:
+        return JSONResponseCompat({"error": str(e)}, status_code=400)
+
+    historical_data, next_cursor = await run_io(service.history_page, stock_code, start_date, end_date, limit, cursor,
+                                                   resolution, max_points)
+    if historical_data is None or historical_data.empty:
+        return JSONResponseCompat({"error": "No data received"}, status_code=400)
+
+    if fmt == 'records':
+        records = await run_cpu(historical_data.to_dict, 'records')
+        payload = {"stock_code": stock_code, "historical_data": records}
+        if limit is not None:
+            payload["next_cursor"] = next_cursor
+        body, headers = await run_cpu(render_json, payload), {"Content-Type": "application/json"}
+    else:
+        body, headers = await run_cpu(history_format.render, stock_code, historical_data, fmt, next_cursor)
+
+    headers["Vary"] = "Accept-Encoding"
+    gzip = history_format.accepts_gzip(request.headers.get('accept-encoding'))
+    if isinstance(body, bytes):
+        if gzip:
+            body = await run_cpu(history_format.gzip_body, body, headers)
+        return Response(body, headers=headers)
+    # 串流格式由 Starlette 在執行緒池中逐段取出並以 chunked transfer 送出
+    return StreamingResponse(history_format.gzip_body(body, headers) if gzip else body, headers=headers)
+
+
+@cached(lambda stock_code, args: service.prediction_cache_policy(stock_code, args, [5]))
+async def get_predict_five_data(request):
+    stock_code = request.path_params['stock_code']
+    predictions = await predict_symbol(stock_code, 5)
+    return JSONResponseCompat({"stock_code": stock_code, "predict_data": predictions})
+
+
+@cached(lambda stock_code, args: service.prediction_cache_policy(stock_code, args, [1]))
+async def get_predict_data(request):
+    stock_code = request.path_params['stock_code']
+    predictions = await predict_symbol(stock_code, 1)
+    return JSONResponseCompat({"stock_code": stock_code, "predict_data": predictions[0]})
+
+
+@cached(service.prediction_cache_policy)
+async def get_predict_all_data(request):
+    stock_code = request.path_params['stock_code']
+    predictions = await predict_horizons(stock_code, list(service.HORIZON_MODELS))
+    return JSONResponseCompat({"stock_code": stock_code, "predict_data": service.format_horizons(predictions)})
+
+
+@cached(service.batch_cache_policy)
+async def get_batch_predict_data(request):
+    try:
+        symbols, horizon = service.parse_batch_args(request.query_params)
+    except ValueError as e:
+        return JSONResponseCompat({"error": str(e)}, status_code=400)
+
+    # 所有股票同時準備，個別失敗(包含上游逾時)的股票另外回報
+    outcomes = await asyncio.gather(*(prepare(symbol, [horizon]) for symbol in symbols), return_exceptions=True)
+    results, prepared, errors = {}, {}, {}
+    for symbol, outcome in zip(symbols, outcomes):
+        if isinstance(outcome, BaseException):
+            errors[symbol] = str(outcome) or type(outcome).__name__
+            continue
+        keys, cached, features = outcome
+        if features is None:
+            results[symbol] = cached[horizon]
+        else:
+            prepared[symbol] = (keys[horizon], features)
+
+    # 將未命中股票最後的時間窗口疊成一個批次，只做一次前向傳播
+    if prepared:
+        snapshot = service.pipeline.snapshot(horizon)
+        outputs = await infer([features for _, features in prepared.values()], horizon, snapshot)
+        for (symbol, (key, _)), predictions in zip(prepared.items(), outputs):
+            results[symbol] = service.store_prediction(key, snapshot, predictions)
+
+    response = JSONResponseCompat({
+        "horizon": horizon,
+        "predict_data": service.format_predictions(symbols, horizon, results),
+        "errors": errors
+    })
+    if errors:
+        # 個別股票失敗可能只是上游暫時錯誤，不讓用戶端快取不完整的結果
+        response.headers['Cache-Control'] = http_cache.NO_STORE
+    return response
+
+
+@no_store
+async def get_ready(request):
+    ready, status = service.readiness()
+    return JSONResponseCompat(status, status_code=200 if ready else 503)
+
+
+@no_store
+async def get_inference_metrics(request):
+    return JSONResponseCompat(service.inference_metrics())
+
+
+@no_store
+async def get_cache_metrics(request):
+    return JSONResponseCompat(service.cache_metrics())
+
+
+async def upstream_timeout(request, exc):
+    return JSONResponseCompat({"error": "Upstream data source timed out"}, status_code=504)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # 啟動時載入並暖機模型
+    await run_cpu(service.load_models)
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/predict/batch", get_batch_predict_data),
+        Route("/ready", get_ready),
+        Route("/metrics/inference", get_inference_metrics),
+        Route("/metrics/cache", get_cache_metrics),
+        Route("/{stock_code}/getcurrent", get_stock_data),
+        Route("/{stock_code}/gethistory", get_history_data),
+        Route("/{stock_code}/getpredictall", get_predict_all_data),
+        Route("/{stock_code}/getpredict5", get_predict_five_data),
+        Route("/{stock_code}/getpredict", get_predict_data),
+    ],
+    exception_handlers={asyncio.TimeoutError: upstream_timeout},
+    lifespan=lifespan,
+)
@@ -0,0 +1,46 @@
+'''
+正式環境的預先 fork 多 worker 模式(Linux)。
+主行程匯入 app.py 一次，載入函式庫與已匯出成 TFLite 的模型，再 fork 出多個 worker，
+worker 以 copy-on-write 共用主行程的記憶體，不必各自匯入與載入。
+TensorFlow 在 fork 後不安全，尚未匯出 TFLite 的 Keras 模型改在每個 worker fork 後各自載入。
+每個 worker 都會啟動收盤後預先計算的排程，但只有取得 data/scheduler.lock 檔案鎖的一個 worker 會執行。
+
+啟動方式(在 backend 目錄下)：gunicorn app:app
+可用環境變數：WEB_CONCURRENCY(worker 數)、GUNICORN_THREADS(每個 worker 的執行緒數)、BIND
+'''
+
+import os
+import time
+
+os.environ.setdefault("AI_STOCK_PREFORK", "1")
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+# 每個 worker 以多執行緒處理請求，同時到達的預測請求才能在推論佇列中合併成批次
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+preload_app = True
+timeout = 60
+
+_started = time.time()
+
+
+def when_ready(server):
+    from py import runtime_stats
+
+    # 主行程已匯入 app 並載入模型，即將 fork worker
+    memory = runtime_stats.memory()
+    server.log.info("主行程就緒，啟動 %.2fs，記憶體 %s MB", time.time() - _started, memory)
+
+
+def post_fork(server, worker):
+    from py import stock_service
+
+    seconds = stock_service.after_fork()
+    server.log.info("worker %s 就緒，fork 後 %.3fs", worker.pid, seconds)
+
+
+def post_worker_init(worker):
+    from py import runtime_stats
+
+    worker.log.info("worker %s 記憶體 %s MB", worker.pid, runtime_stats.memory())
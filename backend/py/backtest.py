@@ -0,0 +1,208 @@
+'''
+前進式(walk-forward)回測：沿著時間軸切出多個 fold，每個 fold 以前面一段資料訓練、
+接著一段資料驗證(早停)，再對之後 step 個視窗測試，然後整段往後移動 step 個視窗。
+
+    fold 0: [ 訓練 train ][ 驗證 val ][ 測試 step ]
+    fold 1:        [ 訓練 train ][ 驗證 val ][ 測試 step ]
+    ...
+
+--anchored 時訓練區間從第一筆資料開始逐步擴大，而不是固定長度往後滑動。
+特徵矩陣只讀取一次並存成 .npy，各 fold 的子行程以 memory-map 共用，只依視窗起點切出資料；
+正規化只用該 fold 訓練區間的資料擬合，測試資料不會影響縮放。
+
+輸出每個 fold 與整體的測試集 MSE/RMSE/MAE/MAPE，以及簡單的交易訊號統計：
+預測視窗結束後 horizon 天的目標值高於目前值時視為做多訊號，統計方向命中率與做多時的平均報酬。
+
+使用方式(在專案根目錄下)：
+    python backend/py/backtest.py --symbol TSLA --horizon 5 --train 500 --val 100 --step 60 --workers 4
+'''
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 讓回測程式可以匯入 backend/py 的共用模組
+from py.train_models import (BACKEND_DIR, DEFAULT_CONFIGS, DEFAULT_DATA_DIR, FEATURES, _limit_threads, history_matrix,
+                             load_configs)
+
+
+DEFAULT_OUTPUT_DIR = os.path.join(BACKEND_DIR, "data", "backtests")
+CLOSE = FEATURES.index('close')
+
+
+def make_folds(n_windows, train, val, step, anchored=False):
+    # 以視窗索引表示每個 fold 的 (訓練起點, 驗證起點, 測試起點, 測試終點)
+    folds = []
+    start = 0
+    while start + train + val + step <= n_windows:
+        train_start = 0 if anchored else start
+        val_start = start + train
+        test_start = val_start + val
+        folds.append((train_start, val_start, test_start, test_start + step))
+        start += step
+    return folds
+
+
+def run_fold(path, fold, horizon, config, seed=None):
+    import keras
+    from keras.callbacks import EarlyStopping
+
+    from py.data_pipeline import targets, window_dataset
+    from py.train_models import build_model
+    from py.training_metrics import regression_metrics
+
+    if seed is not None:
+        keras.utils.set_random_seed(seed)
+    started = time.perf_counter()
+    train_start, val_start, test_start, test_end = fold
+    time_steps = config["time_steps"]
+    data = np.load(path, mmap_mode='r')
+
+    # 只複製這個 fold 用到的列，並以訓練視窗(含目標值)涵蓋的列擬合 min-max
+    rows = slice(train_start, test_end - 1 + time_steps + horizon)
+    fit_rows = data[train_start:val_start - 1 + time_steps + horizon]
+    low, high = fit_rows.min(axis=0), fit_rows.max(axis=0)
+    scale = np.where(high > low, high - low, 1.0)
+    fold_data = ((data[rows] - low) / scale).astype(np.float32)
+    close = np.asarray(data[rows, CLOSE])
+
+    def starts(a, b):
+        return np.arange(a - train_start, b - train_start, dtype=np.int64)
+
+    train_idx, val_idx, test_idx = starts(train_start, val_start), starts(val_start, test_start), starts(test_start, test_end)
+    batch_size = config["batch_size"]
+    train_ds = window_dataset(fold_data, train_idx, time_steps, horizon, batch_size, shuffle_buffer=len(train_idx), seed=seed)
+    val_ds = window_dataset(fold_data, val_idx, time_steps, horizon, batch_size)
+    test_ds = window_dataset(fold_data, test_idx, time_steps, horizon, batch_size)
+
+    model = build_model(horizon, fold_data.shape[1] - 1, config)
+    early_stopping = EarlyStopping(monitor='val_loss', patience=config["patience"], restore_best_weights=True)
+    history = model.fit(train_ds, epochs=config["epochs"], validation_data=val_ds, callbacks=[early_stopping], verbose=0)
+
+    y_true = targets(fold_data, test_idx, time_steps, horizon)
+    y_pred = model.predict(test_ds, verbose=0).reshape(y_true.shape)
+    result = {k: float(v) for k, v in regression_metrics(y_true, y_pred).items()}
+
+    # 交易訊號：預測第 horizon 天的目標值高於視窗最後一天的值就做多，持有 horizon 天
+    last = test_idx + time_steps - 1
+    current = fold_data[last, -1]
+    predicted_up = y_pred[:, -1] > current
+    actual_up = y_true[:, -1] > current
+    returns = close[last + horizon] / close[last] - 1
+    result.update({
+        "n_test": len(test_idx),
+        "epochs": len(history.history['loss']),
+        "hit_rate": float(np.mean(predicted_up == actual_up)),
+        "long_ratio": float(np.mean(predicted_up)),
+        "avg_return_long": float(returns[predicted_up].mean()) if predicted_up.any() else 0.0,
+        "avg_return_all": float(returns.mean()),
+        "seconds": round(time.perf_counter() - started, 1),
+    })
+    return result
+
+
+def aggregate(folds):
+    # 以各 fold 的測試視窗數加權平均；做多報酬以做多次數加權
+    weights = folds["n_test"]
+    longs = folds["long_ratio"] * weights
+    summary = {
+        name: np.average(folds[name], weights=weights)
+        for name in ["mse", "mae", "mape", "hit_rate", "long_ratio", "avg_return_all"]
+    }
+    summary["rmse"] = np.sqrt(summary["mse"])
+    summary["avg_return_long"] = np.average(folds["avg_return_long"], weights=longs) if longs.sum() else 0.0
+    summary["n_test"] = int(weights.sum())
+    return summary
+
+
+def walk_forward(symbol, horizon, train, val, step, anchored=False, workers=None, threads=None,
+                 data_dir=DEFAULT_DATA_DIR, config=None, seed=None):
+    '''
+    對單一股票執行前進式回測，回傳 (每個 fold 的結果, 整體結果)。
+    train、val、step 的單位是視窗數(約等於交易日數)。
+    '''
+    if val < horizon:
+        raise ValueError(f"驗證區間 ({val}) 至少要有 horizon ({horizon}) 個視窗，訓練目標才不會與測試區間重疊")
+    config = {**DEFAULT_CONFIGS[horizon], **(config or {})}
+    time_steps = config["time_steps"]
+    dates, data = history_matrix(symbol, data_dir)
+    data = np.asarray(data, dtype=np.float64)
+    dates = pd.to_datetime(dates)
+    n_windows = len(data) - time_steps - horizon + 1
+    folds = make_folds(n_windows, train, val, step, anchored)
+    if not folds:
+        raise ValueError(f"{symbol} 只有 {n_windows} 個視窗，不足以建立 train={train} val={val} step={step} 的 fold")
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(folds)))
+    threads = threads or max(1, cpus // workers)
+
+    # 特徵矩陣存成 .npy，子行程以 memory-map 讀取，不必各自讀 CSV 或經由 pickle 傳送
+    shared_dir = tempfile.mkdtemp(prefix="backtest_")
+    path = os.path.join(shared_dir, f"{symbol}.npy")
+    np.save(path, data)
+    try:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_limit_threads, initargs=(threads,)) as executor:
+            results = list(executor.map(run_fold, [path] * len(folds), folds, [horizon] * len(folds),
+                                        [config] * len(folds), [seed] * len(folds)))
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+    rows = []
+    for i, ((train_start, _, test_start, test_end), result) in enumerate(zip(folds, results)):
+        rows.append({
+            "fold": i,
+            "train_from": dates[train_start].date(),
+            "test_from": dates[test_start + time_steps].date(),
+            "test_to": dates[test_end - 1 + time_steps + horizon - 1].date(),
+            **result,
+        })
+    folds = pd.DataFrame(rows)
+    return folds, aggregate(folds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="前進式回測")
+    parser.add_argument("--symbol", required=True)
+    parser.add_argument("--horizon", type=int, default=5, choices=sorted(DEFAULT_CONFIGS))
+    parser.add_argument("--train", type=int, default=500, help="每個 fold 的訓練視窗數")
+    parser.add_argument("--val", type=int, default=100, help="每個 fold 的驗證視窗數")
+    parser.add_argument("--step", type=int, default=60, help="每個 fold 的測試視窗數，也是往後移動的距離")
+    parser.add_argument("--anchored", action="store_true", help="訓練區間固定從第一筆資料開始")
+    parser.add_argument("--epochs", type=int, default=30, help="每個 fold 的 epoch 上限")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    folds, summary = walk_forward(args.symbol, args.horizon, args.train, args.val, args.step, args.anchored,
+                                  args.workers, args.threads_per_worker, args.data_dir,
+                                  {**load_configs().get(args.horizon, {}), "epochs": args.epochs}, args.seed)
+    elapsed = time.perf_counter() - started
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{args.symbol}_h{args.horizon}_{datetime.now():%Y%m%d_%H%M%S}.csv")
+    pd.concat([folds, pd.DataFrame([{"fold": "all", **summary}])]).to_csv(path, index=False)
+
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:.4f}".format):
+        print(folds.to_string(index=False))
+    print(" - ".join(f"{k}: {v:.4f}" if isinstance(v, float) else f"{k}: {v}" for k, v in summary.items()))
+    print(f"{len(folds)} 個 fold，{elapsed:.1f}s，結果已寫入 {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+import pandas as pd
+
+from py.market_calendar import completed_until
+from py.providers import HISTORY_COLUMNS, default_provider
+
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "bars")
+
+
+def _day(value):
+    day = pd.Timestamp(value)
+    if day.tz is not None:
+        day = day.tz_localize(None)
+    return day.normalize()
+
+
+def _empty_frame():
+    return pd.DataFrame(columns=HISTORY_COLUMNS, index=pd.DatetimeIndex([]), dtype=float)
+
+
+def _naive_dates(index):
+    index = pd.DatetimeIndex(index)
+    return index.tz_localize(None) if index.tz is not None else index
+
+
+def _merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _actions(frame):
+    # 有除權息或分割的K棒時間
+    if frame.empty:
+        return frame.index
+    return frame.index[(frame["dividends"].fillna(0) != 0) | (frame["stock splits"].fillna(0) != 0)]
+
+
+def _has_new_actions(frame, fetched):
+    # 下載的K棒中出現本地沒有、且晚於本地第一根K棒的除權息或分割；
+    # 上游的價格是還原後的，事件之前的價格都會重新調整，本地已存的K棒因此過時
+    if frame.empty:
+        return False
+    known = _actions(frame)
+    for part in fetched:
+        actions = _actions(part).difference(known)
+        if (actions > frame.index[0]).any():
+            return True
+    return False
+
+
+def _missing_intervals(covered, start, end):
+    # 計算 [start, end) 之中尚未被本地資料涵蓋的區間
+    missing = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+class BarStore:
+    """
+    讀穿式(read-through)的本地日線資料庫：依代號將日線存放在磁碟上，
+    查詢任意 (start_date, end_date) 時只向上游下載尚未涵蓋的日期區間，
+    通常只需補最新一根K棒。已收盤的歷史K棒不會再變動，因此不需重新下載；
+    唯一的例外是除權息或分割，上游會重新還原事件之前的價格，這時整檔股票的本地資料作廢重新下載。
+    """
+
+    def __init__(self, provider, directory=DEFAULT_DIR):
+        self.provider = provider
+        self.directory = directory
+        self._memory = {}  # symbol -> (mtime, frame, covered)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _paths(self, symbol):
+        return (
+            os.path.join(self.directory, f"{symbol}.pkl"),
+            os.path.join(self.directory, f"{symbol}.json"),
+        )
+
+    def _load(self, symbol):
+        frame_path, meta_path = self._paths(symbol)
+        try:
+            mtime = os.path.getmtime(meta_path)
+        except OSError:
+            return _empty_frame(), []
+
+        # 磁碟檔案未變動時直接使用記憶體中的副本
+        cached = self._memory.get(symbol)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        frame = pd.read_pickle(frame_path)
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        covered = [[pd.Timestamp(start), pd.Timestamp(end)] for start, end in meta["covered"]]
+        self._memory[symbol] = (mtime, frame, covered)
+        return frame, covered
+
+    def _save(self, symbol, frame, covered):
+        os.makedirs(self.directory, exist_ok=True)
+        frame_path, meta_path = self._paths(symbol)
+
+        # 先寫入暫存檔再替換，避免其他讀取者看到寫到一半的檔案
+        frame.to_pickle(frame_path + ".tmp")
+        os.replace(frame_path + ".tmp", frame_path)
+        meta = {"covered": [[start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")] for start, end in covered]}
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        self._memory[symbol] = (os.path.getmtime(meta_path), frame, covered)
+
+    def _merge(self, symbol, frame, covered, missing, fetched, start, end):
+        # 將下載的區間併入本地資料並存檔，回傳合併後的資料；呼叫端需持有該代號的鎖
+        if _has_new_actions(frame, fetched):
+            # 新的K棒帶有除權息或分割：舊的還原價格與新下載的不一致，捨棄本地資料，重新下載這次查詢的整個區間
+            frame, covered, missing = _empty_frame(), [], [(start, end)]
+            fetched = [self.provider.fetch_history(symbol, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))]
+
+        parts = [f for f in [frame] + fetched if not f.empty]
+        if parts:
+            frame = pd.concat(parts)
+            frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+
+        # 尚未收盤的交易日K棒還會變動，只把已收盤的區間標記為已涵蓋
+        closed = completed_until(symbol)
+        covered = _merge_intervals(covered + [[s, min(e, closed)] for s, e in missing if s < closed])
+        self._save(symbol, frame, covered)
+        return frame
+
+    def get(self, symbol, start_date, end_date):
+        start, end = _day(start_date), _day(end_date)
+
+        with self._lock(symbol):
+            frame, covered = self._load(symbol)
+            missing = _missing_intervals(covered, start, end)
+
+            if missing:
+                fetched = [self.provider.fetch_history(symbol, s.strftime("%Y-%m-%d"), e.strftime("%Y-%m-%d")) for s, e in missing]
+                frame = self._merge(symbol, frame, covered, missing, fetched, start, end)
+
+        dates = _naive_dates(frame.index)
+        return frame[(dates >= start) & (dates < end)].copy()
+
+    def get_many(self, ranges, max_workers=None):
+        '''
+        一次補齊多檔股票的日線，ranges 為 {代號: (start_date, end_date)}，回傳 {代號: 例外} 的失敗清單。
+        所有缺少的區間交給 provider.fetch_many 並行下載(受上游的限速與並行上限約束)，
+        下載期間不持有各代號的鎖，下載完才逐檔合併；一檔失敗不影響其他股票。
+        '''
+        wanted = {}
+        for symbol, (start_date, end_date) in ranges.items():
+            with self._lock(symbol):
+                _, covered = self._load(symbol)
+            missing = _missing_intervals(covered, _day(start_date), _day(end_date))
+            if missing:
+                wanted[symbol] = (missing, _day(start_date), _day(end_date))
+
+        requests = [(symbol, s.strftime("%Y-%m-%d"), e.strftime("%Y-%m-%d"))
+                    for symbol, (missing, _, _) in wanted.items() for s, e in missing]
+        results = iter(self.provider.fetch_many(requests, max_workers))
+
+        errors = {}
+        for symbol, (missing, start, end) in wanted.items():
+            fetched = [next(results) for _ in missing]
+            failed = [f for f in fetched if isinstance(f, Exception)]
+            if failed:
+                errors[symbol] = failed[0]
+                continue
+            with self._lock(symbol):
+                # 下載期間其他執行緒可能已補上部分區間，重複的K棒以新下載的為準
+                frame, covered = self._load(symbol)
+                try:
+                    self._merge(symbol, frame, covered, missing, fetched, start, end)
+                except Exception as e:
+                    # 除權息後重新下載失敗
+                    errors[symbol] = e
+        return errors
+
+    def actions_version(self, symbol):
+        # 本地資料中除權息與分割的次數和最後一次的時間；出現新的事件、已存的K棒被重新還原時就會改變，可以放進 HTTP 的 ETag
+        with self._lock(symbol):
+            frame, _ = self._load(symbol)
+        actions = _actions(frame)
+        return len(actions), actions[-1].isoformat() if len(actions) else None
+
+    def last_bar(self, symbol, end_date, lookback_days=14):
+        # 回傳 end_date 之前最後一根K棒的時間；區間已涵蓋時只讀記憶體中的資料
+        end = _day(end_date)
+        start = end - pd.Timedelta(days=lookback_days)
+        with self._lock(symbol):
+            frame, covered = self._load(symbol)
+            missing = _missing_intervals(covered, start, end)
+        if missing:
+            self.get(symbol, start, end)
+            with self._lock(symbol):
+                frame, _ = self._load(symbol)
+
+        if frame.empty:
+            return None
+        tz = frame.index.tz
+        position = frame.index.searchsorted(end if tz is None else end.tz_localize(tz))
+        if position == 0:
+            return None
+        return frame.index[position - 1]
+
+
+# 全域共用的日線資料庫
+bar_store = BarStore(default_provider())
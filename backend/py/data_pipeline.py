@@ -0,0 +1,129 @@
+'''
+串流訓練資料：以 tf.data 在訓練時才從特徵矩陣切出每個時間窗口，
+記憶體中只保留一份特徵矩陣與每個視窗的起點，不再建立 (視窗數, 30, 特徵數) 的完整陣列，
+股票數量或年數增加時，記憶體只隨原始資料成長。
+
+視窗內容與 windowing.create_dataset 相同：輸入為最後一欄以外的欄位，目標為最後一欄未來幾天的值。
+多檔股票會串接成一個矩陣，視窗不會跨越兩檔股票，每檔股票各自依時間順序切分訓練、驗證與測試集。
+'''
+
+import time
+
+import numpy as np
+import tensorflow as tf
+
+
+def chronological_split(n, test_ratio=0.10, val_ratio=0.15):
+    # 與訓練腳本原本的切法相同：最後 10% 為測試集，其餘的最後 15% 為驗證集
+    train_val_size = int(n * (1 - test_ratio))
+    val_size = int(train_val_size * val_ratio)
+    return {
+        "train": slice(0, train_val_size - val_size),
+        "val": slice(train_val_size - val_size, train_val_size),
+        "test": slice(train_val_size, n),
+    }
+
+
+def stack_series(arrays, time_steps=30, future_days=5, test_ratio=0.10, val_ratio=0.15):
+    # 將一或多檔股票的特徵矩陣串接成 float32 矩陣，並回傳各資料集的視窗起點(在串接後矩陣中的位置)
+    arrays = [np.asarray(a, dtype=np.float32) for a in arrays]
+    data = np.concatenate(arrays)
+    starts = {"train": [], "val": [], "test": []}
+    offset = 0
+    for a in arrays:
+        n = max(len(a) - time_steps - future_days + 1, 0)
+        for name, part in chronological_split(n, test_ratio, val_ratio).items():
+            starts[name].append(offset + np.arange(n, dtype=np.int64)[part])
+        offset += len(a)
+    return data, {name: np.concatenate(parts) for name, parts in starts.items()}
+
+
+def targets(data, starts, time_steps=30, future_days=5):
+    # 目標值只有 (視窗數, future_days)，評估時可以直接放在記憶體中
+    idx = starts[:, np.newaxis] + time_steps + np.arange(future_days)
+    return data[idx, -1]
+
+
+def window_dataset(data, starts, time_steps=30, future_days=5, batch_size=16,
+                   shuffle_buffer=0, seed=None, cache_data=None):
+    '''
+    建立 (X, y) 批次的 tf.data.Dataset，X 形狀為 (batch, time_steps, 特徵數)，y 為 (batch, future_days)。
+    shuffle_buffer > 0 時打亂的是視窗起點，緩衝區只存整數索引，可以設成整個訓練集的大小。
+    cache_data 可傳入已轉成張量的特徵矩陣，讓訓練、驗證、測試集共用同一份資料。
+    '''
+    data = tf.constant(data) if cache_data is None else cache_data
+    x_offsets = tf.range(time_steps, dtype=tf.int64)
+    y_offsets = tf.range(time_steps, time_steps + future_days, dtype=tf.int64)
+
+    def gather(batch_starts):
+        # 一次切出整個批次的視窗，比逐筆 map 少很多次函式呼叫
+        x = tf.gather(data, batch_starts[:, tf.newaxis] + x_offsets)[..., :-1]
+        y = tf.gather(data[:, -1], batch_starts[:, tf.newaxis] + y_offsets)
+        return x, y
+
+    ds = tf.data.Dataset.from_tensor_slices(starts)
+    if shuffle_buffer:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    ds = ds.map(gather, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle_buffer)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+
+def make_datasets(arrays, time_steps=30, future_days=5, batch_size=16, seed=None, eval_sample=0):
+    # 訓練集每個 epoch 重新打亂，驗證與測試集維持時間順序；
+    # eval_sample > 0 時另外建立 train_sample / val_sample，從訓練與驗證集固定抽出的視窗，供額外評估使用
+    data, starts = stack_series(arrays, time_steps, future_days)
+    if eval_sample:
+        rng = np.random.default_rng(seed)
+        for name in ("train", "val"):
+            idx = starts[name]
+            if len(idx) > eval_sample:
+                idx = np.sort(rng.choice(idx, eval_sample, replace=False))
+            starts[f"{name}_sample"] = idx
+    tensor = tf.constant(data)
+    datasets = {
+        name: window_dataset(
+            data, idx, time_steps, future_days, batch_size,
+            shuffle_buffer=len(idx) if name == "train" else 0, seed=seed, cache_data=tensor,
+        )
+        for name, idx in starts.items()
+    }
+    return datasets, {name: targets(data, idx, time_steps, future_days) for name, idx in starts.items()}
+
+
+if __name__ == "__main__":
+    from windowing import create_dataset
+
+    # 驗證與 create_dataset 的視窗一致，並比較記憶體用量
+    rng = np.random.default_rng(0)
+    series = [rng.random((2520, 10)).astype(np.float32) for _ in range(3)]
+    data, starts = stack_series(series, 30, 5)
+    X_all = np.concatenate([create_dataset(a, 30, 5)[0] for a in series])
+    y_all = np.concatenate([create_dataset(a, 30, 5)[1] for a in series])
+    expected = {name: [] for name in starts}
+    for a in series:
+        n = len(a) - 30 - 5 + 1
+        for name, part in chronological_split(n).items():
+            expected[name].append(np.arange(n)[part])
+
+    offset = 0
+    for name, idx in starts.items():
+        X = np.concatenate([x for x, _ in window_dataset(data, idx, 30, 5, batch_size=256)])
+        y = np.concatenate([y for _, y in window_dataset(data, idx, 30, 5, batch_size=256)])
+        rows = np.concatenate([e + i * (2520 - 34) for i, e in enumerate(expected[name])])
+        assert np.array_equal(X, X_all[rows]) and np.array_equal(y, y_all[rows])
+        assert np.array_equal(y, targets(data, idx, 30, 5))
+
+    # 200 檔股票、每檔十年日線
+    big = [rng.random((2520, 10)).astype(np.float32) for _ in range(200)]
+    data, starts = stack_series(big, 30, 5)
+    windows = sum(len(idx) for idx in starts.values())
+    dense_mb = windows * 30 * 9 * 4 / 2**20
+    stream_mb = (data.nbytes + sum(idx.nbytes for idx in starts.values())) / 2**20
+    print(f"完整視窗陣列: {dense_mb:.0f}MB，串流(特徵矩陣+起點索引): {stream_mb:.0f}MB")
+
+    ds = window_dataset(data, starts["train"], 30, 5, batch_size=256, shuffle_buffer=len(starts["train"]))
+    start = time.perf_counter()
+    batches = sum(1 for _ in ds)
+    elapsed = time.perf_counter() - start
+    print(f"一個 epoch: {batches} 個批次 {elapsed:.2f}s ({len(starts['train']) / elapsed:,.0f} 視窗/秒)")
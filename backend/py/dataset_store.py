@@ -0,0 +1,251 @@
+'''
+訓練資料集：把 original data/<代號>/ 底下 save_data_to_csv 陸續存下的 CSV
+(<代號>_history.csv、<代號>_history01.csv ...)合併並去除重複的交易日，轉成每檔股票一個資料夾的二進位檔：
+    <store>/<代號>/dates.npy     交易日(datetime64[D]，交易所當地日期)
+    <store>/<代號>/values.npy    已向後填充的 float32 矩陣，形狀為 (列數, 欄位數)，訓練特徵排在最前面
+    <store>/manifest.json       來源目錄，以及每檔股票的欄位、日期範圍、缺口與來源檔案
+同一天出現在多份 CSV 時以檔名序號最大(最晚下載)的為準；訓練程式直接讀 CSV 時也以 consolidate() 合併、
+向後填充並轉成 float32，兩種讀法得到完全相同的矩陣。
+讀取時以 memory-map 開啟，不必解析文字，訓練用的特徵矩陣是零複製的 view。
+來源 CSV 的大小或修改時間改變後 find() 回傳 None，訓練程式改讀 CSV，重新轉換即可更新。
+
+使用方式(在專案根目錄下)：
+    python backend/py/dataset_store.py [--symbols TSLA NVDA] [--force]
+'''
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DIR = os.path.join(BACKEND_DIR, "data", "datasets")
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "original data")
+FORMAT_VERSION = 3  # 3: (列數, 欄位數) 的 float32，已向後填充
+
+# 訓練使用的特徵(與 train_models.FEATURES 相同)，存放時排在最前面，matrix(TRAINING_FEATURES) 不需複製
+TRAINING_FEATURES = ['open', 'high', 'low', 'close', 'volume', 'macdhist', 'RSI', 'MOM', 'slowk', 'slowd']
+
+# 相鄰兩個交易日相隔超過這個天數時記錄為缺口(長假最多約 4~5 天)
+GAP_DAYS = 7
+
+
+def source_files(data_dir, symbol):
+    # <代號>_history.csv 的序號視為 0，依序號排序，越後面越晚下載
+    directory = os.path.join(data_dir, symbol)
+    pattern = re.compile(re.escape(symbol) + r"_history(\d*)\.csv")
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    matches = [(int(m.group(1) or 0), name) for name in names if (m := pattern.fullmatch(name))]
+    return [os.path.join(directory, name) for _, name in sorted(matches)]
+
+
+def _stat(path):
+    stat = os.stat(path)
+    return {"file": os.path.basename(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _same_sources(entry, paths):
+    keys = ("file", "size", "mtime_ns")
+    return [{k: s[k] for k in keys} for s in entry["sources"]] == [_stat(path) for path in paths]
+
+
+def consolidate(paths):
+    '''
+    讀取並合併同一檔股票的多份 CSV，回傳 (以交易日為索引的資料, 各來源檔案的資訊, 去除的重複列數)。
+    日期取字串的前 10 個字元，保留交易所當地的日期，不受時區與夏令時間的位移影響。
+    '''
+    parts, sources = [], []
+    for path in paths:
+        frame = pd.read_csv(path)
+        days = frame.iloc[:, 0].astype(str).str[:10].to_numpy(dtype="datetime64[D]")
+        frame = frame.iloc[:, 1:].set_axis(pd.DatetimeIndex(days), axis=0)
+        parts.append(frame)
+        sources.append({**_stat(path), "rows": len(frame), "start": str(days.min()), "end": str(days.max())})
+    merged = pd.concat(parts)
+    total = len(merged)
+    merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+    return merged, sources, total - len(merged)
+
+
+def _gaps(dates):
+    steps = np.diff(dates).astype(np.int64)
+    return [[str(dates[i]), str(dates[i + 1])] for i in np.flatnonzero(steps > GAP_DAYS)]
+
+
+def _save_npy(path, array):
+    # 先寫入暫存檔再替換，避免其他讀取者看到寫到一半的檔案
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+
+class Dataset:
+    """單一股票的資料集；dates 與 values 都是 memory-map，用到的部分才會從磁碟讀入"""
+
+    def __init__(self, symbol, dates, values, columns):
+        self.symbol = symbol
+        self.dates = dates
+        self.values = values
+        self.columns = list(columns)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def column(self, name):
+        return self.values[:, self.columns.index(name)]
+
+    def matrix(self, columns):
+        # (列數, 欄位數) 的 float32 矩陣，供訓練直接使用；欄位在檔案中相鄰且順序相同時是零複製的 view，否則複製
+        indices = [self.columns.index(name) for name in columns]
+        first = indices[0]
+        if indices == list(range(first, first + len(indices))):
+            return self.values[:, first:first + len(indices)]
+        return self.values[:, indices]
+
+
+class DatasetStore:
+    """
+    欄位式的訓練資料集，由 original data/ 的 CSV 轉換而來，每檔股票一個資料夾，
+    manifest.json 記錄來源目錄與每檔股票的日期涵蓋範圍，讀取時只需要 memory-map 兩個檔案。
+    """
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+        self._manifest = (None, None)  # (mtime, manifest)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    def manifest(self):
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except OSError:
+            return {"format": FORMAT_VERSION, "source": None, "symbols": {}}
+        if self._manifest[0] != mtime:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self._manifest = (mtime, json.load(f))
+        return self._manifest[1]
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    def symbols(self):
+        return sorted(self.manifest()["symbols"])
+
+    def load(self, symbol):
+        entry = self.manifest()["symbols"].get(symbol)
+        if entry is None:
+            raise KeyError(f"{symbol} 尚未轉換成資料集")
+        directory = os.path.join(self.directory, symbol)
+        dates = np.load(os.path.join(directory, "dates.npy"), mmap_mode="r")
+        values = np.load(os.path.join(directory, "values.npy"), mmap_mode="r")
+        return Dataset(symbol, dates, values, entry["columns"])
+
+    def load_all(self, symbols=None):
+        return {symbol: self.load(symbol) for symbol in (symbols or self.symbols())}
+
+    def find(self, symbol, data_dir=DEFAULT_DATA_DIR):
+        # 資料集由 data_dir 轉換而來、且來源 CSV 轉換後沒有變動時回傳 Dataset，否則回傳 None
+        manifest = self.manifest()
+        entry = manifest["symbols"].get(symbol)
+        if entry is None or manifest.get("format") != FORMAT_VERSION or manifest["source"] != os.path.abspath(data_dir):
+            return None
+        if not _same_sources(entry, source_files(data_dir, symbol)):
+            return None
+        return self.load(symbol)
+
+    def convert(self, data_dir=DEFAULT_DATA_DIR, symbols=None, force=False):
+        # 轉換 data_dir 底下的股票，回傳 {代號: "converted" / "unchanged" / "missing"}；來源檔案未變動的股票略過
+        source = os.path.abspath(data_dir)
+        manifest = self.manifest()
+        if manifest.get("format") != FORMAT_VERSION or manifest["source"] != source:
+            # 來源目錄或檔案格式不同，全部重新轉換
+            manifest = {"format": FORMAT_VERSION, "source": source, "symbols": {}}
+        if symbols is None:
+            symbols = sorted(name for name in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, name)))
+
+        results = {}
+        for symbol in symbols:
+            paths = source_files(data_dir, symbol)
+            if not paths:
+                results[symbol] = "missing"
+                continue
+            entry = manifest["symbols"].get(symbol)
+            if not force and entry is not None and _same_sources(entry, paths):
+                results[symbol] = "unchanged"
+                continue
+
+            frame, sources, duplicates = consolidate(paths)
+            # 與訓練程式讀 CSV 後 bfill() 相同；訓練特徵排在最前面
+            frame = frame.bfill()
+            frame = frame[[c for c in TRAINING_FEATURES if c in frame.columns]
+                          + [c for c in frame.columns if c not in TRAINING_FEATURES]]
+            dates = frame.index.to_numpy().astype("datetime64[D]")
+            directory = os.path.join(self.directory, symbol)
+            os.makedirs(directory, exist_ok=True)
+            _save_npy(os.path.join(directory, "dates.npy"), dates)
+            _save_npy(os.path.join(directory, "values.npy"), np.ascontiguousarray(frame.to_numpy(dtype=np.float32)))
+            manifest["symbols"][symbol] = {
+                "rows": len(frame),
+                "start": str(dates[0]),
+                "end": str(dates[-1]),
+                "gaps": _gaps(dates),
+                "duplicates": duplicates,
+                "columns": [str(c) for c in frame.columns],
+                "sources": sources,
+            }
+            results[symbol] = "converted"
+
+        self._save_manifest(manifest)
+        return results
+
+
+# 全域共用的訓練資料集
+dataset_store = DatasetStore()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="將 original data/ 的 CSV 轉換成 memory-map 的訓練資料集")
+    parser.add_argument("--symbols", nargs="+", default=None, help="只轉換這些代號(預設為全部)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--output", default=DEFAULT_DIR)
+    parser.add_argument("--force", action="store_true", help="來源檔案未變動也重新轉換")
+    args = parser.parse_args(argv)
+
+    store = DatasetStore(args.output)
+    started = time.perf_counter()
+    results = store.convert(args.data_dir, args.symbols, args.force)
+    print(f"轉換完成，{time.perf_counter() - started:.2f}s")
+
+    manifest = store.manifest()
+    for symbol, status in results.items():
+        entry = manifest["symbols"].get(symbol)
+        if entry is None:
+            print(f"{symbol}: 找不到 CSV")
+            continue
+        print(f"{symbol}: {status}，{entry['rows']} 列 {entry['start']} ~ {entry['end']}，"
+              f"{len(entry['sources'])} 份 CSV，去除 {entry['duplicates']} 列重複，{len(entry['gaps'])} 個缺口")
+
+    # 讀取所有股票並取出訓練用的矩陣所需的時間
+    started = time.perf_counter()
+    datasets = store.load_all()
+    rows = sum(len(dataset.matrix(dataset.columns)) for dataset in datasets.values())
+    print(f"讀取 {len(datasets)} 檔股票共 {rows} 列: {(time.perf_counter() - started) * 1e3:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+'''
+將服務使用的 Keras 模型(model.keras、model_2.keras)匯出成 TFLite，供推論時使用。
+匯出的 .tflite 放在 .keras 旁邊，模型登錄表發現較新的 .tflite 時會自動改用(SERVING_BACKEND=auto)，
+推論行程不需要匯入 TensorFlow，記憶體與啟動時間都大幅減少，單筆推論約 1 毫秒以內。
+
+匯出後會以隨機視窗比對 Keras 與 TFLite 的輸出(parity)，誤差超過 --atol 時不寫入檔案；
+--benchmark 在獨立的子行程中分別量測兩種格式的匯入與載入時間、推論延遲與記憶體用量。
+
+使用方式(在專案根目錄下)：
+    python backend/py/export_lite.py --benchmark
+    python backend/py/export_lite.py backend/models/TSLA/h5/v3/model.keras
+'''
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 讓匯出程式可以匯入 backend/py 的共用模組
+
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODELS = [os.path.join(MODEL_DIR, name) for name in ("model.keras", "model_2.keras")]
+
+# 匯出的批次大小；推論佇列的批次會補零到最接近的大小，超過最大值時分段執行
+BATCH_SIZES = (1, 8, 64)
+
+
+def convert(keras_path, batch_sizes=BATCH_SIZES):
+    # LSTM 在批次大小不固定時無法轉成 TFLite 內建運算，因此每個批次大小各建立一個凍結後的 signature
+    import tensorflow as tf
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+    model = tf.keras.models.load_model(keras_path)
+    shape = model.input_shape[1:]
+    module = tf.Module()
+    signatures = {}
+    for size in batch_sizes:
+        @tf.function
+        def serve(x):
+            return model(x, training=False)
+
+        frozen = convert_variables_to_constants_v2(serve.get_concrete_function(tf.TensorSpec([size, *shape], tf.float32)))
+        setattr(module, f"batch_{size}", frozen)
+        wrapper = tf.function(lambda x, frozen=frozen: {"output": frozen(x)[0]})  # 凍結後的函式回傳輸出張量的串列
+        signatures[f"batch_{size}"] = wrapper.get_concrete_function(tf.TensorSpec([size, *shape], tf.float32, name="x"))
+
+    saved_dir = tempfile.mkdtemp(prefix="export_lite_")
+    try:
+        tf.saved_model.save(module, saved_dir, signatures=signatures)
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_dir, signature_keys=list(signatures))
+        return model, converter.convert()
+    finally:
+        shutil.rmtree(saved_dir, ignore_errors=True)
+
+
+def check_parity(model, lite_model, batch_sizes=(1, 3, 8, 50, 130), seed=0):
+    # 比對 Keras 與 TFLite 對相同隨機視窗的輸出，回傳最大絕對誤差
+    rng = np.random.default_rng(seed)
+    worst = 0.0
+    for size in batch_sizes:
+        x = rng.random((size, *model.input_shape[1:]), dtype=np.float32)
+        expected = model.predict(x, verbose=0)
+        actual = lite_model.predict(x)
+        worst = max(worst, float(np.max(np.abs(expected - actual))))
+    return worst
+
+
+def export(keras_path, atol=1e-4, batch_sizes=BATCH_SIZES):
+    from py.lite_model import LiteModel
+
+    lite_path = os.path.splitext(keras_path)[0] + ".tflite"
+    model, flatbuffer = convert(keras_path, batch_sizes)
+
+    # 先寫到暫存檔驗證，通過後才以原子替換放到正式位置，避免模型監看執行緒讀到不完整或錯誤的檔案
+    tmp_path = lite_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(flatbuffer)
+    try:
+        error = check_parity(model, LiteModel(tmp_path))
+        if error > atol:
+            raise ValueError(f"{keras_path} 轉換後最大誤差 {error:.2e} 超過 {atol:.0e}")
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, lite_path)
+    return lite_path, error
+
+
+def _rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def _bench_child(backend, path, repeat=50):
+    # 在乾淨的子行程中量測，匯入時間與記憶體才不會受到其他格式影響
+    started = time.perf_counter()
+    if backend == "tflite":
+        from py.lite_model import LiteModel
+        imported = time.perf_counter()
+        model = LiteModel(path)
+    else:
+        from tensorflow.keras.models import load_model
+        imported = time.perf_counter()
+        model = load_model(path)
+    loaded = time.perf_counter()
+
+    shape = model.input_shape[1:]
+    result = {"backend": backend, "import_s": imported - started, "load_s": loaded - imported}
+    for size in (1, 8, 50):
+        x = np.random.default_rng(0).random((size, *shape), dtype=np.float32)
+        model.predict(x, verbose=0)
+        times = []
+        for _ in range(repeat if backend == "tflite" else max(5, repeat // 5)):
+            t = time.perf_counter()
+            model.predict(x, verbose=0)
+            times.append(time.perf_counter() - t)
+        result[f"p50_ms_batch_{size}"] = float(np.median(times) * 1e3)
+    result["rss_mb"] = _rss_mb()
+    print(json.dumps(result))
+
+
+def benchmark(keras_path):
+    lite_path = os.path.splitext(keras_path)[0] + ".tflite"
+    results = []
+    for backend, path in (("keras", keras_path), ("tflite", lite_path)):
+        env = {**os.environ, "TF_CPP_MIN_LOG_LEVEL": "3"}
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--bench-child", backend, path],
+                             capture_output=True, text=True, env=env, check=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="將 Keras 模型匯出成 TFLite")
+    parser.add_argument("models", nargs="*", default=DEFAULT_MODELS, help="要匯出的 .keras 檔")
+    parser.add_argument("--atol", type=float, default=1e-4, help="parity 檢查允許的最大絕對誤差")
+    parser.add_argument("--benchmark", action="store_true", help="比較 Keras 與 TFLite 的延遲與記憶體")
+    parser.add_argument("--bench-child", nargs=2, metavar=("BACKEND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.bench_child:
+        _bench_child(*args.bench_child)
+        return 0
+
+    failed = False
+    for keras_path in args.models:
+        try:
+            lite_path, error = export(keras_path, args.atol)
+        except Exception as e:
+            print(f"{keras_path} 匯出失敗: {e}")
+            failed = True
+            continue
+        print(f"{keras_path} -> {lite_path} (最大誤差 {error:.2e})")
+        if args.benchmark:
+            for result in benchmark(keras_path):
+                print("  " + "  ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
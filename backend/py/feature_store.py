@@ -0,0 +1,106 @@
+import os
+import queue
+import threading
+
+import pandas as pd
+
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "features")
+
+
+class FeatureSnapshotStore:
+    """
+    特徵快照：把預測時算好的特徵(日線加技術指標，已向後填充)依代號與日期存成 CSV。
+    寫入交給背景執行緒處理，請求只負責放進有上限的佇列，佇列滿時直接捨棄並計數，
+    不會讓請求等待磁碟。
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, max_pending=256):
+        self.directory = directory
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._pid = os.getpid()
+        self.written = 0
+        self.dropped = 0
+
+    def path(self, symbol, day):
+        return os.path.join(self.directory, symbol, f"{day}.csv")
+
+    def submit(self, symbol, frame):
+        # frame 交給背景執行緒寫入後，呼叫端不可以再修改它
+        if frame.empty:
+            return False
+        day = pd.Timestamp(frame.index[-1]).strftime("%Y-%m-%d")
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((symbol, day, frame))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def flush(self):
+        # 等待佇列中的快照全部寫完
+        self._queue.join()
+
+    def _ensure_worker(self):
+        if self._pid != os.getpid():
+            # fork 出來的子行程中父行程的執行緒不存在，佇列與鎖也可能停在 fork 當下的狀態，全部重新建立
+            self._queue = queue.Queue(maxsize=self.max_pending)
+            self._worker = None
+            self._worker_lock = threading.Lock()
+            self._pid = os.getpid()
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="feature-writer", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            symbol, day, frame = self._queue.get()
+            try:
+                path = self.path(symbol, day)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # 日期只寫在索引欄，不再重複輸出 date 欄位
+                frame.drop(columns="date", errors="ignore").rename_axis("date").to_csv(path + ".tmp", index=True)
+                os.replace(path + ".tmp", path)
+                self.written += 1
+            except OSError as e:
+                print(f"特徵快照寫入失敗 {symbol} {day}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def days(self, symbol):
+        directory = os.path.join(self.directory, symbol)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(directory) if name.endswith(".csv"))
+
+    def load(self, symbol, day=None):
+        # 讀取指定日期的快照，未指定時讀最新的一份
+        if day is None:
+            days = self.days(symbol)
+            if not days:
+                raise FileNotFoundError(f"{symbol} 沒有特徵快照")
+            day = days[-1]
+        frame = pd.read_csv(self.path(symbol, day), index_col=0)
+        # 日期取字串的前 10 個字元，保留交易所當地的日期，不受時區與夏令時間的位移影響
+        frame.index = pd.DatetimeIndex(frame.index.astype(str).str[:10])
+        # 舊版快照同時有 date 索引與 date 欄位，讀取時第二個會被改名為 date.1
+        return frame.drop(columns=["date", "date.1"], errors="ignore").rename_axis("date")
+
+    def history(self, symbol):
+        # 合併所有快照成一段特徵歷史，同一天以較新的快照為準，供訓練腳本使用
+        frames = [self.load(symbol, day) for day in self.days(symbol)]
+        if not frames:
+            raise FileNotFoundError(f"{symbol} 沒有特徵快照")
+        data = pd.concat(frames)
+        return data[~data.index.duplicated(keep="last")].sort_index()
+
+
+# 全域共用的特徵快照庫
+feature_store = FeatureSnapshotStore()
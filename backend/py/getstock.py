@@ -1,17 +1,28 @@
 import os
-import pandas as pd
-import yfinance as yf
-from talib import abstract
+import threading
+import weakref
+
+from py.bar_store import bar_store as default_bar_store
+from py.indicator_engine import IndicatorEngine
+from py.indicators import add_indicators_batch
+from py.quote_cache import quote_cache
 
 
 class StockData:
-    def __init__(self, symbol):
+    def __init__(self, symbol, bar_store=None, provider=None):
         self.symbol = symbol
-        self.stock = yf.Ticker(symbol)
+        self.bar_store = bar_store or default_bar_store
+        # 報價與不指定日期的歷史資料直接向上游查詢，預設與日線資料庫使用同一個來源
+        self.provider = provider or self.bar_store.provider
+        self.indicator_engine = _engine_for(self.bar_store)
+
+    def fetch_info(self):
+        # 報價與基本面共用同一份 info，並透過共用快取合併同時發出的請求
+        return quote_cache.get(self.symbol, lambda: self.provider.fetch_info(self.symbol))
 
     def fetch_current_data(self):
         # 獲取股票的當前詳細資訊
-        info = self.stock.info
+        info = self.fetch_info()
 
         # 篩選並整理出需要的股票資訊
         relevant_info = {
@@ -29,23 +40,27 @@ class StockData:
         return relevant_info
 
     def fetch_historical_data(self, start_date, end_date):
-        hist = self.stock.history(start=start_date, end=end_date)
-        hist.columns = [
-            "open",
-            "high",
-            "low",
-            "close",
-            "volume",
-            "dividends",
-            "stock splits",
-        ]
+        if start_date and end_date:
+            # 從本地日線資料庫讀取，只向上游補抓缺少的日期
+            hist = self.bar_store.get(self.symbol, start_date, end_date)
+        else:
+            hist = self.provider.fetch_history(self.symbol, start_date, end_date)
         hist['date'] = hist.index  # 將索引（日期）轉移到一個新的列中
         hist.index = range(len(hist))  # 重置索引
         return hist
 
 
+    def fetch_indicator_data(self, start_date, end_date):
+        # 指標接續保存的狀態，只計算新收盤的K棒，再取出查詢的區間
+        bars = self.bar_store.get(self.symbol, start_date, end_date)
+        data = bars.join(self.indicator_engine.compute(self.symbol, bars))
+
+        data['date'] = data.index  # 將索引（日期）轉移到一個新的列中
+        data.index = range(len(data))  # 重置索引
+        return data
+
     def fetch_fundamentals(self):
-        info = self.stock.info
+        info = self.fetch_info()
         fundamentals = {
             "Market Cap": info.get("marketCap"),
             "Enterprise Value": info.get("enterpriseValue"),
@@ -83,13 +98,21 @@ class StockData:
     def add_technical_indicators(
         self, data, indicators=["MACD", "RSI", "MOM", "STOCH"]
     ):
-        for indicator in indicators:
-            output = abstract.Function(indicator)(data)
-            if isinstance(output, pd.DataFrame):
-                data = data.join(output)
-            else:
-                data[indicator] = output
-        return data
+        # 以 NumPy 批次核心計算，欄位名稱與 TA-Lib 的輸出相同，不需要安裝 TA-Lib
+        return add_indicators_batch({self.symbol: data}, indicators)[self.symbol]
+
+
+# 每個日線資料庫共用一個指標引擎；以物件本身為鍵，日線資料庫被回收時引擎也一併移除
+_engines = weakref.WeakKeyDictionary()
+_engines_lock = threading.Lock()
+
+
+def _engine_for(bar_store):
+    with _engines_lock:
+        engine = _engines.get(bar_store)
+        if engine is None:
+            engine = _engines[bar_store] = IndicatorEngine(bar_store)
+        return engine
 
 
 # Usage
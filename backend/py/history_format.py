@@ -0,0 +1,171 @@
+'''
+/gethistory 的回應格式(format 參數)：
+- records：預設，逐列的物件陣列，HistoryStock.vue 使用的原本格式
+- columns：欄位導向 JSON，每個欄位一個陣列，欄位名稱只出現一次
+- ndjson：每列一行 JSON，分段以 chunked transfer 送出，不必在記憶體中組出整份回應
+- arrow：Apache Arrow IPC 串流(需要安裝 pyarrow)，前端可以用 apache-arrow 直接讀取
+
+limit 與 cursor 用來分頁：cursor 是上一頁最後一根K棒的日期，新K棒加入時不會讓頁面錯位。
+用戶端接受 gzip 時回應會壓縮，串流格式逐段壓縮並立即送出。
+'''
+
+import io
+import json
+import zlib
+
+import numpy as np
+import pandas as pd
+from werkzeug.http import parse_accept_header
+
+
+CONTENT_TYPES = {
+    "records": "application/json",
+    "columns": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# ndjson 每段的列數
+CHUNK_ROWS = 500
+
+# 小於這個大小的回應不壓縮
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 1  # 數值資料以等級 1 壓縮的大小只比等級 6 多約 7%，CPU 時間約為六分之一
+
+# 浮點數輸出的小數位數，與 pandas 的預設相同；日線價格原本就是 float32，更多位數只會輸出沒有意義的雜訊
+DOUBLE_PRECISION = 10
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise ValueError("format=arrow 需要安裝 pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def parse_day(value, name):
+    # 解析日期參數，回傳不含時區的 Timestamp；格式不正確時丟出 ValueError
+    try:
+        return _naive(pd.DatetimeIndex([value]))[0]
+    except (ValueError, TypeError):
+        raise ValueError(f"{name} must be a date such as 2024-05-01") from None
+
+
+def parse_history_args(args):
+    # 回傳 (format, limit, cursor)，參數不正確時丟出 ValueError；start_date 與 end_date 只檢查格式
+    fmt = args.get('format', 'records')
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"format must be one of {sorted(CONTENT_TYPES)}")
+    if fmt == 'arrow':
+        _import_pyarrow()
+
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            raise ValueError("limit must be a positive integer")
+
+    for name in ('start_date', 'end_date'):
+        if args.get(name):
+            parse_day(args[name], name)
+
+    cursor = args.get('cursor')
+    if cursor is not None:
+        cursor = parse_day(cursor, 'cursor')
+    return fmt, limit, cursor
+
+
+def _naive(dates):
+    dates = pd.DatetimeIndex(dates)
+    return dates.tz_localize(None) if dates.tz is not None else dates
+
+
+def paginate(frame, limit=None, cursor=None):
+    # 取 cursor 之後最多 limit 根K棒，回傳 (該頁資料, 下一頁的 cursor；沒有下一頁時為 None)
+    if cursor is not None:
+        frame = frame[_naive(frame['date']).normalize() > cursor]
+    if limit is None or len(frame) <= limit:
+        return frame, None
+    frame = frame.iloc[:limit]
+    return frame, _naive(frame['date'][-1:])[0].strftime('%Y-%m-%d')
+
+
+def _iso_dates(frame):
+    frame = frame.copy()
+    # 以 NumPy 一次轉換整欄日期，比逐一 strftime 快很多
+    frame['date'] = np.datetime_as_string(_naive(frame['date']).values, unit='D')
+    return frame
+
+
+def columns_body(stock_code, frame, next_cursor=None):
+    # 每個欄位交給 pandas 的 C 實作各自輸出成 JSON 陣列，再直接串成一份回應，缺值輸出為 null
+    frame = _iso_dates(frame)
+    columns = ",".join(
+        f"{json.dumps(str(name))}:{frame[name].to_json(orient='values', double_precision=DOUBLE_PRECISION)}"
+        for name in frame.columns
+    )
+    body = f'{{"stock_code":{json.dumps(stock_code)},"rows":{len(frame)},"historical_data":{{{columns}}}'
+    if next_cursor is not None:
+        body += f',"next_cursor":{json.dumps(next_cursor)}'
+    return (body + "}").encode("utf-8")
+
+
+def ndjson_chunks(frame, chunk_rows=CHUNK_ROWS):
+    # 每次只轉換 chunk_rows 列，回應邊產生邊送出
+    frame = _iso_dates(frame)
+    for start in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows].to_json(
+            orient='records', lines=True, double_precision=DOUBLE_PRECISION)
+        yield (chunk if chunk.endswith("\n") else chunk + "\n").encode("utf-8")
+
+
+def arrow_body(frame):
+    pa = _import_pyarrow()
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=CHUNK_ROWS * 10)
+    return sink.getvalue()
+
+
+def render(stock_code, frame, fmt, next_cursor=None):
+    # records 以外的格式：回傳 (bytes 或產生 bytes 的 iterator, 回應標頭)
+    headers = {"Content-Type": CONTENT_TYPES[fmt]}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    if fmt == 'columns':
+        return columns_body(stock_code, frame, next_cursor), headers
+    if fmt == 'ndjson':
+        return ndjson_chunks(frame), headers
+    return arrow_body(frame), headers
+
+
+def accepts_gzip(accept_encoding):
+    return parse_accept_header(accept_encoding).quality("gzip") > 0
+
+
+def gzip_body(body, headers):
+    # 回傳壓縮後的內容，並在 headers 加上對應的標頭
+    if not isinstance(body, (bytes, bytearray)):
+        headers["Content-Encoding"] = "gzip"
+        return _gzip_stream(body)
+    if len(body) < GZIP_MIN_BYTES:
+        return body
+    headers["Content-Encoding"] = "gzip"
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def _gzip_stream(chunks):
+    # 每段壓縮後以 Z_SYNC_FLUSH 送出，用戶端不必等整份回應完成就能解壓縮
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
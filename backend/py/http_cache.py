@@ -0,0 +1,47 @@
+'''
+HTTP 快取標頭：ETag 由決定回應內容的因素(代號、最後一根已收盤K棒、模型版本、查詢參數)計算，
+不需要先算出回應；用戶端帶來的 If-None-Match 相符時直接回 304，瀏覽器與 CDN 可以沿用手上的副本。
+Cache-Control 依端點設定：即時報價只快取很短的時間，預測與已收盤的歷史資料快取到下一次收盤。
+'''
+
+import hashlib
+from datetime import datetime, timezone
+
+from werkzeug.http import parse_etags, quote_etag, unquote_etag
+
+from py.market_calendar import next_close
+
+
+NO_STORE = "no-store"
+
+
+def make_etag(*parts):
+    # 同一份內容壓縮與否的位元組不同，因此使用弱 ETag
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:32]
+    return quote_etag(digest, weak=True)
+
+
+def body_etag(body):
+    # 無法事先得知內容的端點(即時報價)以回應本身計算
+    return quote_etag(hashlib.sha1(body).hexdigest()[:32], weak=True)
+
+
+def query_items(args):
+    # Flask 的 request.args 與 Starlette 的 query_params 都轉成排序後的 (名稱, 值) 串列
+    items = args.multi_items() if hasattr(args, "multi_items") else args.items(multi=True)
+    return sorted(items)
+
+
+def is_not_modified(if_none_match, etag):
+    # 比對時忽略弱 ETag 的 W/ 前綴(RFC 9110 的弱比較)
+    return etag is not None and bool(if_none_match) and parse_etags(if_none_match).contains_weak(unquote_etag(etag)[0])
+
+
+def public(max_age):
+    return f"public, max-age={max(int(max_age), 0)}"
+
+
+def seconds_until_close(symbol, now=None):
+    # 到下一次收盤(含等待上游更新的時間)為止的秒數
+    now = datetime.now(timezone.utc) if now is None else now
+    return (next_close(symbol, now) - now).total_seconds()
@@ -0,0 +1,251 @@
+import json
+import os
+import threading
+from collections import deque
+
+import pandas as pd
+
+from py.market_calendar import completed_until
+
+
+# 與 TA-Lib 預設參數相同
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_PERIOD = 14
+MOM_PERIOD = 10
+STOCH_FASTK, STOCH_SLOWK, STOCH_SLOWD = 5, 3, 3
+
+INDICATOR_COLUMNS = ["macd", "macdsignal", "macdhist", "RSI", "MOM", "slowk", "slowd"]
+
+NAN = float("nan")
+
+# 保存的指標最多保留的K棒數(約一年)，查詢區間的起點在這之內都能直接接續
+MAX_ROWS = 260
+
+
+class IndicatorState:
+    """
+    單一股票的指標狀態：EMA、RSI 平均漲跌幅、動量緩衝區與隨機指標的高低點視窗。
+    每收到一根新K棒只需 O(1) 更新，暖機階段的種子值與 TA-Lib 的計算方式相同，
+    所以對同一段K棒的輸出會與 TA-Lib 一致(誤差在浮點數範圍內)。
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.last_timestamp = None
+
+        # MACD：TA-Lib 讓快、慢 EMA 在同一根K棒以各自期間的簡單平均作為種子
+        self.seed_closes = deque(maxlen=MACD_SLOW)
+        self.fast_ema = None
+        self.slow_ema = None
+        self.seed_macd = []
+        self.signal = None
+
+        # RSI：Wilder 平滑的平均漲幅與跌幅
+        self.prev_close = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+        # MOM：保留最近 MOM_PERIOD + 1 根收盤價
+        self.mom_closes = deque(maxlen=MOM_PERIOD + 1)
+
+        # STOCH：最高價、最低價視窗，以及 fast %K、slow %K 的移動平均視窗
+        self.highs = deque(maxlen=STOCH_FASTK)
+        self.lows = deque(maxlen=STOCH_FASTK)
+        self.fastk = deque(maxlen=STOCH_SLOWK)
+        self.slowk = deque(maxlen=STOCH_SLOWD)
+
+    def update(self, high, low, close):
+        index = self.count
+        self.count += 1
+        return self._macd(index, close) + (self._rsi(index, close), self._mom(close)) + self._stoch(high, low, close)
+
+    def _macd(self, index, close):
+        k_fast = 2.0 / (MACD_FAST + 1)
+        k_slow = 2.0 / (MACD_SLOW + 1)
+        k_signal = 2.0 / (MACD_SIGNAL + 1)
+
+        if self.slow_ema is None:
+            self.seed_closes.append(close)
+            if index < MACD_SLOW - 1:
+                return NAN, NAN, NAN
+            closes = list(self.seed_closes)
+            self.slow_ema = sum(closes) / MACD_SLOW
+            self.fast_ema = sum(closes[-MACD_FAST:]) / MACD_FAST
+            self.seed_closes.clear()
+        else:
+            self.fast_ema += (close - self.fast_ema) * k_fast
+            self.slow_ema += (close - self.slow_ema) * k_slow
+
+        macd = self.fast_ema - self.slow_ema
+        if self.signal is None:
+            self.seed_macd.append(macd)
+            if len(self.seed_macd) < MACD_SIGNAL:
+                return NAN, NAN, NAN
+            self.signal = sum(self.seed_macd) / MACD_SIGNAL
+            self.seed_macd = []
+        else:
+            self.signal += (macd - self.signal) * k_signal
+        return macd, self.signal, macd - self.signal
+
+    def _rsi(self, index, close):
+        if self.prev_close is None:
+            self.prev_close = close
+            return NAN
+        change = close - self.prev_close
+        self.prev_close = close
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+
+        if index < RSI_PERIOD:
+            # 暖機階段先累加漲跌幅，第 RSI_PERIOD 根時取平均
+            self.avg_gain += gain
+            self.avg_loss += loss
+            return NAN
+        if index == RSI_PERIOD:
+            self.avg_gain = (self.avg_gain + gain) / RSI_PERIOD
+            self.avg_loss = (self.avg_loss + loss) / RSI_PERIOD
+        else:
+            self.avg_gain = (self.avg_gain * (RSI_PERIOD - 1) + gain) / RSI_PERIOD
+            self.avg_loss = (self.avg_loss * (RSI_PERIOD - 1) + loss) / RSI_PERIOD
+
+        total = self.avg_gain + self.avg_loss
+        return 100.0 * self.avg_gain / total if total != 0 else 0.0
+
+    def _mom(self, close):
+        self.mom_closes.append(close)
+        if len(self.mom_closes) <= MOM_PERIOD:
+            return NAN
+        return close - self.mom_closes[0]
+
+    def _stoch(self, high, low, close):
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.highs) < STOCH_FASTK:
+            return NAN, NAN
+        highest, lowest = max(self.highs), min(self.lows)
+        diff = highest - lowest
+        self.fastk.append((close - lowest) / diff * 100.0 if diff != 0 else 0.0)
+        if len(self.fastk) < STOCH_SLOWK:
+            return NAN, NAN
+        self.slowk.append(sum(self.fastk) / STOCH_SLOWK)
+        if len(self.slowk) < STOCH_SLOWD:
+            return NAN, NAN
+        return self.slowk[-1], sum(self.slowk) / STOCH_SLOWD
+
+    def to_dict(self):
+        state = dict(self.__dict__)
+        for key, value in state.items():
+            if isinstance(value, deque):
+                state[key] = list(value)
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        obj = cls()
+        for key, value in state.items():
+            current = getattr(obj, key, None)
+            if isinstance(current, deque):
+                current.extend(value)
+            else:
+                setattr(obj, key, value)
+        return obj
+
+
+class IndicatorEngine:
+    """
+    依股票代號保存指標狀態，並與日線資料庫存放在同一個目錄，
+    重新啟動後可從上次的狀態接續，只需計算新收盤的K棒。
+
+    狀態從第一次計算時那段K棒的第一根(原點)開始暖機，之後固定在這個原點，
+    查詢區間每天往後移動時只把新收盤的K棒餵給狀態，再從保存的指標中取出查詢的區間；
+    結果等於 TA-Lib 從原點開始計算的值。查詢區間的起點早於保存的指標、K棒不連續，
+    或之前的K棒因除權息被重新還原時，才從這段K棒的第一根重新暖機。
+    保存的指標只保留最近 max_rows 根K棒，大小不會隨時間增加。
+    """
+
+    def __init__(self, bar_store, max_rows=MAX_ROWS):
+        self.bar_store = bar_store
+        self.max_rows = max_rows
+        self._memory = {}  # symbol -> (mtime, state, frame)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _paths(self, symbol):
+        return (
+            os.path.join(self.bar_store.directory, f"{symbol}.indicators.json"),
+            os.path.join(self.bar_store.directory, f"{symbol}.indicators.pkl"),
+        )
+
+    def _load(self, symbol):
+        state_path, frame_path = self._paths(symbol)
+        try:
+            mtime = os.path.getmtime(state_path)
+        except OSError:
+            return None, None
+
+        # 磁碟檔案未變動時直接使用記憶體中的副本；其他行程更新過時重新讀取
+        cached = self._memory.get(symbol)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        with open(state_path, encoding="utf-8") as f:
+            state = IndicatorState.from_dict(json.load(f))
+        frame = pd.read_pickle(frame_path)
+        self._memory[symbol] = (mtime, state, frame)
+        return state, frame
+
+    def _save(self, symbol, state, frame):
+        # 指標檔寫在狀態檔之前，狀態檔的修改時間代表整組資料的版本
+        os.makedirs(self.bar_store.directory, exist_ok=True)
+        state_path, frame_path = self._paths(symbol)
+        frame.to_pickle(frame_path + ".tmp")
+        os.replace(frame_path + ".tmp", frame_path)
+        with open(state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state.to_dict(), f)
+        os.replace(state_path + ".tmp", state_path)
+        self._memory[symbol] = (os.path.getmtime(state_path), state, frame)
+
+    def compute(self, symbol, bars):
+        # bars 必須是連續的日線；回傳與 bars 對齊的指標欄位
+        if bars.empty:
+            return pd.DataFrame(columns=INDICATOR_COLUMNS, index=bars.index, dtype=float)
+
+        with self._lock(symbol):
+            state, frame = self._load(symbol)
+            last = None if state is None else pd.Timestamp(state.last_timestamp)
+            resumable = (
+                state is not None
+                and not frame.empty
+                and frame.index[0] <= bars.index[0]  # 保存的指標涵蓋查詢區間的起點
+                and last in bars.index
+                and bars.at[last, "close"] == state.prev_close  # 之前的K棒沒有因除權息被重新還原
+            )
+            if not resumable:
+                # 沒有可接續的狀態，從這段K棒的第一根重新暖機
+                state, frame = IndicatorState(), pd.DataFrame(columns=INDICATOR_COLUMNS, dtype=float)
+                new_bars = bars
+            else:
+                new_bars = bars[bars.index > last]
+
+            # 尚未收盤的K棒還會變動，只有已收盤的K棒會寫入保存的狀態
+            dates = new_bars.index.tz_localize(None) if new_bars.index.tz is not None else new_bars.index
+            until = completed_until(symbol)
+            closed, pending = new_bars[dates < until], new_bars[dates >= until]
+
+            if not closed.empty:
+                rows = [state.update(h, l, c) for h, l, c in zip(closed["high"], closed["low"], closed["close"])]
+                state.last_timestamp = closed.index[-1].isoformat()
+                closed_frame = pd.DataFrame(rows, columns=INDICATOR_COLUMNS, index=closed.index)
+                frame = closed_frame if frame.empty else pd.concat([frame, closed_frame])
+                # 這次查詢仍回傳完整的結果，保存時只留最近 max_rows 根
+                self._save(symbol, state, frame.iloc[-self.max_rows:])
+
+        result = frame
+        if not pending.empty:
+            preview = IndicatorState.from_dict(state.to_dict())
+            rows = [preview.update(h, l, c) for h, l, c in zip(pending["high"], pending["low"], pending["close"])]
+            result = pd.concat([frame, pd.DataFrame(rows, columns=INDICATOR_COLUMNS, index=pending.index)])
+        return result.reindex(bars.index)
@@ -0,0 +1,212 @@
+'''
+純 NumPy 的批次技術指標：輸入 (股票數 × 時間) 的二維陣列，一次算出所有股票的
+MACD、RSI、MOM 與 STOCH，不需要 TA-Lib 的 C 函式庫。
+暖機方式與 TA-Lib 預設參數相同，欄位名稱也與 abstract.Function 的輸出一致。
+'''
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+if __name__ == "__main__":
+    # 直接執行時讓檢查程式可以匯入 backend/py 的共用模組。backend/py 沒有 __init__.py，
+    # 環境中裝有同名的 py 模組(pytest 附帶的 site-packages/py.py)時 namespace package 會被它蓋過，
+    # 因此與 tests/conftest.py 相同，直接以這個資料夾建立 py 套件
+    import types
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.modules["py"] = types.ModuleType("py")
+    sys.modules["py"].__path__ = [os.path.dirname(os.path.abspath(__file__))]
+
+from py.indicator_engine import (
+    MACD_FAST, MACD_SLOW, MACD_SIGNAL, RSI_PERIOD, MOM_PERIOD,
+    STOCH_FASTK, STOCH_SLOWK, STOCH_SLOWD, INDICATOR_COLUMNS,
+)
+
+
+# 每個指標對應的輸出欄位
+INDICATOR_OUTPUTS = {
+    "MACD": ["macd", "macdsignal", "macdhist"],
+    "RSI": ["RSI"],
+    "MOM": ["MOM"],
+    "STOCH": ["slowk", "slowd"],
+}
+
+
+# 指數平滑每次處理的時間區塊長度
+EMA_BLOCK = 32
+
+
+def _ema(values, k, seed):
+    # values 為 (時間, ...)，y[0] = seed，之後 y[t] = y[t-1] + (x[t] - y[t-1]) * k。
+    # 以區塊矩陣乘法代替逐日的 Python 迴圈：區塊內每一天都是前一區塊最後一天的值
+    # 與區塊內輸入的加權和，權重是 (1-k) 的次方，不會有數值爆增的問題
+    decay = 1.0 - k
+    n = len(values)
+    flat = values.reshape(n, -1)
+    out = np.empty(flat.shape)
+    out[0] = prev = np.broadcast_to(seed, values.shape[1:]).reshape(-1)
+
+    lag = np.arange(EMA_BLOCK)[:, np.newaxis] - np.arange(EMA_BLOCK)[np.newaxis, :]
+    weights = np.where(lag >= 0, k * decay ** np.maximum(lag, 0), 0.0)
+    carry = decay ** np.arange(1, EMA_BLOCK + 1)[:, np.newaxis]
+    for start in range(1, n, EMA_BLOCK):
+        stop = min(start + EMA_BLOCK, n)
+        size = stop - start
+        out[start:stop] = weights[:size, :size] @ flat[start:stop] + carry[:size] * prev
+        prev = out[stop - 1]
+    return out.reshape(values.shape)
+
+
+def _rolling(ufunc, values, period):
+    # 以錯位切片做滾動運算，回傳長度為 T - period + 1
+    n = len(values) - period + 1
+    result = values[:n].copy()
+    for offset in range(1, period):
+        ufunc(result, values[offset:offset + n], out=result)
+    return result
+
+
+def macd(close):
+    line = np.full_like(close, np.nan)
+    signal = np.full_like(close, np.nan)
+    start = MACD_SLOW - 1
+    if len(close) <= start + MACD_SIGNAL - 1:
+        return line, signal, line - signal
+
+    # TA-Lib 讓快、慢 EMA 都在慢線的第一個有效位置開始，各以自己期間的簡單平均作為種子
+    tail = close[start:]
+    fast = _ema(tail, 2.0 / (MACD_FAST + 1), close[start - MACD_FAST + 1:start + 1].mean(axis=0))
+    slow = _ema(tail, 2.0 / (MACD_SLOW + 1), close[:start + 1].mean(axis=0))
+    macd_line = fast - slow
+
+    signal_start = MACD_SIGNAL - 1
+    signal[start + signal_start:] = _ema(macd_line[signal_start:], 2.0 / (MACD_SIGNAL + 1), macd_line[:signal_start + 1].mean(axis=0))
+    line[start + signal_start:] = macd_line[signal_start:]
+    return line, signal, line - signal
+
+
+def rsi(close):
+    out = np.full_like(close, np.nan)
+    if len(close) <= RSI_PERIOD:
+        return out
+    change = np.diff(close, axis=0)
+    moves = np.stack([np.clip(change, 0, None), np.clip(-change, 0, None)], axis=1)  # (時間, 漲/跌, 股票數)
+
+    # Wilder 平滑：avg = avg + (move - avg) / period，漲跌幅疊在一起同時計算
+    seed = moves[:RSI_PERIOD].mean(axis=0)
+    averages = _ema(moves[RSI_PERIOD - 1:], 1.0 / RSI_PERIOD, seed)
+    gain, total = averages[:, 0], averages[:, 0] + averages[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[RSI_PERIOD:] = np.where(total != 0, 100.0 * gain / total, 0.0)
+    return out
+
+
+def mom(close):
+    out = np.full_like(close, np.nan)
+    out[MOM_PERIOD:] = close[MOM_PERIOD:] - close[:-MOM_PERIOD]
+    return out
+
+
+def stoch(high, low, close):
+    slowk = np.full_like(close, np.nan)
+    slowd = np.full_like(close, np.nan)
+    lookback = (STOCH_FASTK - 1) + (STOCH_SLOWK - 1) + (STOCH_SLOWD - 1)
+    if len(close) <= lookback:
+        return slowk, slowd
+
+    highest = _rolling(np.maximum, high, STOCH_FASTK)
+    lowest = _rolling(np.minimum, low, STOCH_FASTK)
+    diff = highest - lowest
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fastk = np.where(diff != 0, (close[STOCH_FASTK - 1:] - lowest) / diff * 100.0, 0.0)
+    k = _rolling(np.add, fastk, STOCH_SLOWK) / STOCH_SLOWK
+    d = _rolling(np.add, k, STOCH_SLOWD) / STOCH_SLOWD
+
+    # TA-Lib 的 slowk 與 slowd 從同一個位置開始輸出
+    slowk[lookback:] = k[STOCH_SLOWD - 1:]
+    slowd[lookback:] = d
+    return slowk, slowd
+
+
+def compute_indicators(high, low, close):
+    # 輸入為 (股票數, 時間) 或單一股票的一維陣列，回傳欄位名稱對應的同形狀陣列
+    squeeze = np.ndim(close) == 1
+    # 內部轉成 (時間, 股票數) 的連續陣列，讓沿時間軸的遞迴每一步都讀取連續記憶體
+    high, low, close = (np.ascontiguousarray(np.atleast_2d(np.asarray(a, dtype=np.float64)).T) for a in (high, low, close))
+
+    result = dict(zip(["macd", "macdsignal", "macdhist"], macd(close)))
+    result["RSI"] = rsi(close)
+    result["MOM"] = mom(close)
+    result["slowk"], result["slowd"] = stoch(high, low, close)
+    if squeeze:
+        return {name: values[:, 0] for name, values in result.items()}
+    return {name: values.T for name, values in result.items()}
+
+
+def add_indicators_batch(frames, indicators=("MACD", "RSI", "MOM", "STOCH")):
+    # frames 為 {代號: 日線 DataFrame}；K棒數相同的股票疊成一個二維陣列一起計算
+    columns = [c for name in indicators for c in INDICATOR_OUTPUTS[name]]
+    groups = {}
+    for symbol, frame in frames.items():
+        groups.setdefault(len(frame), []).append(symbol)
+
+    result = {}
+    for symbols in groups.values():
+        stacked = {
+            field: np.stack([frames[s][field].to_numpy(dtype=np.float64) for s in symbols])
+            for field in ("high", "low", "close")
+        }
+        values = compute_indicators(stacked["high"], stacked["low"], stacked["close"])
+        block = np.stack([values[column] for column in columns], axis=-1)  # (股票數, 時間, 欄位數)
+        for row, symbol in enumerate(symbols):
+            frame = frames[symbol]
+            result[symbol] = pd.concat([frame, pd.DataFrame(block[row], index=frame.index, columns=columns)], axis=1)
+    return result
+
+
+if __name__ == "__main__":
+    # 與 TA-Lib 的一致性檢查與效能比較(需要另外安裝 TA-Lib)
+    from talib import abstract
+
+    rng = np.random.default_rng(0)
+    n_symbols, n_bars = 300, 2520
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_symbols, n_bars)), axis=1))
+    high = close * (1 + rng.uniform(0, 0.02, close.shape))
+    low = close * (1 - rng.uniform(0, 0.02, close.shape))
+    frames = {
+        f"S{i}": pd.DataFrame({"open": close[i], "high": high[i], "low": low[i], "close": close[i], "volume": 1.0})
+        for i in range(n_symbols)
+    }
+
+    start = time.perf_counter()
+    expected = {}
+    for symbol, frame in frames.items():
+        data = frame
+        for indicator in ["MACD", "RSI", "MOM", "STOCH"]:
+            output = abstract.Function(indicator)(data)
+            if isinstance(output, pd.DataFrame):
+                data = data.join(output)
+            else:
+                data[indicator] = output
+        expected[symbol] = data
+    talib_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compute_indicators(high, low, close)
+    kernel_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = add_indicators_batch(frames)
+    numpy_time = time.perf_counter() - start
+
+    for symbol in frames:
+        for column in INDICATOR_COLUMNS:
+            np.testing.assert_allclose(actual[symbol][column], expected[symbol][column], rtol=1e-9, atol=1e-9)
+
+    print(f"TA-Lib 逐檔計算: {talib_time:.3f}s")
+    print(f"NumPy 批次計算(含 DataFrame): {numpy_time:.3f}s ({talib_time / numpy_time:.1f}x)")
+    print(f"NumPy 批次計算(只有陣列): {kernel_time:.3f}s ({talib_time / kernel_time:.1f}x)")
@@ -0,0 +1,120 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    模型前的推論佇列：在 max_wait_ms 毫秒內或累積到 max_batch_size 筆時，
+    把同時到達的請求合併成一次 model.predict，再把各自的結果分送回去。
+    """
+
+    def __init__(self, model_getter, max_batch_size=32, max_wait_ms=5.0):
+        self.model_getter = model_getter  # 請求沒有指定模型時，每個批次都重新取得模型，以支援熱替換
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._pid = os.getpid()
+
+        # 統計資料
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.max_rows = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    def submit(self, window, model=None):
+        # window 形狀為 (筆數, time_steps, 特徵數)，回傳會得到對應筆數預測結果的 Future；
+        # model 為呼叫端取得的模型時以它推論，與呼叫端使用的正規化參數屬於同一版本
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((np.asarray(window), future, time.perf_counter(), model))
+        return future
+
+    def predict(self, window, model=None):
+        return self.submit(window, model).result()
+
+    def _ensure_worker(self):
+        if self._pid != os.getpid():
+            # fork 出來的子行程中父行程的執行緒不存在，佇列與鎖也可能停在 fork 當下的狀態，全部重新建立
+            self._queue = queue.Queue()
+            self._worker = None
+            self._worker_lock = threading.Lock()
+            self._pid = os.getpid()
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        # 阻塞等待第一筆請求，之後在期限內盡量收集更多請求
+        items = [self._queue.get()]
+        rows = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            items.append(item)
+            rows += len(item[0])
+        return items, rows
+
+    def _run(self):
+        while True:
+            items, rows = self._collect()
+            started = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued, _ in items]
+
+            # 熱替換前後送出的請求指定的模型不同，依模型分開推論
+            groups = {}
+            for item in items:
+                groups.setdefault(id(item[3]), []).append(item)
+            for group in groups.values():
+                self._predict(group)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(items)
+                self.rows += rows
+                self.max_rows = max(self.max_rows, rows)
+                self.total_wait += sum(waits)
+                self.max_wait_seen = max(self.max_wait_seen, max(waits))
+
+    def _predict(self, items):
+        try:
+            model = items[0][3] if items[0][3] is not None else self.model_getter()
+            outputs = model.predict(np.concatenate([window for window, _, _, _ in items]), verbose=0)
+        except Exception as e:
+            for _, future, _, _ in items:
+                future.set_exception(e)
+        else:
+            offset = 0
+            for window, future, _, _ in items:
+                future.set_result(outputs[offset:offset + len(window)])
+                offset += len(window)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "avg_batch_size": self.rows / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_rows,
+                "avg_queue_wait_ms": self.total_wait / self.requests * 1000 if self.requests else 0.0,
+                "max_queue_wait_ms": self.max_wait_seen * 1000,
+                "queue_depth": self._queue.qsize(),
+            }
@@ -0,0 +1,116 @@
+'''
+多天期推論管線：一檔股票的特徵(日線、技術指標、向後填充)只準備一次，
+再依各預測天數模型的正規化參數切出最後一個視窗，同時送進各模型的推論佇列。
+
+正規化參數隨模型發佈(模型檔旁的 .scaler.json，由訓練程式寫出)，推論時直接套用訓練時的參數。
+每次送出時向模型登錄表取一份快照(模型、正規化參數、版本)，正規化、推論與反正規化都使用同一份，
+模型在請求途中被熱替換也不會混用新舊版本。視窗長度取自模型的輸入形狀，超參數搜尋調整過 time_steps 的模型也能直接服務；
+沒有參數檔的舊模型沿用原本的作法，以這次請求的近 90 天資料擬合，同一檔股票的各天期共用同一次擬合。
+'''
+
+from concurrent.futures import Future
+
+import numpy as np
+
+from py.scaling import MinMaxScaler
+from py.windowing import last_window
+
+
+class PreparedFeatures:
+    # 一檔股票處理好但尚未正規化的特徵，所有預測天數共用
+    def __init__(self, symbol, values):
+        self.symbol = symbol
+        self.values = values
+        self._fitted = None
+
+    def fitted_scaler(self):
+        # 舊模型的逐請求擬合，只在第一次需要時計算
+        if self._fitted is None:
+            self._fitted = MinMaxScaler().fit(self.values)
+        return self._fitted
+
+
+class InferencePipeline:
+    def __init__(self, horizon_models, batchers, registry, features, load_features,
+                 time_steps=30, future_days=5, target='close'):
+        self.horizon_models = horizon_models  # 預測天數 -> 模型名稱
+        self.batchers = batchers  # 模型名稱 -> 推論佇列
+        self.registry = registry
+        self.features = list(features)
+        self.load_features = load_features  # 代號 -> 含 features 欄位的 DataFrame
+        self.time_steps = time_steps  # 模型的輸入形狀沒有視窗長度時使用
+        self.future_days = future_days
+        self.target = self.features.index(target)
+
+    def window(self, snapshot):
+        # 模型的輸入形狀為 (批次, time_steps, 特徵數)
+        steps = snapshot.model.input_shape[1]
+        return self.time_steps if steps is None else int(steps)
+
+    def window_rows(self):
+        # 所有已載入模型中最長的視窗加上 future_days，準備特徵時至少需要這麼多列
+        steps = [self.time_steps]
+        for name in self.horizon_models.values():
+            try:
+                steps.append(self.window(self.registry.snapshot(name)))
+            except (KeyError, FileNotFoundError):
+                continue
+        return max(steps) + self.future_days
+
+    def prepare(self, symbol):
+        values = self.load_features(symbol)[self.features].to_numpy(dtype=np.float64)
+        # 在準備階段就檢查長度，批次中的其他股票不會因為這一檔資料不足而失敗
+        rows = self.window_rows()
+        if len(values) < rows:
+            raise ValueError(f"{symbol} 資料長度 {len(values)} 不足以建立 {rows - self.future_days} 天的視窗")
+        return PreparedFeatures(symbol, values)
+
+    def snapshot(self, horizon):
+        return self.registry.snapshot(self.horizon_models[horizon])
+
+    def scaler(self, prepared, snapshot):
+        scaler = snapshot.scaler
+        if scaler is None:
+            return prepared.fitted_scaler()
+        if scaler.features is not None and scaler.features != self.features:
+            raise ValueError(f"{snapshot.version} 的正規化參數欄位 {scaler.features} 與服務使用的特徵不符")
+        return scaler
+
+    def inputs(self, prepared, snapshot):
+        # 正規化是逐列計算，只需轉換最後一個視窗用到的資料列
+        scaler = self.scaler(prepared, snapshot)
+        time_steps = self.window(snapshot)
+        rows = prepared.values[-(time_steps + self.future_days):]
+        return last_window(scaler.transform(rows), time_steps, self.future_days), scaler
+
+    def inverse_target(self, scaler, predictions):
+        # 預測值放回目標欄位的位置，其餘欄位補零後反正規化
+        predictions = np.asarray(predictions).reshape(-1)
+        full_predictions = np.zeros((len(predictions), len(self.features)))
+        full_predictions[:, self.target] = predictions
+        return scaler.inverse_transform(full_predictions)[:, self.target]
+
+    def submit(self, prepared, horizon, snapshot=None):
+        # 多檔股票的視窗疊成一個批次送進推論佇列；回傳的 Future 完成時為每檔股票反正規化後的預測價格。
+        # snapshot 為呼叫端取得的模型快照(以它的版本作為快取鍵)，未指定時在這裡取得
+        snapshot = snapshot or self.snapshot(horizon)
+        inputs = [self.inputs(p, snapshot) for p in prepared]
+        future = Future()
+
+        def done(outputs):
+            try:
+                future.set_result([self.inverse_target(scaler, output)
+                                   for (_, scaler), output in zip(inputs, outputs.result())])
+            except Exception as e:
+                future.set_exception(e)
+
+        batch = np.concatenate([window for window, _ in inputs])
+        self.batchers[self.horizon_models[horizon]].submit(batch, snapshot.model).add_done_callback(done)
+        return future
+
+    def predict(self, prepared, horizons=None, snapshots=None):
+        # 各天期的模型各有自己的推論佇列，先全部送出再等待，彼此不必排隊
+        horizons = list(self.horizon_models) if horizons is None else horizons
+        snapshots = snapshots or {}
+        futures = {horizon: self.submit(prepared, horizon, snapshots.get(horizon)) for horizon in horizons}
+        return {horizon: future.result() for horizon, future in futures.items()}
@@ -0,0 +1,63 @@
+import re
+import threading
+
+import numpy as np
+
+
+def _interpreter_class():
+    # 依序使用輕量的 LiteRT / tflite_runtime，都沒有安裝時才退回完整的 TensorFlow
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+    return Interpreter
+
+
+class LiteModel:
+    """
+    以 TFLite 執行 export_lite.py 匯出的模型，提供與 Keras 模型相同的 predict / input_shape，
+    可以直接放進模型登錄表與推論佇列。
+
+    LSTM 轉成 TFLite 後批次大小必須固定，因此匯出時為每個批次大小各建立一個 signature(batch_1、batch_8...)，
+    推論時選擇最小的足夠大小並補零，超過最大批次時分段執行。
+    """
+
+    def __init__(self, path, num_threads=1):
+        self.path = path
+        self._interpreter = _interpreter_class()(model_path=path, num_threads=num_threads)
+        self._runners = {}
+        for key in self._interpreter.get_signature_list():
+            match = re.fullmatch(r"batch_(\d+)", key)
+            if match:
+                self._runners[int(match.group(1))] = self._interpreter.get_signature_runner(key)
+        if not self._runners:
+            raise ValueError(f"{path} 沒有 batch_<n> signature，請以 export_lite.py 重新匯出")
+        self.batch_sizes = sorted(self._runners)
+
+        details = self._runners[self.batch_sizes[0]].get_input_details()["x"]
+        self.input_shape = (None, *details["shape"][1:])
+        self._lock = threading.Lock()  # 同一個 interpreter 不能同時推論
+
+    def _bucket(self, n):
+        for size in self.batch_sizes:
+            if size >= n:
+                return size
+        return self.batch_sizes[-1]
+
+    def predict(self, x, verbose=0):
+        x = np.asarray(x, dtype=np.float32)
+        outputs = []
+        with self._lock:
+            start = 0
+            while start < len(x):
+                size = self._bucket(len(x) - start)
+                chunk = x[start:start + size]
+                n = len(chunk)
+                if n < size:
+                    chunk = np.concatenate([chunk, np.zeros((size - n, *x.shape[1:]), dtype=np.float32)])
+                outputs.append(self._runners[size](x=chunk)["output"][:n])
+                start += n
+        return np.concatenate(outputs)
@@ -0,0 +1,133 @@
+import json
+import os
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+
+# 各交易所的時區與收盤時間；收盤後再等 SETTLE_MINUTES 分鐘，讓上游資料更新完成
+EXCHANGES = {
+    "US": (ZoneInfo("America/New_York"), 16, 0),
+    "TW": (ZoneInfo("Asia/Taipei"), 13, 30),
+}
+SETTLE_MINUTES = 30
+
+# 額外的休市日(JSON 檔，格式為 {"TW": ["2026-01-01", ...]})；台股的農曆假期與補假每年由證交所公告，無法以規則推算
+HOLIDAYS_FILE = os.environ.get("MARKET_HOLIDAYS")
+
+
+def exchange_of(symbol):
+    # 台股代號以 .TW / .TWO 結尾，其他視為美股
+    return "TW" if symbol.upper().endswith((".TW", ".TWO")) else "US"
+
+
+def _observed(day):
+    # 國定假日落在週六時提前到週五、週日時延後到週一休市
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _weekday_of_month(year, month, weekday, n):
+    # 當月第 n 個星期 weekday(0 為週一)；n 為 -1 時為最後一個
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    # 西曆復活節(Anonymous Gregorian algorithm)
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _us_holidays(year):
+    # 紐約證交所的固定休市日
+    days = {
+        _weekday_of_month(year, 1, 0, 3),    # 馬丁路德金恩紀念日
+        _weekday_of_month(year, 2, 0, 3),    # 總統日
+        _easter(year) - timedelta(days=2),   # 耶穌受難日
+        _weekday_of_month(year, 5, 0, -1),   # 陣亡將士紀念日
+        _observed(date(year, 7, 4)),         # 獨立紀念日
+        _weekday_of_month(year, 9, 0, 1),    # 勞動節
+        _weekday_of_month(year, 11, 3, 4),   # 感恩節
+        _observed(date(year, 12, 25)),       # 聖誕節
+    }
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))  # 六月節
+    # 元旦落在週六時，前一年的 12/31 照常交易
+    if date(year, 1, 1).weekday() != 5:
+        days.add(_observed(date(year, 1, 1)))
+    return days
+
+
+@lru_cache(maxsize=None)
+def _extra_holidays():
+    if not HOLIDAYS_FILE:
+        return {}
+    with open(HOLIDAYS_FILE, encoding="utf-8") as f:
+        return {exchange: {date.fromisoformat(day) for day in days} for exchange, days in json.load(f).items()}
+
+
+@lru_cache(maxsize=64)
+def holidays(exchange, year):
+    days = set(_us_holidays(year)) if exchange == "US" else set()
+    return frozenset(days | {day for day in _extra_holidays().get(exchange, ()) if day.year == year})
+
+
+def is_trading_day(exchange, day):
+    return day.weekday() < 5 and day not in holidays(exchange, day.year)
+
+
+def _settled_close(exchange, day):
+    tz, hour, minute = EXCHANGES[exchange]
+    close = datetime(day.year, day.month, day.day, hour, minute, tzinfo=tz)
+    return close + timedelta(minutes=SETTLE_MINUTES)
+
+
+def completed_until(symbol, now=None):
+    # 回傳已收盤交易日的結束日期(不含)，以交易所當地日期表示；
+    # 今天收盤後今天的K棒就算完成，收盤前只算到昨天
+    exchange = exchange_of(symbol)
+    tz = EXCHANGES[exchange][0]
+    now = datetime.now(tz) if now is None else now.astimezone(tz)
+    today = now.date()
+    if now >= _settled_close(exchange, today):
+        today += timedelta(days=1)
+    return pd.Timestamp(today)
+
+
+def last_close(exchange, now=None):
+    # 最近一次已經收盤(含等待時間)的交易日收盤時間，略過週末與休市日
+    tz = EXCHANGES[exchange][0]
+    now = datetime.now(tz) if now is None else now.astimezone(tz)
+    day = now.date()
+    while True:
+        if is_trading_day(exchange, day) and _settled_close(exchange, day) <= now:
+            return _settled_close(exchange, day)
+        day -= timedelta(days=1)
+
+
+def next_close(symbol, now=None):
+    # 下一次收盤(含等待時間)的時間，略過週末與休市日；在這之前已收盤的K棒與預測都不會改變
+    exchange = exchange_of(symbol)
+    tz = EXCHANGES[exchange][0]
+    now = datetime.now(tz) if now is None else now.astimezone(tz)
+    day = now.date()
+    while True:
+        if is_trading_day(exchange, day) and _settled_close(exchange, day) > now:
+            return _settled_close(exchange, day)
+        day += timedelta(days=1)
@@ -0,0 +1,219 @@
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from py.scaling import load_scaler, scaler_path
+
+
+# auto: 有 export_lite.py 匯出且不比 .keras 舊的 .tflite 時使用 TFLite，否則載入 Keras 模型
+# keras / tflite: 強制使用指定的格式
+SERVING_BACKEND = os.environ.get('SERVING_BACKEND', 'auto')
+LITE_NUM_THREADS = int(os.environ.get('LITE_NUM_THREADS', 1))
+
+
+# 同一時間點的模型、正規化參數、版本與指紋(見 fingerprint)，全部屬於同一次載入
+ModelSnapshot = namedtuple("ModelSnapshot", ["model", "scaler", "version", "fingerprint"])
+
+
+class ModelEntry:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.model = None
+        self.mtime = None
+        self.version = 0
+        self.error = None
+        self.loaded_path = None  # 實際載入的檔案(.keras 或 .tflite)
+        self.scaler = None  # 訓練時的正規化參數(模型旁的 .scaler.json)，舊模型沒有時為 None
+        self.scaler_mtime = None  # 正規化參數檔的修改時間，沒有參數檔時為 None
+        self.failed = None  # 載入失敗時的 (檔案, 修改時間, 參數檔修改時間)，檔案變動前不再重試
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class ModelRegistry:
+    """
+    行程內共用的模型登錄表：每個模型只在啟動時載入一次並以假資料暖機，
+    之後所有請求共用同一份模型；檔案更新時於背景載入新版本再原子替換，
+    正在推論中的請求仍持有舊模型的參照，因此不會中斷。
+    """
+
+    def __init__(self, poll_interval=5.0):
+        self.poll_interval = poll_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self._pid = os.getpid()
+
+    def register(self, name, path, defer_keras=False):
+        # defer_keras: 預先 fork 的主行程中不載入 Keras 模型(TensorFlow 在 fork 後不安全)，留給 load_pending 在子行程載入
+        entry = ModelEntry(name, path)
+        with self._lock:
+            self._entries[name] = entry
+        if defer_keras and not self._source(entry).endswith(".tflite"):
+            print(f"模型 {name} 將在 fork 後載入: {path}")
+            return entry
+        self._load_entry(entry)
+        return entry
+
+    def load_pending(self):
+        # 載入所有尚未載入的模型
+        for entry in list(self._entries.values()):
+            if entry.model is None:
+                self._load_entry(entry)
+
+    def ready(self):
+        return bool(self._entries) and all(entry.model is not None for entry in self._entries.values())
+
+    def _load_entry(self, entry):
+        try:
+            self._reload(entry)
+        except Exception as e:
+            # 模型檔不存在或損毀時先記錄錯誤，等檔案出現後由監看執行緒載入
+            entry.error = e
+            print(f"模型 {entry.name} 載入失敗: {e}")
+
+    def get(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"未註冊的模型: {name}")
+        model = entry.model  # 取得當下版本的參照，替換時不受影響
+        if model is None:
+            raise FileNotFoundError(f"模型 {name} 尚未載入: {entry.path}")
+        return model
+
+    def scaler(self, name):
+        # 目前版本的正規化參數；與模型一起使用時改用 snapshot，避免兩次讀取之間模型被替換
+        return self._entries[name].scaler
+
+    def snapshot(self, name):
+        # 一次取得模型、正規化參數與版本；替換時三者在同一把鎖內更新，因此不會拿到不同版本的組合
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"未註冊的模型: {name}")
+        with self._lock:
+            if entry.model is None:
+                raise FileNotFoundError(f"模型 {name} 尚未載入: {entry.path}")
+            return ModelSnapshot(entry.model, entry.scaler, f"{name}-v{entry.version}",
+                                 (entry.loaded_path, entry.mtime, entry.scaler_mtime))
+
+    def fingerprint(self, name):
+        # 載入的檔案與模型、正規化參數的修改時間，各行程與重新啟動後都相同，可以放進 HTTP 的 ETag
+        entry = self._entries[name]
+        return entry.loaded_path, entry.mtime, entry.scaler_mtime
+
+    def version(self, name):
+        entry = self._entries[name]
+        return f"{name}-v{entry.version}"
+
+    def status(self):
+        return {
+            name: {
+                "path": entry.path,
+                "loaded": entry.model is not None,
+                "source": entry.loaded_path,
+                "scaler": scaler_path(entry.path) if entry.scaler is not None else None,
+                "version": entry.version,
+                "error": None if entry.error is None else str(entry.error),
+            }
+            for name, entry in self._entries.items()
+        }
+
+    def _source(self, entry):
+        lite_path = os.path.splitext(entry.path)[0] + ".tflite"
+        if SERVING_BACKEND == 'tflite':
+            return lite_path
+        if SERVING_BACKEND == 'auto' and os.path.exists(lite_path):
+            if not os.path.exists(entry.path) or os.path.getmtime(lite_path) >= os.path.getmtime(entry.path):
+                return lite_path
+        return entry.path
+
+    def _load(self, path):
+        if path.endswith(".tflite"):
+            # TFLite 模型不需要匯入 TensorFlow，行程記憶體與啟動時間都小很多
+            from py.lite_model import LiteModel
+            return LiteModel(path, num_threads=LITE_NUM_THREADS)
+        from tensorflow.keras.models import load_model
+        return load_model(path)
+
+    def _reload(self, entry):
+        path = self._source(entry)
+        mtime = os.path.getmtime(path)
+        scaler_mtime = _mtime(scaler_path(entry.path))
+        try:
+            model = self._load(path)
+            scaler = load_scaler(entry.path)
+            self._warmup(model)
+        except Exception:
+            entry.failed = (path, mtime, scaler_mtime)
+            raise
+
+        # 新模型暖機完成後才替換，確保請求不會拿到半載入的模型
+        with self._lock:
+            entry.model = model
+            entry.scaler = scaler
+            entry.scaler_mtime = scaler_mtime
+            entry.mtime = mtime
+            entry.loaded_path = path
+            entry.version += 1
+            entry.error = None
+            entry.failed = None
+        print(f"模型 {entry.name} 已載入 (版本 {entry.version}): {path}")
+
+    def _warmup(self, model):
+        # 以全零的假資料執行一次推論，讓計算圖在第一個請求前就建立好
+        shape = [1 if dim is None else dim for dim in model.input_shape]
+        model.predict(np.zeros(shape, dtype=np.float32), verbose=0)
+
+    def check_for_updates(self):
+        for entry in list(self._entries.values()):
+            path = self._source(entry)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            # 只更新正規化參數檔(例如重新產生 .scaler.json)也要重新載入，模型與參數必須是同一版本
+            scaler_mtime = _mtime(scaler_path(entry.path))
+            if entry.failed == (path, mtime, scaler_mtime):
+                # 同一組檔案已經載入失敗過，等檔案再次變動才重試，不必每一輪都重新載入並記錄錯誤
+                continue
+            if (entry.mtime is None or path != entry.loaded_path or mtime > entry.mtime
+                    or scaler_mtime != entry.scaler_mtime):
+                try:
+                    self._reload(entry)
+                except Exception as e:
+                    # 新檔案可能還在寫入中，保留舊版本，寫入完成(修改時間改變)後再試
+                    entry.error = e
+                    print(f"模型 {entry.name} 重新載入失敗，沿用舊版本: {e}")
+
+    def start_watcher(self):
+        if self._pid != os.getpid():
+            # fork 後父行程的監看執行緒不存在，鎖也可能停在 fork 當下的狀態
+            self._lock = threading.Lock()
+            self._watcher = None
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check_for_updates()
+
+
+# 全域共用的模型登錄表
+registry = ModelRegistry()
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "predictions")
+
+
+class PredictionCache:
+    """
+    預測結果快取，鍵為 (代號, 最後一根已收盤K棒的時間, 模型指紋, 預測天數)。
+    新K棒收盤或模型替換後鍵就會改變，寫入新結果時同一代號與天數的舊結果會一併移除；
+    超過 max_entries 筆時淘汰最久未使用的結果。
+    指定 directory 時每個代號與天數的最新結果另外寫到磁碟，所有 worker 共用：
+    收盤後只有一個 worker 執行預先計算，其他 worker 記憶體中沒有時從磁碟讀取，不必重新推論。
+    模型指紋由檔案路徑與修改時間組成，各行程都相同。
+    """
+
+    def __init__(self, max_entries=1024, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        symbol, _, _, horizon = key
+        return os.path.join(self.directory, symbol, f"h{horizon}.json")
+
+    def _read(self, key):
+        # 磁碟上同一代號與天數的結果，鍵相同時才使用
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return stored["value"] if stored.get("key") == repr(key) else None
+
+    def _write(self, key, value):
+        # 先寫入暫存檔再替換，避免其他 worker 讀到寫到一半的檔案
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"key": repr(key), "value": value}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"預測結果寫入失敗 {path}: {e}")
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._read(key) if self.directory is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory is not None:
+            self._write(key, value)
+
+    def _remember(self, key, value):
+        symbol, _, _, horizon = key
+        with self._lock:
+            stale = [k for k in self._entries if k[0] == symbol and k[3] == horizon and k != key]
+            for k in stale:
+                del self._entries[k]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+            }
+
+
+# 全域共用的預測結果快取
+prediction_cache = PredictionCache(directory=os.environ.get("PREDICTION_CACHE_DIR", DEFAULT_DIR))
@@ -0,0 +1,268 @@
+'''
+行情資料的上游來源(provider)。StockData 與日線資料庫只透過這裡的介面取資料，不直接呼叫 yfinance：
+- YFinanceProvider：yfinance，所有執行緒共用一個連線池、一個全域令牌桶限速，
+  失敗時以帶隨機抖動的指數退避重試，同時進行的上游請求數有上限
+- FixtureProvider：從記憶體中的 DataFrame 回放，離線測試用
+- ReplayProvider：把上游的回應錄製到磁碟，之後同樣的查詢直接讀檔；沒有上游時只回放，不會連網
+
+fetch_many 一次下載多檔股票的多個區間，回傳的串列與請求一一對應，失敗的請求以例外物件表示，
+一檔失敗不會影響其他股票。
+'''
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from py.rate_limit import TokenBucket, call_with_retries
+
+
+# 歷史股價統一使用小寫欄位名稱以符合 TA-Lib 的要求
+HISTORY_COLUMNS = ["open", "high", "low", "close", "volume", "dividends", "stock splits"]
+
+
+def normalize_history(hist):
+    hist = hist.rename(columns=str.lower)
+    for column in HISTORY_COLUMNS:
+        if column not in hist.columns:
+            hist[column] = 0.0
+    return hist[HISTORY_COLUMNS]
+
+
+def _empty_history():
+    return pd.DataFrame(columns=HISTORY_COLUMNS, index=pd.DatetimeIndex([]), dtype=float)
+
+
+class Provider:
+    """上游來源的共同介面；子類別實作 fetch_history 與 fetch_info"""
+
+    # fetch_many 同時進行的請求數
+    max_workers = 4
+
+    def fetch_history(self, symbol, start_date, end_date):
+        # 回傳 [start_date, end_date) 的日線，欄位為 HISTORY_COLUMNS；日期為 None 時不限制
+        raise NotImplementedError
+
+    def fetch_info(self, symbol):
+        # 回傳即時報價與基本面的 dict，鍵名與 yfinance 的 Ticker.info 相同
+        raise NotImplementedError
+
+    def fetch_many(self, requests, max_workers=None):
+        # requests 為 (代號, start_date, end_date) 的串列
+        requests = list(requests)
+        if not requests:
+            return []
+
+        def fetch(request):
+            try:
+                return self.fetch_history(*request)
+            except Exception as e:
+                return e
+
+        workers = min(max_workers or self.max_workers, len(requests))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="provider") as executor:
+            return list(executor.map(fetch, requests))
+
+    def stats(self):
+        return {}
+
+
+class YFinanceProvider(Provider):
+    """從 yfinance 下載日線資料與報價的上游來源"""
+
+    def __init__(self, rate=None, burst=None, max_concurrency=None, retries=None):
+        self.limiter = TokenBucket(
+            rate if rate is not None else float(os.environ.get("YF_RATE_LIMIT", 4)),
+            burst if burst is not None else float(os.environ.get("YF_RATE_BURST", 8)),
+        )
+        self.max_workers = max_concurrency or int(os.environ.get("YF_MAX_CONCURRENCY", 8))
+        self.retries = retries if retries is not None else int(os.environ.get("YF_RETRIES", 3))
+        # 不論有幾個執行緒(網頁請求、排程、回補)，同時送往上游的請求最多 max_workers 個
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._counts = {"requests": 0, "retries": 0, "failures": 0, "missing": 0}
+        self._counts_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._counts_lock:
+            self._counts[name] += 1
+
+    def session(self):
+        # 所有請求共用一個 curl_cffi session(連線池與 cookie)；沒有安裝 curl_cffi 時交給 yfinance 自行建立
+        with self._session_lock:
+            if self._session is None:
+                try:
+                    from curl_cffi import requests as curl_requests
+                except ImportError:
+                    return None
+                self._session = curl_requests.Session(impersonate="chrome", max_clients=self.max_workers)
+            return self._session
+
+    def _ticker(self, symbol):
+        # 只有真的向上游查詢時才匯入 yfinance
+        import yfinance as yf
+
+        return yf.Ticker(symbol, session=self.session())
+
+    def _call(self, fn):
+        from yfinance.exceptions import YFInvalidPeriodError, YFTickerMissingError
+
+        def attempt():
+            self.limiter.acquire()
+            with self._slots:
+                self._count("requests")
+                return fn()
+
+        try:
+            # 代號不存在或參數錯誤時重試也沒有用，其他錯誤(限流、網路)依退避時間重試
+            return call_with_retries(
+                attempt,
+                retries=self.retries,
+                base_delay=1.0,
+                give_up=(YFTickerMissingError, YFInvalidPeriodError),
+                on_retry=lambda attempt, delay, e: self._count("retries"),
+            )
+        except YFTickerMissingError:
+            raise
+        except Exception:
+            self._count("failures")
+            raise
+
+    def fetch_history(self, symbol, start_date, end_date):
+        from yfinance.exceptions import YFTickerMissingError
+
+        try:
+            hist = self._call(lambda: self._ticker(symbol).history(start=start_date, end=end_date, raise_errors=True))
+        except YFTickerMissingError:
+            # 區間內沒有交易日(例如週末)或代號已下市，與原本的行為相同，回傳空的資料
+            self._count("missing")
+            return _empty_history()
+        return normalize_history(hist)
+
+    def fetch_info(self, symbol):
+        return self._call(lambda: self._ticker(symbol).info)
+
+    def stats(self):
+        with self._counts_lock:
+            counts = dict(self._counts)
+        return {**counts, "max_concurrency": self.max_workers, "rate_limit": self.limiter.stats()}
+
+
+class FixtureProvider(Provider):
+    """
+    離線用的上游來源：從記憶體中的 DataFrame 回放歷史資料，
+    並記錄每次被呼叫的區間，方便在沒有網路時驗證快取行為。
+    """
+
+    def __init__(self, frames, infos=None):
+        self.frames = {symbol: normalize_history(frame) for symbol, frame in frames.items()}
+        self.infos = infos or {}
+        self.calls = []
+
+    @classmethod
+    def from_csv_dir(cls, directory):
+        # 讀取 original data/ 底下每個代號資料夾的第一份 CSV
+        frames = {}
+        for symbol in sorted(os.listdir(directory)):
+            path = os.path.join(directory, symbol, f"{symbol}_history.csv")
+            if os.path.exists(path):
+                frame = pd.read_csv(path)
+                frame.index = pd.to_datetime(frame.iloc[:, 0], utc=True)
+                frames[symbol] = frame
+        return cls(frames)
+
+    def fetch_history(self, symbol, start_date, end_date):
+        self.calls.append((symbol, start_date, end_date))
+        frame = self.frames.get(symbol)
+        if frame is None:
+            return _empty_history()
+        dates = frame.index
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        mask = np.ones(len(frame), dtype=bool)
+        if start_date is not None:
+            mask &= dates >= pd.Timestamp(start_date)
+        if end_date is not None:
+            mask &= dates < pd.Timestamp(end_date)
+        return frame[mask].copy()
+
+    def fetch_info(self, symbol):
+        # 沒有指定 info 時由最後幾根K棒推算報價欄位
+        if symbol in self.infos:
+            return dict(self.infos[symbol])
+        frame = self.frames.get(symbol)
+        if frame is None or frame.empty:
+            return {}
+        year = frame.iloc[-252:]
+        return {
+            "currentPrice": float(frame["close"].iloc[-1]),
+            "regularMarketPreviousClose": float(frame["close"].iloc[-2]) if len(frame) > 1 else None,
+            "volume": int(frame["volume"].iloc[-1]),
+            "fiftyTwoWeekHigh": float(year["high"].max()),
+            "fiftyTwoWeekLow": float(year["low"].min()),
+        }
+
+
+class ReplayProvider(Provider):
+    """
+    錄製/回放上游回應：每個 (代號, 起日, 迄日) 的日線與每檔股票的 info 存成一個檔案。
+    upstream 不為 None 時，找不到錄製檔就向上游查詢並存檔；為 None 時只回放，
+    沒有錄製過的查詢丟出 LookupError，測試不會在不知情的情況下連網。
+    """
+
+    def __init__(self, directory, upstream=None):
+        self.directory = directory
+        self.upstream = upstream
+        if upstream is not None:
+            self.max_workers = upstream.max_workers
+
+    def _path(self, symbol, name):
+        return os.path.join(self.directory, symbol, name)
+
+    def _replay(self, path, load, record, save):
+        if os.path.exists(path):
+            return load(path)
+        if self.upstream is None:
+            raise LookupError(f"沒有錄製的資料: {path}")
+        value = record()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save(value, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        return value
+
+    def fetch_history(self, symbol, start_date, end_date):
+        path = self._path(symbol, f"history_{start_date or 'none'}_{end_date or 'none'}.pkl")
+        return self._replay(
+            path,
+            pd.read_pickle,
+            lambda: self.upstream.fetch_history(symbol, start_date, end_date),
+            lambda frame, target: frame.to_pickle(target),
+        )
+
+    def fetch_info(self, symbol):
+        def load(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+
+        def save(info, target):
+            with open(target, "w", encoding="utf-8") as f:
+                json.dump(info, f, default=str)
+
+        return self._replay(self._path(symbol, "info.json"), load, lambda: self.upstream.fetch_info(symbol), save)
+
+    def stats(self):
+        return self.upstream.stats() if self.upstream is not None else {}
+
+
+def default_provider():
+    # MARKET_DATA_REPLAY 指定錄製檔的資料夾；MARKET_DATA_OFFLINE=1 時只回放，不連網
+    provider = YFinanceProvider()
+    replay_dir = os.environ.get("MARKET_DATA_REPLAY")
+    if replay_dir:
+        offline = os.environ.get("MARKET_DATA_OFFLINE") == "1"
+        return ReplayProvider(replay_dir, upstream=None if offline else provider)
+    return provider
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class QuoteCache:
+    """
+    行程內共用的即時報價快取：資料在 ttl 秒內有效，超過 max_entries 筆時
+    淘汰最久未使用的代號；同一代號同時未命中時只會有一個請求向上游抓取，
+    其他請求等待同一份結果(single-flight)。
+    """
+
+    def __init__(self, ttl=60.0, max_entries=512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # 已有其他請求在抓取同一代號，等待它的結果
+            return future.result()
+
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+
+# 全域共用的報價快取，TTL 與容量可由環境變數調整
+quote_cache = QuoteCache(
+    ttl=float(os.environ.get("QUOTE_CACHE_TTL", 60)),
+    max_entries=int(os.environ.get("QUOTE_CACHE_SIZE", 512)),
+)
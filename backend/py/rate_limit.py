@@ -0,0 +1,65 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    令牌桶限速：平均每秒最多 rate 個請求，瞬間最多 burst 個。
+    所有執行緒共用同一個桶，並行下載再多檔股票，送往上游的總請求速率也不會超過上限。
+    每次取用先預約令牌再睡到輪到自己為止，等待的請求依到達順序放行。
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0.0
+
+    def reserve(self, tokens=1):
+        # 取走令牌(可以預支成負數)，回傳需要等待的秒數
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            self.acquired += 1
+            wait = max(0.0, -self._tokens / self.rate)
+            self.waited += wait
+            return wait
+
+    def acquire(self, tokens=1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def stats(self):
+        return {"rate": self.rate, "burst": self.capacity, "acquired": self.acquired, "waited_s": round(self.waited, 3)}
+
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=30.0):
+    # 指數退避加上完全隨機的抖動(full jitter)：第 attempt 次重試前等待 0 ~ min(max_delay, base_delay * 2**attempt) 秒，
+    # 同時失敗的請求不會在同一時間一起重試
+    return random.uniform(0.0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_with_retries(fn, retries=3, base_delay=0.5, max_delay=30.0, give_up=(), on_retry=None, sleep=time.sleep):
+    # give_up 中的例外(例如代號不存在)不重試，直接丟出
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except give_up:
+            raise
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if on_retry is not None:
+                on_retry(attempt, delay, e)
+            sleep(delay)
@@ -0,0 +1,198 @@
+'''
+歷史K棒的解析度控制與降採樣，讓長區間的圖表只傳送畫得出來的點數：
+- resolution：day(原始日線)、week、month，將日線彙整成週線或月線
+  (開盤取第一根、最高取最大、最低取最小、收盤取最後一根、成交量加總)
+- max_points：以 LTTB(Largest-Triangle-Three-Buckets)在收盤價上挑選最能保留形狀的K棒，
+  每個點代表一個區段，最高/最低價取該區段的最大/最小值，成交量為區段加總
+
+兩者都以 pandas/NumPy 向量化計算，結果依 (代號, 區間, 解析度, 點數) 快取。
+'''
+
+import numpy as np
+import pandas as pd
+
+
+# 解析度對應的 pandas 週期；週線以週五收盤為一週的結束
+RESOLUTIONS = {'day': None, 'week': 'W-FRI', 'month': 'M'}
+
+# 各欄位彙整的方式，未列出的欄位取區段最後一根
+AGGREGATIONS = {
+    'date': 'first',
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+    'dividends': 'sum',
+    'stock splits': 'max',
+}
+
+MIN_POINTS = 3
+MAX_POINTS = 10000
+
+
+def parse_resolution_args(args):
+    # 回傳 (resolution, max_points)，參數不正確時丟出 ValueError
+    resolution = args.get('resolution', 'day')
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {list(RESOLUTIONS)}")
+
+    max_points = args.get('max_points')
+    if max_points is not None:
+        try:
+            max_points = int(max_points)
+        except ValueError:
+            max_points = 0
+        if not MIN_POINTS <= max_points <= MAX_POINTS:
+            raise ValueError(f"max_points must be between {MIN_POINTS} and {MAX_POINTS}")
+    return resolution, max_points
+
+
+def _naive(dates):
+    dates = pd.DatetimeIndex(dates)
+    return dates.tz_localize(None) if dates.tz is not None else dates
+
+
+def _aggregate(frame, edges):
+    # K棒依時間排序，每個區段都是連續的列，edges[i]:edges[i + 1] 為第 i 個區段，以 reduceat 一次算完所有區段
+    starts = edges[:-1]
+    columns = {}
+    for column in frame.columns:
+        how = AGGREGATIONS.get(column, 'last')
+        if how in ('first', 'last'):
+            rows = starts if how == 'first' else edges[1:] - 1
+            columns[column] = frame[column].iloc[rows].reset_index(drop=True)
+            continue
+        values = frame[column].to_numpy()
+        if how == 'max':
+            columns[column] = np.fmax.reduceat(values, starts)  # fmax/fmin 忽略缺值
+        elif how == 'min':
+            columns[column] = np.fmin.reduceat(values, starts)
+        else:
+            columns[column] = np.add.reduceat(np.nan_to_num(values), starts)
+    return pd.DataFrame(columns)
+
+
+def resample(frame, resolution):
+    # 將日線彙整成週線或月線，每根K棒的日期為該週期第一個交易日
+    if RESOLUTIONS[resolution] is None or frame.empty:
+        return frame
+    periods = _naive(frame['date']).to_period(RESOLUTIONS[resolution]).asi8
+    changes = np.flatnonzero(np.diff(periods)) + 1
+    return _aggregate(frame, np.concatenate(([0], changes, [len(frame)])))
+
+
+def lttb_indices(y, threshold):
+    '''
+    LTTB 降採樣：保留第一點與最後一點，其餘資料平均分成 threshold - 2 個區段，
+    每個區段挑出與「前一個選中點」及「下一區段平均點」構成最大三角形面積的點。
+    x 軸使用K棒的序號，休市日不會造成間隔。回傳 (選中點的序號, 區段邊界)。
+    '''
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if threshold >= n:
+        return np.arange(n), np.arange(n + 1)
+
+    # 中間 n - 2 個點切成 threshold - 2 個區段，edges[i]:edges[i + 1] 為第 i 個區段
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    x = np.arange(n, dtype=np.float64)
+
+    # 每個區段的平均點一次算好，迴圈內只剩下與前一個選中點相關的計算
+    counts = np.diff(edges)
+    sums = np.add.reduceat(y[:n - 1], edges[:-1])
+    averages_y = np.append(sums / counts, y[-1])
+    averages_x = np.append((edges[:-1] + edges[1:] - 1) / 2.0, n - 1)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 三角形面積的兩倍(省略常數 1/2 不影響比較)
+        area = np.abs((x[a] - averages_x[i + 1]) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (averages_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected, np.concatenate(([0], edges, [n]))
+
+
+def downsample(frame, max_points):
+    # 收盤價以 LTTB 挑選，日期跟著選中的K棒；其他欄位依 AGGREGATIONS 在區段內彙整
+    if max_points is None or len(frame) <= max_points:
+        return frame
+    selected, edges = lttb_indices(frame['close'].to_numpy(), max_points)
+    result = _aggregate(frame, edges)
+    result['date'] = frame['date'].iloc[selected].reset_index(drop=True)
+    result['close'] = frame['close'].to_numpy()[selected]
+    return result
+
+
+def shape(frame, resolution='day', max_points=None):
+    return downsample(resample(frame, resolution), max_points)
+
+
+def _lttb_loop(x, y, threshold):
+    # 一般文獻中的逐點實作，只用來驗證結果一致與比較效能
+    n = len(y)
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int(np.floor((i + 1) * every) + 1)
+        avg_end = min(int(np.floor((i + 2) * every) + 1), n)
+        avg_x = x[avg_start:avg_end].mean() if avg_end > avg_start else x[n - 1]
+        avg_y = y[avg_start:avg_end].mean() if avg_end > avg_start else y[n - 1]
+        start = int(np.floor(i * every) + 1)
+        end = int(np.floor((i + 1) * every) + 1)
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    n = 2520 * 10  # 百年的日線，或十年資料的十檔股票
+    dates = pd.bdate_range("1990-01-01", periods=n, tz="America/New_York")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    frame = pd.DataFrame({
+        "open": close * (1 + rng.normal(0, 0.005, n)),
+        "high": close * (1 + np.abs(rng.normal(0, 0.01, n))),
+        "low": close * (1 - np.abs(rng.normal(0, 0.01, n))),
+        "close": close,
+        "volume": rng.integers(1_000_000, 50_000_000, n),
+        "date": dates,
+    })
+
+    for threshold in (3, 10, 500, 1000):
+        ours, _ = lttb_indices(close, threshold)
+        assert np.array_equal(ours, _lttb_loop(np.arange(n, dtype=float), close, threshold)), threshold
+
+    points = shape(frame, "day", 500)
+    assert len(points) == 500
+    assert points["high"].max() == frame["high"].max() and points["low"].min() == frame["low"].min()
+    assert points["volume"].sum() == frame["volume"].sum()
+    # 與 pandas 的 groupby 彙整結果相同
+    how = {column: AGGREGATIONS.get(column, 'last') for column in frame.columns}
+    for resolution in ("week", "month"):
+        periods = frame["date"].dt.tz_localize(None).dt.to_period(RESOLUTIONS[resolution])
+        expected = frame.groupby(periods.to_numpy(), sort=False).agg(how).reset_index(drop=True)
+        pd.testing.assert_frame_equal(resample(frame, resolution), expected)
+
+    for label, fn in [
+        ("逐點 LTTB", lambda: _lttb_loop(np.arange(n, dtype=float), close, 500)),
+        ("向量化 LTTB", lambda: lttb_indices(close, 500)),
+        ("週線", lambda: resample(frame, "week")),
+        ("月線", lambda: resample(frame, "month")),
+        ("日線 500 點", lambda: shape(frame, "day", 500)),
+    ]:
+        started = time.perf_counter()
+        fn()
+        print(f"{label}: {(time.perf_counter() - started) * 1e3:.1f}ms")
@@ -0,0 +1,58 @@
+import os
+import time
+
+
+_imported_at = time.time()
+_ready = None  # (pid, 完成載入的時間)；fork 後子行程沿用的父行程紀錄不算數
+
+
+def process_started():
+    # 行程的啟動時間(epoch 秒)；fork 出來的子行程是 fork 的時間。讀不到 /proc 時以匯入本模組的時間代替
+    try:
+        with open("/proc/self/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return _imported_at
+
+
+def memory():
+    '''
+    行程記憶體(MB)：rss 為常駐記憶體，pss 將共用頁面依共用的行程數平均分攤，
+    private 為只屬於這個行程的頁面。預先 fork 的 worker 共用主行程載入的函式庫與模型，
+    每多一個 worker 實際增加的記憶體約等於 private。
+    '''
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        import resource
+        return {"rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    return {
+        "rss": round(fields.get("Rss", 0.0), 1),
+        "pss": round(fields.get("Pss", 0.0), 1),
+        "private": round(fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1),
+    }
+
+
+def mark_ready():
+    global _ready
+    _ready = (os.getpid(), time.time())
+    return _ready[1] - process_started()
+
+
+def snapshot():
+    started = process_started()
+    ready = _ready is not None and _ready[0] == os.getpid()
+    return {
+        "pid": os.getpid(),
+        "startup_seconds": round(_ready[1] - started, 3) if ready else None,
+        "uptime_seconds": round(time.time() - started, 1),
+        "memory_mb": memory(),
+    }
@@ -0,0 +1,96 @@
+import json
+import os
+
+import numpy as np
+
+
+class MinMaxScaler:
+    """
+    與 sklearn.preprocessing.MinMaxScaler() 相同的 0~1 正規化(欄位最小值、範圍與常數欄位的處理都一致)，
+    推論服務只需要這幾行計算，不必在啟動時匯入 scikit-learn。
+    訓練時擬合的參數可以用 save_scaler 存在模型檔旁邊，推論時以 load_scaler 讀回直接使用。
+    """
+
+    def __init__(self, features=None):
+        self.features = None if features is None else list(features)  # 擬合時的欄位名稱
+
+    def fit(self, X):
+        if self.features is None and hasattr(X, "columns"):
+            self.features = [str(c) for c in X.columns]
+        X = np.asarray(X, dtype=np.float64)
+        self.data_min_ = np.nanmin(X, axis=0)
+        self.data_max_ = np.nanmax(X, axis=0)
+        self.data_range_ = self.data_max_ - self.data_min_
+        # 範圍接近 0 的常數欄位以 1 代替，避免除以零
+        data_range = np.where(self.data_range_ < 10 * np.finfo(np.float64).eps, 1.0, self.data_range_)
+        self.scale_ = 1.0 / data_range
+        self.min_ = -self.data_min_ * self.scale_
+        return self
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X *= self.scale_
+        X += self.min_
+        return X
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    def inverse_transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.min_
+        X /= self.scale_
+        return X
+
+    def to_dict(self):
+        return {
+            "features": self.features,
+            "data_min": self.data_min_.tolist(),
+            "data_max": self.data_max_.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, params):
+        # 以存下的最小值與最大值重建，scale_ 與 min_ 的計算方式與 fit 相同
+        scaler = cls(params.get("features"))
+        return scaler.fit(np.array([params["data_min"], params["data_max"]], dtype=np.float64))
+
+
+def scaler_path(model_path):
+    # model.keras、model.tflite 共用同一份 model.scaler.json
+    return os.path.splitext(model_path)[0] + ".scaler.json"
+
+
+def save_scaler(scaler, model_path):
+    path = scaler_path(model_path)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(scaler.to_dict(), f)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_scaler(model_path):
+    # 模型旁沒有參數檔(舊版模型)時回傳 None
+    path = scaler_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return MinMaxScaler.from_dict(json.load(f))
+
+
+if __name__ == "__main__":
+    from sklearn.preprocessing import MinMaxScaler as SklearnMinMaxScaler
+
+    # 與 scikit-learn 的結果逐位元比對，包含常數欄位
+    rng = np.random.default_rng(0)
+    X = rng.random((500, 10)) * rng.integers(1, 1000, 10)
+    X[:, 6] = 3.0
+    ours, theirs = MinMaxScaler(), SklearnMinMaxScaler()
+    assert np.array_equal(ours.fit_transform(X), theirs.fit_transform(X))
+    Y = rng.random((20, 10))
+    assert np.array_equal(ours.inverse_transform(Y), theirs.inverse_transform(Y))
+    # 存檔後讀回的參數與原本的結果相同
+    restored = MinMaxScaler.from_dict(json.loads(json.dumps(ours.to_dict())))
+    assert np.array_equal(restored.transform(X), theirs.transform(X))
+    assert np.array_equal(restored.inverse_transform(Y), theirs.inverse_transform(Y))
+    print("與 sklearn 一致")
@@ -0,0 +1,105 @@
+import os
+import threading
+
+from py.market_calendar import exchange_of, last_close
+
+
+def try_lock(path):
+    # 以不等待的獨占檔案鎖選出唯一的執行者，成功時回傳開啟的檔案(必須保持開啟)，已被其他行程持有時回傳 None；
+    # 持有的行程結束時作業系統會自動釋放，不會留下過期的鎖
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    f = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+class PrecomputeScheduler:
+    """
+    收盤後預先計算觀察清單的預測：每個交易所收盤後，對該交易所的股票更新日線、
+    計算技術指標並批次執行 1 日與 5 日模型，結果放進預測快取，API 只需讀取。
+    每個交易所記錄最後完成的收盤時間，同一次收盤不會重複執行；
+    行程啟動後第一輪會立即補跑最近一次收盤，已經算過的結果直接從預測快取讀取。
+    指定 lock_path 時多個 worker 之中只有取得檔案鎖的一個會執行，其他 worker 每輪重試，
+    持有者結束後由下一個取得鎖的 worker 接手；日線、指標與預測結果都存在磁碟上，其他 worker 直接讀取。
+    """
+
+    def __init__(self, watchlist, job, poll_interval=60.0, lock_path=None):
+        self.job = job  # job(symbols)，對同一批股票重複執行必須得到相同結果
+        self.poll_interval = poll_interval
+        self.lock_path = lock_path
+        self._lock_file = None
+        self.groups = {}
+        for symbol in watchlist:
+            self.groups.setdefault(exchange_of(symbol), []).append(symbol)
+        self._stop = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()
+        self._done = {}  # 交易所 -> 最後完成的收盤時間
+
+    def due(self, now=None):
+        # 回傳尚未針對最近一次收盤執行過的交易所與收盤時間
+        pending = {}
+        for exchange in self.groups:
+            close = last_close(exchange, now)
+            done = self._done.get(exchange)
+            if done is None or done < close:
+                pending[exchange] = close
+        return pending
+
+    def is_leader(self):
+        if self.lock_path is None:
+            return True
+        if self._lock_file is None:
+            self._lock_file = try_lock(self.lock_path)
+            if self._lock_file is not None:
+                print(f"行程 {os.getpid()} 負責收盤後預先計算")
+        return self._lock_file is not None
+
+    def run_pending(self, now=None):
+        with self._run_lock:
+            for exchange, close in self.due(now).items():
+                symbols = self.groups[exchange]
+                print(f"收盤後預先計算 {exchange} {close:%Y-%m-%d %H:%M}: {', '.join(symbols)}")
+                try:
+                    self.job(symbols)
+                except Exception as e:
+                    # 失敗時不更新狀態，下一輪再試
+                    print(f"預先計算 {exchange} 失敗: {e}")
+                    continue
+                self._done[exchange] = close
+
+    def status(self):
+        return {
+            exchange: {
+                "symbols": symbols,
+                "last_run": self._done[exchange].isoformat() if exchange in self._done else None,
+            }
+            for exchange, symbols in self.groups.items()
+        }
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="precompute-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        # 第一輪立即執行，補跑啟動前錯過的收盤
+        while True:
+            if self.is_leader():
+                self.run_pending()
+            if self._stop.wait(self.poll_interval):
+                return
@@ -0,0 +1,345 @@
+'''
+股票 API 共用的服務層：Flask(app.py)與 ASGI(asgi.py)兩種伺服器模式
+都呼叫這裡的函式，路由本身只負責解析參數與組成回應。
+'''
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pandas as pd
+
+from py import http_cache  # ETag 與 Cache-Control
+from py import runtime_stats  # 啟動時間與記憶體用量
+from py.bar_store import bar_store
+from py.feature_store import feature_store  # 背景寫入的特徵快照
+from py.getstock import StockData  # 導入取得股價資訊的類別程式
+from py.history_format import paginate, parse_day
+from py.inference_batcher import MicroBatcher  # 合併同時到達的推論請求
+from py.inference_pipeline import InferencePipeline  # 特徵只準備一次，供所有預測天數的模型使用
+from py.market_calendar import completed_until
+from py.model_registry import registry  # 行程內共用的模型登錄表
+from py.prediction_cache import prediction_cache  # 預測結果快取
+from py.quote_cache import QuoteCache, quote_cache
+from py.resampling import shape  # 週/月線彙整與 LTTB 降採樣
+from py.scheduler import PrecomputeScheduler
+
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 選擇特徵
+FEATURES = ['open', 'high', 'low', 'close', 'volume', 'macdhist', 'RSI', 'MOM', 'slowk', 'slowd']
+
+# 預測天數對應的模型名稱與模型檔
+HORIZON_MODELS = {1: 'predict1', 5: 'predict5'}
+MODEL_FILES = {'predict1': 'model.keras', 'predict5': 'model_2.keras'}
+
+# 以 gunicorn 預先載入模式(gunicorn.conf.py)啟動時由設定檔設為 1：
+# 主行程只載入不需要 TensorFlow 的模型，背景執行緒都在 fork 後的 worker 中才啟動
+PREFORK = os.environ.get('AI_STOCK_PREFORK') == '1'
+
+# 批次預測一次最多接受的股票數量
+MAX_BATCH_SYMBOLS = 100
+
+# 收盤後預先計算的觀察清單，例如 WATCHLIST=TSLA,NVDA,2618.TW
+WATCHLIST = [s.strip() for s in os.environ.get('WATCHLIST', '').split(',') if s.strip()]
+# 每個 worker 都會啟動排程，只有取得這個檔案鎖的 worker 真正執行預先計算
+SCHEDULER_LOCK = os.environ.get('SCHEDULER_LOCK', os.path.join(os.path.dirname(MODEL_DIR), 'data', 'scheduler.lock'))
+
+# 週/月線與降採樣後的歷史資料快取
+history_cache = QuoteCache(
+    ttl=float(os.environ.get('HISTORY_CACHE_TTL', 3600)),
+    max_entries=int(os.environ.get('HISTORY_CACHE_SIZE', 256)),
+)
+
+# 每個模型前面放一個推論佇列，把同時到達的請求合併成一次 model.predict
+batchers = {
+    name: MicroBatcher(
+        lambda name=name: registry.get(name),
+        max_batch_size=int(os.environ.get('INFERENCE_MAX_BATCH', 64)),
+        max_wait_ms=float(os.environ.get('INFERENCE_MAX_WAIT_MS', 5)),
+    )
+    for name in MODEL_FILES
+}
+
+
+def load_models():
+    # 啟動時載入並暖機模型，之後所有請求共用；模型檔更新時自動熱替換
+    for name, filename in MODEL_FILES.items():
+        if name not in registry.status():
+            registry.register(name, os.path.join(MODEL_DIR, filename), defer_keras=PREFORK)
+    if not PREFORK:
+        start_background()
+        runtime_stats.mark_ready()
+
+
+def start_background():
+    # 模型監看與收盤後預先計算的背景執行緒
+    registry.start_watcher()
+    start_scheduler()
+
+
+def after_fork():
+    # 預先載入模式下每個 worker fork 後呼叫：載入主行程延後的模型並啟動背景執行緒
+    registry.load_pending()
+    start_background()
+    return runtime_stats.mark_ready()
+
+
+def readiness():
+    # 所有模型都已載入並暖機時才算就緒，回傳 (是否就緒, 狀態內容)
+    ready = registry.ready()
+    return ready, {"ready": ready, "models": registry.status(), **runtime_stats.snapshot()}
+
+
+def predict_range(stock_code):
+    # 到最後一個已收盤交易日為止(不含結束日)，收盤後當天的K棒也會納入
+    end = completed_until(stock_code)
+    end_date = end.strftime('%Y-%m-%d')
+    # 獲取90天前的日期(約 60 根K棒)；模型的視窗較長時往前多取，每 5 個交易日約 7 天，另加兩週的假日餘裕
+    days = max(90, pipeline.window_rows() * 7 // 5 + 14)
+    start_date = (end - timedelta(days=days)).strftime('%Y-%m-%d')
+    return start_date, end_date
+
+
+def current_data(stock_code):
+    stock_data = StockData(stock_code)  # 每次請求都實例化新的股票數據對象
+    return stock_data.fetch_current_data()  # 獲取當前股票資訊
+
+
+def history_data(stock_code, start_date, end_date):
+    stock_data = StockData(stock_code)
+    return stock_data.fetch_historical_data(start_date, end_date)
+
+
+def history_page(stock_code, start_date, end_date, limit=None, cursor=None, resolution='day', max_points=None):
+    # 分頁查詢：cursor 為上一頁最後一根K棒的日期
+    shaped = resolution != 'day' or max_points is not None
+    if cursor is not None and start_date and not shaped:
+        # 原始日線只需讀取 cursor 之後的資料；彙整或降採樣時區段取決於整個區間，仍讀取完整區間
+        start_date = max(start_date, (cursor + timedelta(days=1)).strftime('%Y-%m-%d'))
+    historical_data = history_data(stock_code, start_date, end_date)
+    if historical_data is None or historical_data.empty:
+        return historical_data, None
+    if shaped:
+        historical_data = shape_history(stock_code, start_date, end_date, historical_data, resolution, max_points)
+    return paginate(historical_data, limit, cursor)
+
+
+def shape_history(stock_code, start_date, end_date, historical_data, resolution, max_points):
+    # 依 (代號, 區間, 解析度, 點數) 快取；最後一根K棒與筆數也放進鍵，日線更新後不會讀到舊的結果
+    key = (stock_code, start_date, end_date, resolution, max_points,
+           historical_data['date'].iloc[-1], len(historical_data))
+    return history_cache.get(key, lambda: shape(historical_data, resolution, max_points))
+
+
+def fetch_bars(stock_code):
+    # 只做網路 I/O：確保日線資料庫有預測需要的區間，之後的計算都從本地讀取
+    start_date, end_date = predict_range(stock_code)
+    bar_store.get(stock_code, start_date, end_date)
+
+
+def load_features(stock_code):
+    start_date, end_date = predict_range(stock_code)
+    stock_data = StockData(stock_code)
+
+    # 技術指標由串流指標引擎增量計算，只需更新新進的K棒
+    data = stock_data.fetch_indicator_data(start_date, end_date)
+    data.index = pd.to_datetime(data['date'])
+    data.bfill(inplace=True);  # 使用向後填充處理缺失值
+    # 處理後的特徵交給背景執行緒依代號與日期存檔，請求不等待磁碟寫入
+    feature_store.submit(stock_code, data)
+    return data
+
+
+# 1 日與 5 日模型共用同一份特徵與視窗準備流程
+pipeline = InferencePipeline(HORIZON_MODELS, batchers, registry, FEATURES, load_features)
+
+
+def prediction_keys(stock_code, horizons):
+    # 日線模型在下一根K棒收盤前答案都相同，以最後一根已收盤K棒與模型指紋作為快取鍵；
+    # 指紋在各 worker 都相同，預先計算寫到磁碟的結果其他 worker 也能使用
+    last_bar = bar_store.last_bar(stock_code, predict_range(stock_code)[1])
+    return {horizon: (stock_code, last_bar, registry.fingerprint(HORIZON_MODELS[horizon]), horizon)
+            for horizon in horizons}
+
+
+def lookup_predictions(stock_code, horizons):
+    # 回傳各天數的快取鍵與已快取的預測結果
+    keys = prediction_keys(stock_code, horizons)
+    cached = {horizon: prediction_cache.get(key) for horizon, key in keys.items()}
+    return keys, {horizon: value for horizon, value in cached.items() if value is not None}
+
+
+def store_prediction(key, snapshot, predictions):
+    # 以實際推論用的模型指紋存放，查詢快取之後模型才被替換時不會把新模型的結果存到舊版本的鍵
+    stock_code, last_bar, _, horizon = key
+    predictions = predictions.tolist()
+    prediction_cache.put((stock_code, last_bar, snapshot.fingerprint, horizon), predictions)
+    return predictions
+
+
+def predict_horizons(stock_code, horizons=None):
+    # 同一檔股票只準備一次特徵，快取未命中的天數一起送進各自的模型
+    horizons = list(HORIZON_MODELS) if horizons is None else horizons
+    keys, results = lookup_predictions(stock_code, horizons)
+    missing = [horizon for horizon in horizons if horizon not in results]
+    if missing:
+        prepared = pipeline.prepare(stock_code)
+        snapshots = {horizon: pipeline.snapshot(horizon) for horizon in missing}
+        for horizon, (predictions,) in pipeline.predict([prepared], missing, snapshots).items():
+            results[horizon] = store_prediction(keys[horizon], snapshots[horizon], predictions)
+    return results
+
+
+def predict_symbol(stock_code, horizon):
+    return predict_horizons(stock_code, [horizon])[horizon]
+
+
+def format_horizons(results):
+    # 與單一天數的端點相同：1 日預測回傳單一價格，多日預測回傳串列
+    return {horizon: predictions[0] if horizon == 1 else predictions for horizon, predictions in results.items()}
+
+
+def parse_batch_args(args):
+    # 例如 symbols=TSLA,NVDA,2618.TW&horizon=5，參數不正確時丟出 ValueError
+    symbols = list(dict.fromkeys(s.strip() for s in args.get('symbols', '').split(',') if s.strip()))
+    try:
+        horizon = int(args.get('horizon', 1))
+    except ValueError:
+        horizon = None
+    if not symbols:
+        raise ValueError("No symbols given")
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        raise ValueError(f"At most {MAX_BATCH_SYMBOLS} symbols per request")
+    if horizon not in HORIZON_MODELS:
+        raise ValueError(f"horizon must be one of {sorted(HORIZON_MODELS)}")
+    return symbols, horizon
+
+
+def current_cache_policy(stock_code, args):
+    # 即時報價只快取與報價快取相同的秒數；內容無法事先得知，ETag 由回應本身計算
+    return None, http_cache.public(quote_cache.ttl)
+
+
+def history_cache_policy(stock_code, args):
+    # 回傳 (ETag 或 None, Cache-Control)；區間都已收盤時內容只取決於參數與最後一根K棒
+    start_date, end_date = args.get('start_date'), args.get('end_date')
+    if not (start_date and end_date):
+        # 直接向上游查詢
+        return None, http_cache.public(quote_cache.ttl)
+    try:
+        end = parse_day(end_date, 'end_date')
+    except ValueError:
+        # 日期格式不正確，交給路由回應 400
+        return None, http_cache.NO_STORE
+    if end > completed_until(stock_code):
+        # 區間包含尚未收盤的交易日，K棒還會變動
+        return None, http_cache.public(quote_cache.ttl)
+    last_bar = bar_store.last_bar(stock_code, end_date)
+    # 除權息後已收盤的K棒會被重新還原，ETag 必須跟著改變
+    etag = http_cache.make_etag(stock_code, last_bar, bar_store.actions_version(stock_code),
+                                http_cache.query_items(args))
+    return etag, http_cache.public(http_cache.seconds_until_close(stock_code))
+
+
+def prediction_cache_policy(stock_code, args, horizons=None):
+    # 預測只在新K棒收盤或模型更新後改變，快取到下一次收盤
+    horizons = list(HORIZON_MODELS) if horizons is None else horizons
+    last_bar = bar_store.last_bar(stock_code, predict_range(stock_code)[1])
+    models = [registry.fingerprint(HORIZON_MODELS[horizon]) for horizon in horizons]
+    etag = http_cache.make_etag(stock_code, last_bar, models, http_cache.query_items(args))
+    return etag, http_cache.public(http_cache.seconds_until_close(stock_code))
+
+
+def batch_cache_policy(args):
+    try:
+        symbols, horizon = parse_batch_args(args)
+    except ValueError:
+        return None, http_cache.NO_STORE
+    last_bars = [bar_store.last_bar(symbol, predict_range(symbol)[1]) for symbol in symbols]
+    etag = http_cache.make_etag(symbols, last_bars, registry.fingerprint(HORIZON_MODELS[horizon]),
+                                http_cache.query_items(args))
+    return etag, http_cache.public(min(http_cache.seconds_until_close(symbol) for symbol in symbols))
+
+
+def format_predictions(symbols, horizon, results):
+    return {
+        symbol: results[symbol][0] if horizon == 1 else results[symbol]
+        for symbol in symbols if symbol in results
+    }
+
+
+def predict_many(symbols, horizons):
+    # 同時查詢快取並準備未命中股票的特徵，個別失敗的股票另外回報
+    def lookup(symbol):
+        keys, cached = lookup_predictions(symbol, horizons)
+        return keys, cached, None if len(cached) == len(horizons) else pipeline.prepare(symbol)
+
+    results, prepared, errors = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=min(16, len(symbols))) as executor:
+        futures = {symbol: executor.submit(lookup, symbol) for symbol in symbols}
+        for symbol, future in futures.items():
+            try:
+                keys, cached, features = future.result()
+            except Exception as e:
+                errors[symbol] = str(e)
+                continue
+            results[symbol] = cached
+            if features is not None:
+                prepared[symbol] = (keys, features)
+
+    # 每個天數把未命中股票的視窗疊成一個批次，只做一次前向傳播；各天數的批次同時送出
+    futures = {}
+    for horizon in horizons:
+        pending = [symbol for symbol in prepared if horizon not in results[symbol]]
+        if pending:
+            snapshot = pipeline.snapshot(horizon)
+            future = pipeline.submit([prepared[symbol][1] for symbol in pending], horizon, snapshot)
+            futures[horizon] = (pending, snapshot, future)
+    for horizon, (pending, snapshot, future) in futures.items():
+        for symbol, predictions in zip(pending, future.result()):
+            results[symbol][horizon] = store_prediction(prepared[symbol][0][horizon], snapshot, predictions)
+
+    return results, errors
+
+
+def predict_batch(symbols, horizon):
+    results, errors = predict_many(symbols, [horizon])
+    results = {symbol: predictions[horizon] for symbol, predictions in results.items()}
+    return format_predictions(symbols, horizon, results), errors
+
+
+def precompute(symbols):
+    # 更新日線後，每檔股票準備一次特徵，以批次方式重新計算所有預測天數並寫入預測快取
+    for start in range(0, len(symbols), MAX_BATCH_SYMBOLS):
+        chunk = symbols[start:start + MAX_BATCH_SYMBOLS]
+        # 缺少的日線一次交給上游並行下載，限速與並行上限由 provider 控制
+        failed = bar_store.get_many({symbol: predict_range(symbol) for symbol in chunk})
+        _, errors = predict_many([symbol for symbol in chunk if symbol not in failed], list(HORIZON_MODELS))
+        for symbol, error in {**failed, **errors}.items():
+            print(f"預先計算 {symbol} 失敗: {error}")
+
+
+scheduler = PrecomputeScheduler(WATCHLIST, precompute, lock_path=SCHEDULER_LOCK)
+
+
+def start_scheduler():
+    if WATCHLIST:
+        scheduler.start()
+
+
+def inference_metrics():
+    # 推論佇列的批次大小與排隊等待時間
+    return {name: batcher.stats() for name, batcher in batchers.items()}
+
+
+def cache_metrics():
+    # 預測結果與即時報價快取的命中統計
+    return {
+        "predictions": prediction_cache.stats(),
+        "quotes": quote_cache.stats(),
+        "history": history_cache.stats(),
+        "precompute": scheduler.status(),
+        "upstream": bar_store.provider.stats()
+    }
@@ -0,0 +1,269 @@
+'''
+多股票訓練程式：對每個 (股票代號, 預測天數) 訓練一個模型，以行程池平行執行。
+每個行程限制 TensorFlow 與 BLAS 的執行緒數，行程數 x 執行緒數不超過 CPU 核心數，避免互相搶核心。
+
+每次訓練的結果存成一個新版本，不會覆蓋舊模型：
+    <output>/<代號>/h<天數>/v<N>/model.keras    模型
+    <output>/<代號>/h<天數>/v<N>/metrics.json   設定、測試集 MSE/RMSE/MAE/MAPE 與訓練時間
+並在 <output>/summary_<時間>.csv 寫入本次所有模型的測試指標。
+超參數搜尋(tune.py)匯出的 <output>/best_configs.json 存在時，會覆蓋對應天數的預設設定。
+
+使用方式(在專案根目錄下)：
+    python backend/py/train_models.py --symbols TSLA NVDA 2618.TW --horizons 1 5 --workers 4
+先以 dataset_store.py 把 CSV 轉換成資料集時，訓練資料改以 memory-map 讀取，不必每次解析 CSV。
+加上 --source snapshots 時改用推論服務存下的特徵快照(data/features/)訓練，特徵與線上預測時看到的完全相同。
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 讓訓練程式可以匯入 backend/py 的共用模組
+from py.dataset_store import consolidate, dataset_store, source_files
+from py.feature_store import feature_store
+from py.scaling import MinMaxScaler, save_scaler
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "original data")
+DEFAULT_OUTPUT_DIR = os.path.join(BACKEND_DIR, "models")
+BEST_CONFIGS_PATH = os.path.join(DEFAULT_OUTPUT_DIR, "best_configs.json")
+
+# 選擇特徵，最後一欄為預測目標(與 training.py / training2.py 相同)
+FEATURES = ['open', 'high', 'low', 'close', 'volume', 'macdhist', 'RSI', 'MOM', 'slowk', 'slowd']
+
+# 訓練資料的來源：csv 為 original data/ 的 CSV(或轉換後的資料集)，snapshots 為推論服務的特徵快照
+SOURCES = ("csv", "snapshots")
+
+# 各預測天數的模型設定，1 日沿用 training.py，5 日沿用 training2.py
+DEFAULT_CONFIGS = {
+    1: {
+        "lstm_units": [256, 128], "dropout": 0.3, "dense_units": [32], "dense_activation": "linear",
+        "time_steps": 30, "learning_rate": 0.001, "batch_size": 16, "epochs": 150, "patience": 10,
+    },
+    5: {
+        "lstm_units": [128, 128], "dropout": 0.2, "dense_units": [16, 8], "dense_activation": "relu",
+        "time_steps": 30, "learning_rate": 0.001, "batch_size": 16, "epochs": 150, "patience": 15,
+    },
+}
+
+
+def load_configs(path=BEST_CONFIGS_PATH):
+    # 讀取超參數搜尋匯出的設定，格式為 {"<天數>": {...}}；檔案不存在時沿用預設設定
+    try:
+        with open(path, encoding="utf-8") as f:
+            tuned = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {int(horizon): config for horizon, config in tuned.items()}
+
+
+def read_history(symbol, data_dir=DEFAULT_DATA_DIR):
+    # 合併 <data_dir>/<代號>/ 底下所有 <代號>_history*.csv(與 dataset_store.py 的轉換相同)，以交易日為索引，向後填充缺失值
+    paths = source_files(data_dir, symbol)
+    if not paths:
+        raise FileNotFoundError(f"找不到 {symbol} 的 CSV: {os.path.join(data_dir, symbol)}")
+    return consolidate(paths)[0].bfill()
+
+
+def history_matrix(symbol, data_dir=DEFAULT_DATA_DIR, source="csv"):
+    # 回傳 (交易日, FEATURES 欄位的 float32 矩陣)；已由 dataset_store.py 轉換且未過期時以 memory-map 讀取，否則讀 CSV
+    if source == "snapshots":
+        # 快照在推論時已向後填充，不需再填
+        history = feature_store.history(symbol)
+        return history.index.to_numpy(dtype='datetime64[D]'), history[FEATURES].to_numpy(dtype=np.float32)
+    dataset = dataset_store.find(symbol, data_dir)
+    if dataset is not None:
+        return dataset.dates, dataset.matrix(FEATURES)
+    history = read_history(symbol, data_dir)
+    return history.index.to_numpy().astype('datetime64[D]'), history[FEATURES].to_numpy(dtype=np.float32)
+
+
+def load_features(symbol, data_dir=DEFAULT_DATA_DIR, source="csv"):
+    # 選擇特徵後以整段資料正規化
+    scaler = MinMaxScaler(FEATURES)
+    return scaler.fit_transform(history_matrix(symbol, data_dir, source)[1]), scaler
+
+
+def build_model(horizon, n_features, config):
+    from keras.layers import LSTM, Dense, Dropout, Input
+    from keras.losses import Huber
+    from keras.models import Sequential
+    from tensorflow.keras.optimizers import RMSprop
+
+    from py.training_metrics import compiled_metrics
+
+    layers = [Input(shape=(config["time_steps"], n_features))]
+    units = config["lstm_units"]
+    for i, n in enumerate(units):
+        layers.append(LSTM(n, return_sequences=i < len(units) - 1))
+        layers.append(Dropout(config["dropout"]))
+    for n in config["dense_units"]:
+        layers.append(Dense(n, activation=config["dense_activation"]))
+    layers.append(Dense(horizon, activation='linear'))
+
+    model = Sequential(layers)
+    optimizer = RMSprop(learning_rate=config["learning_rate"], rho=0.9, momentum=0.9, epsilon=1e-07)
+    model.compile(optimizer=optimizer, loss=Huber(), metrics=compiled_metrics())
+    return model
+
+
+def next_version_dir(output_dir, symbol, horizon):
+    # 以建立資料夾的方式取得下一個版本號，多個行程同時訓練也不會拿到相同版本
+    base = os.path.join(output_dir, symbol, f"h{horizon}")
+    os.makedirs(base, exist_ok=True)
+    versions = [int(name[1:]) for name in os.listdir(base) if name[:1] == "v" and name[1:].isdigit()]
+    version = max(versions, default=0) + 1
+    while True:
+        path = os.path.join(base, f"v{version}")
+        try:
+            os.mkdir(path)
+            return path, version
+        except FileExistsError:
+            version += 1
+
+
+def _limit_threads(threads):
+    # 必須在匯入 TensorFlow 之前設定，子行程啟動時由 ProcessPoolExecutor 的 initializer 呼叫
+    for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                 "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[name] = str(threads)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def train_one(symbol, horizon, data_dir=DEFAULT_DATA_DIR, output_dir=DEFAULT_OUTPUT_DIR, config=None, seed=None,
+              source="csv"):
+    import keras
+    from keras.callbacks import EarlyStopping
+
+    from py.data_pipeline import make_datasets
+    from py.training_metrics import regression_metrics
+
+    config = {**DEFAULT_CONFIGS[horizon], **(config or {})}
+    if seed is not None:
+        keras.utils.set_random_seed(seed)
+    started = time.perf_counter()
+
+    features, scaler = load_features(symbol, data_dir, source)
+    datasets, targets = make_datasets([features], config["time_steps"], horizon, config["batch_size"], seed=seed)
+
+    model = build_model(horizon, features.shape[1] - 1, config)
+    early_stopping = EarlyStopping(monitor='val_loss', patience=config["patience"], restore_best_weights=True)
+    history = model.fit(datasets['train'], epochs=config["epochs"], validation_data=datasets['val'],
+                        callbacks=[early_stopping], verbose=0)
+
+    # 測試集指標(正規化後的數值)，多天預測取所有天數的平均
+    test = {k: float(v) for k, v in regression_metrics(targets['test'], model.predict(datasets['test'], verbose=0)).items()}
+
+    path, version = next_version_dir(output_dir, symbol, horizon)
+    # 正規化參數與模型放在同一個版本目錄，推論服務載入模型時一併讀取
+    save_scaler(scaler, os.path.join(path, "model.keras"))
+    model.save(os.path.join(path, "model.keras"))
+    result = {
+        "symbol": symbol,
+        "horizon": horizon,
+        "version": version,
+        "source": source,
+        "path": path,
+        "epochs": len(history.history['loss']),
+        "best_val_loss": float(min(history.history['val_loss'])),
+        "seconds": round(time.perf_counter() - started, 1),
+        **{f"test_{k}": v for k, v in test.items()},
+    }
+    with open(os.path.join(path, "metrics.json"), "w", encoding="utf-8") as f:
+        json.dump({**result, "config": config, "trained_at": datetime.now().isoformat(timespec="seconds")}, f, indent=2)
+    return result
+
+
+def train_all(symbols, horizons, workers=None, threads=None, data_dir=DEFAULT_DATA_DIR,
+              output_dir=DEFAULT_OUTPUT_DIR, configs=None, seed=None, source="csv"):
+    '''
+    以 workers 個行程平行訓練所有 (代號, 天數) 組合，回傳 (成功結果, 失敗訊息)。
+    configs 可依天數覆蓋 DEFAULT_CONFIGS，例如 {5: {"dropout": 0.1}}。
+    '''
+    tasks = [(symbol, horizon) for symbol in symbols for horizon in horizons]
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(tasks)))
+    threads = threads or max(1, cpus // workers)
+    configs = configs or {}
+
+    results, errors = [], {}
+    # TensorFlow 在 fork 之後不安全，子行程一律以 spawn 啟動
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_limit_threads, initargs=(threads,)) as executor:
+        futures = {
+            executor.submit(train_one, symbol, horizon, data_dir, output_dir, configs.get(horizon), seed, source): (symbol, horizon)
+            for symbol, horizon in tasks
+        }
+        for future in as_completed(futures):
+            symbol, horizon = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                errors[f"{symbol}/h{horizon}"] = str(e)
+                print(f"{symbol} ({horizon} 日) 訓練失敗: {e}")
+                continue
+            results.append(result)
+            print(f"{symbol} ({horizon} 日) v{result['version']} 完成，{result['seconds']}s，"
+                  f"test RMSE {result['test_rmse']:.4f}")
+    return results, errors
+
+
+def write_summary(results, output_dir=DEFAULT_OUTPUT_DIR):
+    columns = ["symbol", "horizon", "version", "test_mse", "test_rmse", "test_mae", "test_mape",
+               "epochs", "seconds", "path"]
+    summary = pd.DataFrame(results, columns=columns).sort_values(["symbol", "horizon"])
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"summary_{datetime.now():%Y%m%d_%H%M%S}.csv")
+    summary.to_csv(path, index=False)
+    return summary, path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="平行訓練多檔股票的預測模型")
+    parser.add_argument("--symbols", nargs="+", required=True, help="股票代號，例如 TSLA NVDA 2618.TW")
+    parser.add_argument("--horizons", nargs="+", type=int, default=[1, 5], choices=sorted(DEFAULT_CONFIGS))
+    parser.add_argument("--workers", type=int, default=None, help="平行訓練的行程數(預設為 CPU 核心數)")
+    parser.add_argument("--threads-per-worker", type=int, default=None, help="每個行程的執行緒數(預設為核心數 / 行程數)")
+    parser.add_argument("--epochs", type=int, default=None, help="覆蓋預設的 epoch 上限")
+    parser.add_argument("--config", default=BEST_CONFIGS_PATH, help="超參數搜尋匯出的設定檔")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--source", default="csv", choices=SOURCES, help="訓練資料來源(預設為 original data/ 的 CSV)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    configs = load_configs(args.config)
+    if args.epochs:
+        configs = {h: {**configs.get(h, {}), "epochs": args.epochs} for h in args.horizons}
+    started = time.perf_counter()
+    results, errors = train_all(args.symbols, args.horizons, args.workers, args.threads_per_worker,
+                                args.data_dir, args.output, configs, args.seed, args.source)
+    elapsed = time.perf_counter() - started
+
+    if results:
+        summary, path = write_summary(results, args.output)
+        with pd.option_context("display.width", 200, "display.max_columns", None):
+            print(summary.drop(columns="path").to_string(index=False))
+        print(f"摘要已寫入 {path}")
+    for task, error in errors.items():
+        print(f"{task}: {error}")
+    print(f"共 {len(results)} 個模型，{elapsed:.1f}s")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,62 +8,22 @@
 '''
 
 import os
+import sys
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.preprocessing import MinMaxScaler
 from keras.models import Sequential
 from keras.layers import LSTM, Dropout, Dense, Conv1D, MaxPooling1D
-from keras.callbacks import Callback, EarlyStopping, ModelCheckpoint
+from keras.callbacks import EarlyStopping, ModelCheckpoint
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 from tensorflow.keras.optimizers import RMSprop
 from keras.losses import Huber
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 讓訓練腳本可以匯入 backend/py 的共用模組
+from py.data_pipeline import make_datasets
+from py.scaling import MinMaxScaler, save_scaler  # 與 scikit-learn 相同的正規化，參數可以隨模型一起存檔
+from py.training_metrics import MetricsHistory, compiled_metrics
 
-class MetricsHistory(Callback):
-    def __init__(self, X_train, y_train, X_val, y_val):
-        self.X_train = X_train
-        self.y_train = y_train
-        self.X_val = X_val
-        self.y_val = y_val
-        super().__init__()
-
-    def on_train_begin(self, logs=None):
-        self.train_rmse = []
-        self.train_mae = []
-        self.train_mse = []
-        self.train_mape = []
-        self.val_rmse = []
-        self.val_mae = []
-        self.val_mse = []
-        self.val_mape = []
-
-    def on_epoch_end(self, epoch, logs=None):
-        train_pred = self.model.predict(self.X_train)
-        val_pred = self.model.predict(self.X_val)
-        
-        # 計算RMSE、MAE等，取所有天數的平均
-        train_rmse = np.sqrt(np.mean(np.square(self.y_train - train_pred)))
-        val_rmse = np.sqrt(np.mean(np.square(self.y_val - val_pred)))
-        train_mae = np.mean(np.abs(self.y_train - train_pred))
-        val_mae = np.mean(np.abs(self.y_val - val_pred))
-        train_mse = np.mean(np.square(self.y_train - train_pred))
-        val_mse = np.mean(np.square(self.y_val - val_pred))
-        
-        # MAPE需要避免除以零的情況
-        epsilon = 1e-8
-        train_mape = np.mean(np.abs((self.y_train - train_pred) / (self.y_train + epsilon))) * 100
-        val_mape = np.mean(np.abs((self.y_val - val_pred) / (self.y_val + epsilon))) * 100
-
-        # 保存歷史記錄
-        self.train_rmse.append(train_rmse)
-        self.val_rmse.append(val_rmse)
-        self.train_mae.append(train_mae)
-        self.val_mae.append(val_mae)
-        self.train_mse.append(train_mse)
-        self.val_mse.append(val_mse)
-        self.train_mape.append(train_mape)
-        self.val_mape.append(val_mape)
 
 # 讀取數據集
 data_path = './original data/TSLA/TSLA_history01.csv'
@@ -83,34 +43,24 @@ X_scaled = scaler.fit_transform(X)
 # 儲存處理後的數據集到CSV
 stock_data_filled.to_csv('TSLA_history_cleaned.csv', index=False)
 
-# 創建時間序列數據集
-def create_dataset(data, time_steps=30, future_days=5):
-    X, y = [], []
-    for i in range(len(data) - time_steps - future_days + 1):
-        X.append(data[i:(i + time_steps), :-1])
-        y.append(data[(i + time_steps):(i + time_steps + future_days), -1])  # 未來五天的收盤價
-    return np.array(X), np.array(y)
-
-
 # 使用30天的數據作為回測時間
 time_steps = 30
 future_days = 5
-X_series, y_series = create_dataset(X_scaled, time_steps, future_days)
 
-# 分割數據集
-train_val_size = int(len(X_series) * 0.90)
-val_size = int(train_val_size * 0.15)
+# 每個 epoch 的指標在訓練時一併計算；每 EXACT_METRICS_EVERY 個 epoch 另外以推論模式
+# 對固定抽樣的 EXACT_METRICS_SAMPLE 個視窗評估一次(設為 0 則不執行)
+EXACT_METRICS_EVERY = 10
+EXACT_METRICS_SAMPLE = 2048
 
-X_train_val, X_test = X_series[:train_val_size], X_series[train_val_size:]
-y_train_val, y_test = y_series[:train_val_size], y_series[train_val_size:]
-
-X_train, X_val = X_train_val[:-val_size], X_train_val[-val_size:]
-y_train, y_val = y_train_val[:-val_size], y_train_val[-val_size:]
+# 分割數據集：依時間順序切分，視窗在訓練時才從特徵矩陣切出
+datasets, targets = make_datasets([X_scaled], time_steps, future_days, batch_size=16,
+                                  eval_sample=EXACT_METRICS_SAMPLE)
+y_test = targets['test']
 
 
 # 模型架構
 model = Sequential([
-    LSTM(128, return_sequences=True, input_shape=(X_train.shape[1], X_train.shape[2])),
+    LSTM(128, return_sequences=True, input_shape=(time_steps, X_scaled.shape[1] - 1)),
     Dropout(0.2),
     LSTM(128),
     Dropout(0.2),
@@ -133,7 +83,7 @@ custom_rmsprop = RMSprop(
 )
 
 # 編譯模型
-model.compile(optimizer=custom_rmsprop, loss=Huber())
+model.compile(optimizer=custom_rmsprop, loss=Huber(), metrics=compiled_metrics())
 
 # 設定早停機制
 early_stopping = EarlyStopping(monitor='val_loss', patience=15, verbose=1)
@@ -141,11 +91,16 @@ early_stopping = EarlyStopping(monitor='val_loss', patience=15, verbose=1)
 # 設定模型儲存點
 checkpoint = ModelCheckpoint('backend/py/best_model_2.h5', monitor='val_loss', mode='min', verbose=1, save_best_only=True)
 
-# 在模型訓練時傳入回調，用於在Keras模型訓練過程中記錄性能指標
-metrics_history = MetricsHistory(X_train, y_train, X_val, y_val)
+# 在模型訓練時傳入回調，從訓練紀錄收集性能指標
+metrics_history = MetricsHistory(
+    exact_sets={split: (datasets[f'{split}_sample'], targets[f'{split}_sample']) for split in ('train', 'val')},
+    exact_every=EXACT_METRICS_EVERY
+)
 
-history = model.fit(X_train, y_train, epochs=150, batch_size=16, validation_data=(X_val, y_val), callbacks=[early_stopping, checkpoint, metrics_history])
+history = model.fit(datasets['train'], epochs=150, validation_data=datasets['val'], callbacks=[early_stopping, checkpoint, metrics_history])
 
+# 訓練時的正規化參數存在模型旁，推論時直接套用，不再以每次請求的資料重新擬合
+save_scaler(scaler, "backend/py/model_2.keras")
 model.save("backend/py/model_2.keras")
 
 # 繪製訓練和驗證的損失曲線
@@ -188,7 +143,7 @@ plt.tight_layout()
 plt.show()
 
 # 預測未來五天收盤價
-y_pred_test = model.predict(X_test)
+y_pred_test = model.predict(datasets['test'])
 
 # 計算每天的MSE、MAE等，並取平均值
 mse = np.mean([mean_squared_error(y_test[:, i], y_pred_test[:, i]) for i in range(y_test.shape[1])])
@@ -0,0 +1,71 @@
+'''
+訓練過程的評估指標：RMSE、MAE、MSE、MAPE 以編譯時的 Keras 指標計算，
+在訓練與驗證原本就要做的前向傳播中累積，不必每個 epoch 再對整個資料集執行 predict。
+
+編譯指標的訓練集數值是 epoch 內各批次的平均(含 Dropout、權重仍在更新)，
+需要與推論模式完全一致的數值時，可以每 N 個 epoch 對固定的樣本額外執行一次 predict。
+'''
+
+import numpy as np
+from keras.callbacks import Callback
+from keras.metrics import MeanAbsoluteError, MeanAbsolutePercentageError, MeanSquaredError, RootMeanSquaredError
+
+
+METRIC_NAMES = ['rmse', 'mae', 'mse', 'mape']
+
+
+def compiled_metrics():
+    # 傳給 model.compile(metrics=...)，名稱會成為 logs 的鍵，例如 rmse、val_rmse
+    return [
+        RootMeanSquaredError(name='rmse'),
+        MeanAbsoluteError(name='mae'),
+        MeanSquaredError(name='mse'),
+        MeanAbsolutePercentageError(name='mape'),
+    ]
+
+
+def regression_metrics(y_true, y_pred, epsilon=1e-8):
+    # 以 NumPy 計算所有預測天數的平均指標
+    y_true = np.asarray(y_true).reshape(len(y_true), -1)
+    y_pred = np.asarray(y_pred).reshape(len(y_pred), -1)
+    mse = np.mean(np.square(y_true - y_pred))
+    return {
+        'rmse': np.sqrt(mse),
+        'mae': np.mean(np.abs(y_true - y_pred)),
+        'mse': mse,
+        'mape': np.mean(np.abs((y_true - y_pred) / (y_true + epsilon))) * 100,
+    }
+
+
+class MetricsHistory(Callback):
+    '''
+    從 logs 收集每個 epoch 的編譯指標，供訓練結束後繪圖。
+    exact_every > 0 時，每 exact_every 個 epoch 以推論模式對 exact_sets 執行 predict，
+    exact_sets 例如 {'train': (資料集, 目標值), 'val': (資料集, 目標值)}，結果存在 exact_history。
+    '''
+
+    def __init__(self, exact_sets=None, exact_every=0):
+        super().__init__()
+        self.exact_sets = exact_sets or {}
+        self.exact_every = exact_every
+
+    def on_train_begin(self, logs=None):
+        for name in METRIC_NAMES:
+            setattr(self, f'train_{name}', [])
+            setattr(self, f'val_{name}', [])
+        self.exact_history = []
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        for name in METRIC_NAMES:
+            getattr(self, f'train_{name}').append(logs.get(name, np.nan))
+            getattr(self, f'val_{name}').append(logs.get(f'val_{name}', np.nan))
+
+        if self.exact_every and (epoch + 1) % self.exact_every == 0:
+            entry = {'epoch': epoch}
+            for split, (dataset, y_true) in self.exact_sets.items():
+                y_pred = self.model.predict(dataset, verbose=0)
+                for name, value in regression_metrics(y_true, y_pred).items():
+                    entry[f'{split}_{name}'] = value
+            self.exact_history.append(entry)
+            print(' - '.join(f'{k}: {v:.4f}' for k, v in entry.items() if k != 'epoch'))
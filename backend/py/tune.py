@@ -0,0 +1,190 @@
+'''
+LSTM 模型的超參數搜尋：以 optuna 探索 LSTM 層數與大小、Dropout、全連接層、time_steps、學習率與批次大小。
+每個 epoch 回報驗證損失，明顯落後的試驗在前幾個 epoch 就提前中止(pruning)，只在 CPU 上也負擔得起。
+
+試驗結果存在本地的 SQLite 資料庫，中斷後以相同的 --study 名稱再次執行即可接續；
+多個行程共用同一個資料庫平行執行試驗。搜尋結束後以 --export 將最佳設定寫入
+train_models.py 讀取的 best_configs.json，之後的訓練會直接使用。
+
+optuna 為選用套件，只有執行搜尋時才需要安裝(pip install optuna)。
+
+使用方式(在專案根目錄下)：
+    python backend/py/tune.py --symbols TSLA NVDA --horizon 5 --trials 60 --workers 4 --export
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 讓搜尋程式可以匯入 backend/py 的共用模組
+from py.train_models import (BACKEND_DIR, BEST_CONFIGS_PATH, DEFAULT_CONFIGS, DEFAULT_DATA_DIR, _limit_threads,
+                             load_features)
+
+
+DEFAULT_STORAGE = "sqlite:///" + os.path.join(BACKEND_DIR, "data", "tuning.db").replace(os.sep, "/")
+
+
+def _import_optuna():
+    try:
+        import optuna
+    except ImportError:
+        raise ImportError("超參數搜尋需要 optuna，請先執行 pip install optuna") from None
+    return optuna
+
+
+def suggest_config(trial, horizon):
+    # 搜尋空間；未搜尋的項目(例如 patience)沿用該天數的預設設定
+    n_lstm = trial.suggest_int("n_lstm", 1, 2)
+    n_dense = trial.suggest_int("n_dense", 0, 2)
+    return {
+        **DEFAULT_CONFIGS[horizon],
+        "lstm_units": [trial.suggest_categorical(f"lstm_{i}", [32, 64, 128, 256]) for i in range(n_lstm)],
+        "dropout": trial.suggest_float("dropout", 0.0, 0.5, step=0.05),
+        "dense_units": [trial.suggest_categorical(f"dense_{i}", [8, 16, 32, 64]) for i in range(n_dense)],
+        "dense_activation": trial.suggest_categorical("dense_activation", ["linear", "relu"]),
+        "time_steps": trial.suggest_categorical("time_steps", [20, 30, 45, 60]),
+        "learning_rate": trial.suggest_float("learning_rate", 1e-4, 1e-2, log=True),
+        "batch_size": trial.suggest_categorical("batch_size", [16, 32, 64]),
+    }
+
+
+def _objective(symbols, horizon, data_dir, max_epochs, seed):
+    from keras.callbacks import Callback, EarlyStopping
+
+    from py.data_pipeline import make_datasets
+    from py.train_models import build_model
+
+    optuna = _import_optuna()
+    features = [load_features(symbol, data_dir)[0] for symbol in symbols]
+
+    class PruningCallback(Callback):
+        # 每個 epoch 回報驗證損失；應該中止時停止訓練，fit 結束後再丟出 TrialPruned
+        def __init__(self, trial):
+            super().__init__()
+            self.trial = trial
+            self.pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.trial.report(float(logs["val_loss"]), epoch)
+            if self.trial.should_prune():
+                self.pruned = True
+                self.model.stop_training = True
+
+    def objective(trial):
+        config = {**suggest_config(trial, horizon), "epochs": max_epochs}
+        datasets, _ = make_datasets(features, config["time_steps"], horizon, config["batch_size"], seed=seed)
+        model = build_model(horizon, features[0].shape[1] - 1, config)
+        pruning = PruningCallback(trial)
+        early_stopping = EarlyStopping(monitor='val_loss', patience=config["patience"])
+        history = model.fit(datasets['train'], epochs=config["epochs"], validation_data=datasets['val'],
+                            callbacks=[early_stopping, pruning], verbose=0)
+        if pruning.pruned:
+            raise optuna.TrialPruned()
+        trial.set_user_attr("config", config)
+        trial.set_user_attr("epochs", len(history.history['val_loss']))
+        return float(min(history.history['val_loss']))
+
+    return objective
+
+
+def create_study(study_name, storage=DEFAULT_STORAGE, seed=None):
+    optuna = _import_optuna()
+    if storage.startswith("sqlite:///"):
+        os.makedirs(os.path.dirname(os.path.abspath(storage[len("sqlite:///"):])), exist_ok=True)
+    return optuna.create_study(
+        study_name=study_name,
+        storage=storage,
+        direction="minimize",
+        load_if_exists=True,
+        sampler=optuna.samplers.TPESampler(seed=seed),
+        # 前 5 個試驗完整執行作為基準，之後從第 3 個 epoch 起低於中位數表現的試驗即中止
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=3),
+    )
+
+
+def _run_worker(study_name, storage, n_trials, symbols, horizon, data_dir, max_epochs, seed):
+    # 每個子行程各自連到同一個資料庫，由 optuna 協調試驗
+    optuna = _import_optuna()
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = create_study(study_name, storage, seed)
+    study.optimize(_objective(symbols, horizon, data_dir, max_epochs, seed), n_trials=n_trials)
+
+
+def search(symbols, horizon, n_trials, workers=None, threads=None, study_name=None, storage=DEFAULT_STORAGE,
+           data_dir=DEFAULT_DATA_DIR, max_epochs=50, seed=None):
+    study_name = study_name or f"lstm_h{horizon}"
+    study = create_study(study_name, storage, seed)  # 先在主行程建立資料表，避免子行程同時建立
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, n_trials))
+    threads = threads or max(1, cpus // workers)
+    per_worker = [n_trials // workers + (i < n_trials % workers) for i in range(workers)]
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_limit_threads, initargs=(threads,)) as executor:
+        futures = [
+            executor.submit(_run_worker, study_name, storage, n, symbols, horizon, data_dir, max_epochs,
+                            None if seed is None else seed + i)
+            for i, n in enumerate(per_worker)
+        ]
+        for future in futures:
+            future.result()
+    return study
+
+
+def export_best(study, horizon, path=BEST_CONFIGS_PATH):
+    # 只更新這個天數的設定，其他天數已匯出的設定保留
+    try:
+        with open(path, encoding="utf-8") as f:
+            configs = json.load(f)
+    except FileNotFoundError:
+        configs = {}
+    config = dict(study.best_trial.user_attrs["config"])
+    config["epochs"] = DEFAULT_CONFIGS[horizon]["epochs"]  # 搜尋時的 epoch 上限較低，正式訓練沿用預設上限
+    configs[str(horizon)] = config
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(configs, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LSTM 模型超參數搜尋")
+    parser.add_argument("--symbols", nargs="+", required=True)
+    parser.add_argument("--horizon", type=int, default=5, choices=sorted(DEFAULT_CONFIGS))
+    parser.add_argument("--trials", type=int, default=40, help="本次執行新增的試驗數")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--epochs", type=int, default=50, help="每個試驗的 epoch 上限")
+    parser.add_argument("--study", default=None, help="研究名稱，預設為 lstm_h<天數>；相同名稱會接續之前的試驗")
+    parser.add_argument("--storage", default=DEFAULT_STORAGE)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--export", action="store_true", help="將最佳設定寫入 train_models.py 讀取的設定檔")
+    parser.add_argument("--config", default=BEST_CONFIGS_PATH, help="匯出的設定檔路徑")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    optuna = _import_optuna()
+    started = time.perf_counter()
+    study = search(args.symbols, args.horizon, args.trials, args.workers, args.threads_per_worker, args.study,
+                   args.storage, args.data_dir, args.epochs, args.seed)
+    elapsed = time.perf_counter() - started
+
+    states = [trial.state for trial in study.trials]
+    complete = states.count(optuna.trial.TrialState.COMPLETE)
+    pruned = states.count(optuna.trial.TrialState.PRUNED)
+    print(f"{study.study_name}: {len(states)} 個試驗(完成 {complete}、中止 {pruned})，本次 {elapsed:.1f}s")
+    print(f"最佳驗證損失 {study.best_value:.5f}，設定: {json.dumps(study.best_trial.user_attrs['config'])}")
+    if args.export:
+        export_best(study, args.horizon, args.config)
+        print(f"已匯出至 {args.config}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+'''
+時間序列視窗：以 sliding_window_view 建立共用原始陣列記憶體的視圖，
+不需用 Python 迴圈逐一複製每個 30 天的視窗。
+
+資料的最後一欄是預測目標，其餘欄位是輸入特徵，與原本的 create_dataset 相同。
+'''
+
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# 創建時間序列數據集
+def create_dataset(data, time_steps=30, future_days=5):
+    data = np.asarray(data)
+    n = len(data) - time_steps - future_days + 1
+    if n <= 0:
+        return (
+            np.empty((0, time_steps, data.shape[1] - 1), dtype=data.dtype),
+            np.empty((0, future_days), dtype=data.dtype),
+        )
+
+    # X[i] = data[i:i+time_steps, :-1]，視圖形狀為 (n, time_steps, 特徵數)
+    X = sliding_window_view(data[:n + time_steps - 1, :-1], time_steps, axis=0).transpose(0, 2, 1)
+    # y[i] = data[i+time_steps:i+time_steps+future_days, -1]，未來幾天的目標值
+    y = sliding_window_view(data[time_steps:, -1], future_days)[:n]
+    return X, y
+
+
+def last_window(data, time_steps=30, future_days=5):
+    # 推論時只需要最後一個視窗，等同 create_dataset(...)[0][-1:]，但不建立其他視窗
+    data = np.asarray(data)
+    end = len(data) - future_days
+    if end < time_steps:
+        raise ValueError(f"資料長度 {len(data)} 不足以建立 {time_steps} 天的視窗")
+    return data[end - time_steps:end, :-1][np.newaxis]
+
+
+def _create_dataset_loop(data, time_steps=30, future_days=5):
+    # 原本的迴圈實作，只用來驗證結果一致與比較效能
+    X, y = [], []
+    for i in range(len(data) - time_steps - future_days + 1):
+        X.append(data[i:(i + time_steps), :-1])
+        y.append(data[(i + time_steps):(i + time_steps + future_days), -1])
+    return np.array(X), np.array(y)
+
+
+if __name__ == "__main__":
+    # 效能比較：200 檔股票、每檔十年日線(約 2520 根K棒)、10 個欄位
+    rng = np.random.default_rng(0)
+    symbols = [rng.random((2520, 10)) for _ in range(200)]
+
+    for future_days in (1, 5):
+        for data in symbols[:5]:
+            X_loop, y_loop = _create_dataset_loop(data, 30, future_days)
+            X_view, y_view = create_dataset(data, 30, future_days)
+            assert np.array_equal(X_loop, X_view) and np.array_equal(y_loop, y_view)
+            assert np.array_equal(X_loop[-1:], last_window(data, 30, future_days))
+
+    start = time.perf_counter()
+    for data in symbols:
+        _create_dataset_loop(data, 30, 5)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data in symbols:
+        create_dataset(data, 30, 5)
+    view_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data in symbols:
+        last_window(data, 30, 5)
+    last_time = time.perf_counter() - start
+
+    print(f"迴圈版本: {loop_time:.3f}s")
+    print(f"視圖版本: {view_time:.4f}s ({loop_time / view_time:.0f}x)")
+    print(f"只取最後視窗: {last_time * 1e3:.3f}ms")
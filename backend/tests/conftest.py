@@ -0,0 +1,13 @@
+import os
+import sys
+import types
+
+# 讓測試可以匯入 backend/py 的共用模組(與 app.py 在 backend 目錄下執行時相同)。
+# backend/py 沒有 __init__.py，pytest 附帶的 site-packages/py.py 會優先於這個 namespace package 被匯入，
+# 因此直接以 backend/py 建立 py 套件；pytest.ini 停用了唯一會用到 py.py 的 legacypath 外掛
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+package = types.ModuleType("py")
+package.__path__ = [os.path.join(BACKEND_DIR, "py")]
+sys.modules["py"] = package
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
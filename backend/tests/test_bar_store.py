@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+from py.bar_store import BarStore
+from py.providers import FixtureProvider
+
+
+def _history(start="2024-01-01", n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    index = pd.bdate_range(start, periods=n, tz="America/New_York")
+    return pd.DataFrame({
+        "Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+        "Volume": rng.integers(1_000, 10_000, n).astype(float), "Dividends": 0.0, "Stock Splits": 0.0,
+    }, index=index)
+
+
+def _store(tmp_path, frames):
+    provider = FixtureProvider(frames)
+    return BarStore(provider, str(tmp_path)), provider
+
+
+def test_reads_through_and_only_fetches_missing_ranges(tmp_path):
+    store, provider = _store(tmp_path, {"X": _history()})
+    first = store.get("X", "2024-01-10", "2024-02-01")
+    assert provider.calls == [("X", "2024-01-10", "2024-02-01")]
+    assert first.index[0].strftime("%Y-%m-%d") == "2024-01-10" and len(first) == 16
+
+    # 已涵蓋的區間不再向上游查詢
+    pd.testing.assert_frame_equal(store.get("X", "2024-01-15", "2024-01-25"), first.loc["2024-01-15":"2024-01-24"])
+    assert len(provider.calls) == 1
+
+    # 較大的區間只補前後缺少的部分
+    store.get("X", "2024-01-01", "2024-02-15")
+    assert provider.calls[1:] == [("X", "2024-01-01", "2024-01-10"), ("X", "2024-02-01", "2024-02-15")]
+
+
+def test_restart_reads_from_disk(tmp_path):
+    store, _ = _store(tmp_path, {"X": _history()})
+    expected = store.get("X", "2024-01-01", "2024-03-01")
+
+    restarted, provider = _store(tmp_path, {"X": _history()})
+    pd.testing.assert_frame_equal(restarted.get("X", "2024-01-01", "2024-03-01"), expected)
+    assert provider.calls == []
+
+
+def test_new_split_replaces_readjusted_bars(tmp_path):
+    history = _history()
+    store, provider = _store(tmp_path, {"X": history})
+    store.get("X", "2024-01-01", "2024-02-01")
+
+    # 2024-02-05 分割 1 拆 2，上游把之前的價格全部還原成一半
+    split = history.copy()
+    before = split.index < pd.Timestamp("2024-02-05", tz="America/New_York")
+    split.loc[before, ["Open", "High", "Low", "Close"]] /= 2
+    split.loc[pd.Timestamp("2024-02-05", tz="America/New_York"), "Stock Splits"] = 2.0
+    provider.frames["X"] = FixtureProvider({"X": split}).frames["X"]
+
+    result = store.get("X", "2024-01-01", "2024-03-01")
+    # 偵測到新的分割後整段重新下載，舊的價格不會與新的混在一起
+    assert provider.calls[-1] == ("X", "2024-01-01", "2024-03-01")
+    np.testing.assert_allclose(result["close"].to_numpy(), split["Close"].loc[:"2024-02-29"].to_numpy())
+
+
+def test_known_dividend_does_not_invalidate(tmp_path):
+    history = _history()
+    history.loc[history.index[5], "Dividends"] = 0.5
+    store, provider = _store(tmp_path, {"X": history})
+    store.get("X", "2024-01-01", "2024-02-01")
+    store.get("X", "2024-01-01", "2024-02-15")
+    assert provider.calls[-1] == ("X", "2024-02-01", "2024-02-15")
+
+
+def test_get_many_reports_failures_per_symbol(tmp_path):
+    class Failing(FixtureProvider):
+        def fetch_history(self, symbol, start_date, end_date):
+            if symbol == "BAD":
+                raise ConnectionError("upstream down")
+            return super().fetch_history(symbol, start_date, end_date)
+
+    store = BarStore(Failing({"X": _history(), "Y": _history(seed=1)}), str(tmp_path))
+    errors = store.get_many({symbol: ("2024-01-01", "2024-02-01") for symbol in ["X", "Y", "BAD"]})
+    assert list(errors) == ["BAD"]
+    assert len(store.get("Y", "2024-01-01", "2024-02-01")) == 23
+    assert store.last_bar("X", "2024-02-01").strftime("%Y-%m-%d") == "2024-01-31"
+
+
+def test_actions_version_changes_after_a_split(tmp_path):
+    history = _history()
+    store, provider = _store(tmp_path, {"X": history})
+    store.get("X", "2024-01-01", "2024-02-01")
+    before = store.actions_version("X")
+
+    split = history.copy()
+    split.loc[pd.Timestamp("2024-02-05", tz="America/New_York"), "Stock Splits"] = 2.0
+    provider.frames["X"] = FixtureProvider({"X": split}).frames["X"]
+    store.get("X", "2024-01-01", "2024-03-01")
+    assert before == (0, None) and store.actions_version("X") != before
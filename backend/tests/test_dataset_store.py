@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from py import train_models
+from py.dataset_store import TRAINING_FEATURES, DatasetStore
+
+
+def _write_history(directory, name, start, n, offset):
+    # 與 save_data_to_csv 相同的格式：第一欄為帶時區的日期，缺值留空
+    dates = pd.bdate_range(start, periods=n, tz="America/New_York")
+    frame = pd.DataFrame({column: np.arange(n) + offset + 0.1 for column in train_models.FEATURES})
+    frame.insert(0, "Date", dates.astype(str))
+    frame.loc[2, "RSI"] = np.nan
+    os.makedirs(directory, exist_ok=True)
+    frame.to_csv(os.path.join(directory, name), index=False)
+
+
+def test_store_and_csv_fallback_return_the_same_matrix(tmp_path, monkeypatch):
+    data_dir = str(tmp_path / "original")
+    _write_history(os.path.join(data_dir, "X"), "X_history.csv", "2024-01-01", 20, 0)
+    _write_history(os.path.join(data_dir, "X"), "X_history01.csv", "2024-01-22", 20, 1000)
+
+    store = DatasetStore(str(tmp_path / "datasets"))
+    assert store.convert(data_dir) == {"X": "converted"}
+    monkeypatch.setattr(train_models, "dataset_store", store)
+    stored_dates, stored = train_models.history_matrix("X", data_dir)
+    assert store.find("X", data_dir) is not None
+
+    monkeypatch.setattr(train_models, "dataset_store", DatasetStore(str(tmp_path / "empty")))
+    csv_dates, from_csv = train_models.history_matrix("X", data_dir)
+
+    # 兩份 CSV 共 40 列，重疊的 5 天以較晚下載的為準
+    assert len(csv_dates) == 35 and stored.dtype == from_csv.dtype == np.float32
+    np.testing.assert_array_equal(stored_dates, csv_dates)
+    np.testing.assert_array_equal(stored, from_csv)
+    assert from_csv[15, 0] == np.float32(1000.1) and not np.isnan(from_csv).any()
+
+
+def test_training_matrix_is_a_view_of_the_memory_map(tmp_path):
+    assert TRAINING_FEATURES == train_models.FEATURES
+    data_dir = str(tmp_path / "original")
+    _write_history(os.path.join(data_dir, "X"), "X_history.csv", "2024-01-01", 20, 0)
+    store = DatasetStore(str(tmp_path / "datasets"))
+    store.convert(data_dir)
+
+    dataset = store.load("X")
+    matrix = dataset.matrix(train_models.FEATURES)
+    assert isinstance(dataset.values, np.memmap) and np.shares_memory(matrix, dataset.values)
+    assert matrix.shape == (20, len(train_models.FEATURES))
+
+
+def test_stale_format_is_not_used(tmp_path):
+    data_dir = str(tmp_path / "original")
+    _write_history(os.path.join(data_dir, "X"), "X_history.csv", "2024-01-01", 20, 0)
+    store = DatasetStore(str(tmp_path / "datasets"))
+    store.convert(data_dir)
+
+    manifest = store.manifest()
+    store._save_manifest({**manifest, "format": 1})
+    store = DatasetStore(store.directory)
+    assert store.find("X", data_dir) is None
+    assert store.convert(data_dir) == {"X": "converted"}
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from py.feature_store import FeatureSnapshotStore
+from py import train_models
+
+
+def _features(start, n, offset=0.0):
+    # 與 stock_service.load_features 相同：date 欄位同時也是索引
+    index = pd.bdate_range(start, periods=n, tz="America/New_York")
+    frame = pd.DataFrame({name: np.arange(n, dtype=float) + offset for name in train_models.FEATURES}, index=index)
+    frame["date"] = frame.index
+    frame.index = pd.to_datetime(frame["date"])
+    return frame
+
+
+def test_snapshot_has_a_single_date_column(tmp_path):
+    store = FeatureSnapshotStore(str(tmp_path))
+    frame = _features("2026-01-05", 10)
+    assert store.submit("X", frame)
+    store.flush()
+
+    with open(store.path("X", "2026-01-16"), encoding="utf-8") as f:
+        header = f.readline().strip().split(",")
+    assert header.count("date") == 1 and header[0] == "date"
+
+    loaded = store.load("X")
+    assert list(loaded.columns) == train_models.FEATURES
+    assert list(loaded.index.strftime("%Y-%m-%d")) == list(frame.index.strftime("%Y-%m-%d"))
+
+
+def test_training_reads_merged_snapshots(tmp_path, monkeypatch):
+    store = FeatureSnapshotStore(str(tmp_path))
+    store.submit("X", _features("2026-01-05", 10))
+    store.submit("X", _features("2026-01-12", 10, offset=100.0))
+    store.flush()
+    monkeypatch.setattr(train_models, "feature_store", store)
+
+    dates, matrix = train_models.history_matrix("X", source="snapshots")
+    assert len(dates) == 15 and dates.dtype == np.dtype("datetime64[D]")
+    assert str(dates[0]) == "2026-01-05" and str(dates[-1]) == "2026-01-23"
+    # 重疊的交易日以較新的快照為準
+    assert matrix[5, 0] == 100.0 and matrix.dtype == np.float32
@@ -0,0 +1,18 @@
+import pandas as pd
+import pytest
+
+from py.history_format import parse_history_args
+
+
+def test_dates_are_validated():
+    fmt, limit, cursor = parse_history_args({"start_date": "2020-01-01", "end_date": "2026-10-10", "cursor": "2024-05-01"})
+    assert (fmt, limit, cursor) == ("records", None, pd.Timestamp("2024-05-01"))
+    # 沒有日期時直接向上游查詢，不需要檢查
+    assert parse_history_args({}) == ("records", None, None)
+
+
+@pytest.mark.parametrize("name", ["start_date", "end_date", "cursor"])
+def test_malformed_dates_are_rejected(name):
+    args = {"start_date": "2020-01-01", "end_date": "2026-10-10", name: "garbage"}
+    with pytest.raises(ValueError, match=name):
+        parse_history_args(args)
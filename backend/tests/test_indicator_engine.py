@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from py.indicator_engine import INDICATOR_COLUMNS, IndicatorEngine, IndicatorState
+from py.indicators import compute_indicators
+
+
+class _Store:
+    # IndicatorEngine 只用到日線資料庫的 directory
+    def __init__(self, directory):
+        self.directory = directory
+
+
+def _bars(n=200, seed=0, start="2020-01-01"):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    index = pd.bdate_range(start, periods=n, tz="America/New_York")
+    return pd.DataFrame({
+        "high": close * (1 + rng.uniform(0, 0.02, n)),
+        "low": close * (1 - rng.uniform(0, 0.02, n)),
+        "close": close,
+    }, index=index)
+
+
+def _expected(bars):
+    values = compute_indicators(bars["high"].to_numpy(), bars["low"].to_numpy(), bars["close"].to_numpy())
+    return pd.DataFrame(values, index=bars.index)[INDICATOR_COLUMNS]
+
+
+def _assert_same(actual, bars):
+    pd.testing.assert_frame_equal(actual.astype(float), _expected(bars), check_freq=False, rtol=1e-9, atol=1e-9)
+
+
+def test_streaming_state_matches_batch_kernels():
+    bars = _bars()
+    state = IndicatorState()
+    rows = [state.update(h, l, c) for h, l, c in zip(bars["high"], bars["low"], bars["close"])]
+    _assert_same(pd.DataFrame(rows, columns=INDICATOR_COLUMNS, index=bars.index), bars)
+
+
+def test_resumes_within_the_same_window(tmp_path):
+    bars = _bars()
+    engine = IndicatorEngine(_Store(str(tmp_path)))
+    engine.compute("X", bars.iloc[:150])
+    result = engine.compute("X", bars)
+    _assert_same(result, bars)
+    state, frame = engine._load("X")
+    assert state.count == len(bars) and len(frame) == len(bars)
+
+
+def test_moving_window_resumes_from_the_anchored_state(tmp_path):
+    # 查詢區間每天往後移動：狀態固定在第一次的原點，只計算新收盤的K棒，結果等於從原點開始計算再取出區間
+    bars = _bars(300)
+    engine = IndicatorEngine(_Store(str(tmp_path)))
+    engine.compute("X", bars.iloc[:200])
+    for end in range(201, 206):
+        window = bars.iloc[end - 140:end]
+        result = engine.compute("X", window)
+        pd.testing.assert_frame_equal(result.astype(float), _expected(bars.iloc[:end]).iloc[end - 140:],
+                                      check_freq=False, rtol=1e-9, atol=1e-9)
+    state, _ = engine._load("X")
+    assert state.count == 205
+
+    # 重新啟動後從磁碟上的狀態接續
+    restarted = IndicatorEngine(_Store(str(tmp_path)))
+    restarted.compute("X", bars.iloc[70:210])
+    assert restarted._load("X")[0].count == 210
+
+
+def test_saved_frame_is_bounded(tmp_path):
+    bars = _bars(300)
+    engine = IndicatorEngine(_Store(str(tmp_path)), max_rows=100)
+    engine.compute("X", bars.iloc[:250])
+    engine.compute("X", bars.iloc[220:300])
+    state, frame = engine._load("X")
+    assert state.count == 300 and len(frame) == 100
+
+
+def test_window_before_the_saved_frame_recomputes(tmp_path):
+    bars = _bars(300)
+    engine = IndicatorEngine(_Store(str(tmp_path)))
+    engine.compute("X", bars.iloc[100:])
+    _assert_same(engine.compute("X", bars), bars)
+
+
+def test_recomputes_when_bars_were_readjusted(tmp_path):
+    bars = _bars()
+    engine = IndicatorEngine(_Store(str(tmp_path)))
+    engine.compute("X", bars.iloc[:150])
+    adjusted = bars.copy()
+    adjusted[["high", "low", "close"]] /= 2  # 分割後上游重新還原的價格
+    _assert_same(engine.compute("X", adjusted), adjusted)
+
+
+def test_other_process_updates_are_picked_up(tmp_path):
+    bars = _bars()
+    first = IndicatorEngine(_Store(str(tmp_path)))
+    second = IndicatorEngine(_Store(str(tmp_path)))
+    first.compute("X", bars.iloc[:150])
+    second.compute("X", bars.iloc[:150])
+    first.compute("X", bars)
+    state, frame = second._load("X")
+    assert state.count == len(bars) and frame.index[-1] == bars.index[-1]
+
+
+@pytest.mark.parametrize("n", [0, 5])
+def test_short_input(tmp_path, n):
+    bars = _bars(n)
+    result = IndicatorEngine(_Store(str(tmp_path))).compute("X", bars)
+    assert list(result.columns) == INDICATOR_COLUMNS and len(result) == n
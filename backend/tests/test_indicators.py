@@ -0,0 +1,77 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from py.indicator_engine import INDICATOR_COLUMNS
+from py.indicators import add_indicators_batch, compute_indicators
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "original data")
+# original data/ 的 CSV 是以 TA-Lib 計算指標後存下的，可以直接當作 TA-Lib 的參考輸出
+REFERENCE_CSVS = sorted(glob.glob(os.path.join(DATA_DIR, "*", "*_history*.csv")))
+
+
+def _random_bars(n_symbols, n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_symbols, n_bars)), axis=1))
+    high = close * (1 + rng.uniform(0, 0.02, close.shape))
+    low = close * (1 - rng.uniform(0, 0.02, close.shape))
+    return high, low, close
+
+
+def _assert_same(actual, expected):
+    actual, expected = np.asarray(actual, dtype=np.float64), np.asarray(expected, dtype=np.float64)
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.skipif(not REFERENCE_CSVS, reason="original data/ 沒有 CSV")
+@pytest.mark.parametrize("path", REFERENCE_CSVS, ids=os.path.basename)
+def test_matches_talib_reference_csv(path):
+    frame = pd.read_csv(path)
+    actual = add_indicators_batch({"x": frame[["open", "high", "low", "close", "volume"]].copy()})["x"]
+    for column in INDICATOR_COLUMNS:
+        _assert_same(actual[column], frame[column])
+
+
+def test_batch_matches_one_symbol_at_a_time():
+    high, low, close = _random_bars(5, 400)
+    batch = compute_indicators(high, low, close)
+    for i in range(len(close)):
+        single = compute_indicators(high[i], low[i], close[i])
+        for column in INDICATOR_COLUMNS:
+            _assert_same(batch[column][i], single[column])
+
+
+def test_short_series_is_all_nan():
+    high, low, close = _random_bars(2, 20)
+    result = compute_indicators(high, low, close)
+    assert np.isnan(result["macd"]).all()
+    assert not np.isnan(result["MOM"][:, 10:]).any()
+
+
+def test_add_indicators_batch_keeps_columns_and_index():
+    high, low, close = _random_bars(3, 120)
+    index = pd.bdate_range("2024-01-01", periods=120)
+    frames = {f"S{i}": pd.DataFrame({"high": high[i], "low": low[i], "close": close[i]}, index=index) for i in range(3)}
+    frames["short"] = frames["S0"].iloc[:60]
+    result = add_indicators_batch(frames)
+    for symbol, frame in frames.items():
+        assert list(result[symbol].columns) == ["high", "low", "close"] + INDICATOR_COLUMNS
+        assert result[symbol].index.equals(frame.index)
+
+
+def test_matches_talib():
+    abstract = pytest.importorskip("talib.abstract")
+    high, low, close = _random_bars(3, 600)
+    actual = compute_indicators(high, low, close)
+    for i in range(len(close)):
+        data = pd.DataFrame({"open": close[i], "high": high[i], "low": low[i], "close": close[i], "volume": 1.0})
+        expected = pd.concat([abstract.Function(name)(data) for name in ("MACD", "STOCH")], axis=1)
+        expected["RSI"] = abstract.Function("RSI")(data)
+        expected["MOM"] = abstract.Function("MOM")(data)
+        for column in INDICATOR_COLUMNS:
+            _assert_same(actual[column][i], expected[column])
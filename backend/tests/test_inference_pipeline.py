@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from py.inference_batcher import MicroBatcher
+from py.inference_pipeline import InferencePipeline
+from py.model_registry import ModelSnapshot
+from py.scaling import MinMaxScaler
+
+
+FEATURES = ["open", "close", "target"]
+
+
+class _Model:
+    # 輸出視窗最後一列的第一個特徵乘上 factor
+    def __init__(self, factor, time_steps=30):
+        self.factor = factor
+        self.input_shape = (None, time_steps, len(FEATURES) - 1)
+
+    def predict(self, x, verbose=0):
+        return x[:, -1, :1] * self.factor
+
+
+class _Registry:
+    def __init__(self, snapshot):
+        self.current = snapshot
+
+    def snapshot(self, name):
+        return self.current
+
+
+def _frame(n=60):
+    values = np.arange(n, dtype=float)
+    return pd.DataFrame({"open": values, "close": values, "target": values})
+
+
+def _pipeline(registry, batcher):
+    return InferencePipeline({1: "m"}, {"m": batcher}, registry, FEATURES, lambda symbol: _frame(), target="target")
+
+
+def test_hot_swap_after_submit_uses_the_submitted_snapshot():
+    old = ModelSnapshot(_Model(1.0), MinMaxScaler(FEATURES).fit(_frame().to_numpy()), "m-v1", None)
+    # 新版本的模型與目標欄位的範圍都不同，混用任何一個都會得到不同的預測
+    new = ModelSnapshot(_Model(2.0), MinMaxScaler(FEATURES).fit(_frame().to_numpy() * [1, 1, 10]), "m-v2", None)
+    registry = _Registry(old)
+    # 佇列取模型時已經換成新版本
+    batcher = MicroBatcher(lambda: new.model, max_wait_ms=50)
+    pipeline = _pipeline(registry, batcher)
+
+    prepared = pipeline.prepare("X")
+    future = pipeline.submit([prepared], 1, pipeline.snapshot(1))
+    registry.current = new
+    (prediction,) = future.result()
+    # 舊模型與舊正規化參數：視窗最後一列(第 54 列)的 open 原封不動地反正規化回來
+    assert np.allclose(prediction, [54.0])
+
+
+def test_requests_for_different_models_are_not_mixed():
+    batcher = MicroBatcher(lambda: None, max_wait_ms=50)
+    window = np.ones((1, 30, 2), dtype=np.float32)
+    first = batcher.submit(window, _Model(1.0))
+    second = batcher.submit(window, _Model(3.0))
+    assert first.result()[0, 0] == 1.0 and second.result()[0, 0] == 3.0
+
+
+def test_window_length_comes_from_the_model():
+    # 超參數搜尋選出 45 天視窗的模型
+    snapshot = ModelSnapshot(_Model(1.0, time_steps=45), MinMaxScaler(FEATURES).fit(_frame().to_numpy()), "m-v1", None)
+    pipeline = _pipeline(_Registry(snapshot), MicroBatcher(lambda: None))
+    assert pipeline.window_rows() == 50
+
+    prepared = pipeline.prepare("X")
+    window, _ = pipeline.inputs(prepared, snapshot)
+    assert window.shape == (1, 45, 2)
+    (prediction,) = pipeline.submit([prepared], 1).result()
+    assert np.allclose(prediction, [54.0])
@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+import pytest
+
+keras = pytest.importorskip("keras")
+pytest.importorskip("tensorflow")
+
+from py.export_lite import check_parity, export  # noqa: E402
+from py.lite_model import LiteModel  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    # 與服務模型相同的輸入形狀(30 天 x 9 個特徵)，只是層數與單元數較小
+    keras.utils.set_random_seed(0)
+    path = str(tmp_path_factory.mktemp("models") / "model.keras")
+    model = keras.Sequential([keras.Input((30, 9)), keras.layers.LSTM(16), keras.layers.Dense(5)])
+    model.save(path)
+    lite_path, error = export(path)
+    return model, lite_path, error
+
+
+def test_export_writes_tflite_next_to_keras(exported):
+    model, lite_path, error = exported
+    assert lite_path.endswith("model.tflite") and os.path.exists(lite_path)
+    assert not os.path.exists(lite_path + ".tmp")
+    assert error <= 1e-4
+
+
+@pytest.mark.parametrize("batch", [1, 3, 8, 50, 130])
+def test_lite_predictions_match_keras(exported, batch):
+    model, lite_path, _ = exported
+    lite = LiteModel(lite_path)
+    assert lite.input_shape == model.input_shape
+    x = np.random.default_rng(batch).random((batch, 30, 9), dtype=np.float32)
+    actual = lite.predict(x)
+    assert actual.shape == (batch, 5)
+    np.testing.assert_allclose(actual, model.predict(x, verbose=0), atol=1e-4)
+
+
+def test_check_parity_reports_max_error(exported):
+    model, lite_path, _ = exported
+    assert check_parity(model, LiteModel(lite_path)) <= 1e-4
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+
+from py import model_registry
+from py.scaling import MinMaxScaler, save_scaler
+
+
+class _Model:
+    input_shape = (None, 2)
+
+    def predict(self, x, verbose=0):
+        return x
+
+
+class _Registry(model_registry.ModelRegistry):
+    # 以文字檔代替模型檔，內容為 bad 時模擬損毀的檔案
+    def __init__(self):
+        super().__init__()
+        self.loads = []
+
+    def _load(self, path):
+        self.loads.append(path)
+        with open(path, encoding="utf-8") as f:
+            if f.read() == "bad":
+                raise ValueError("corrupt")
+        return _Model()
+
+
+def _touch(path, seconds):
+    os.utime(path, (seconds, seconds))
+
+
+def _scaler(maximum):
+    return MinMaxScaler(["a", "b"]).fit(np.array([[0.0, 0.0], [maximum, maximum]]))
+
+
+def test_scaler_update_reloads_the_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "SERVING_BACKEND", "keras")
+    path = str(tmp_path / "model.keras")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("good")
+    _touch(path, 1_000_000)
+    save_scaler(_scaler(1.0), path)
+
+    registry = _Registry()
+    registry.register("m", path)
+    before = registry.fingerprint("m")
+    registry.check_for_updates()
+    assert len(registry.loads) == 1
+
+    # 只重新產生正規化參數檔，模型檔不變
+    save_scaler(_scaler(2.0), path)
+    _touch(path[:-len(".keras")] + ".scaler.json", 2_000_000)
+    registry.check_for_updates()
+    assert len(registry.loads) == 2
+    assert registry.scaler("m").data_max_.tolist() == [2.0, 2.0]
+    assert registry.fingerprint("m") != before
+
+
+def test_failed_model_is_not_retried_until_it_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "SERVING_BACKEND", "keras")
+    path = str(tmp_path / "model.keras")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("bad")
+    _touch(path, 1_000_000)
+
+    registry = _Registry()
+    registry.register("m", path)
+    for _ in range(3):
+        registry.check_for_updates()
+    assert len(registry.loads) == 1 and not registry.ready()
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("good")
+    _touch(path, 2_000_000)
+    registry.check_for_updates()
+    assert len(registry.loads) == 2 and registry.ready()
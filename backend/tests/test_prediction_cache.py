@@ -0,0 +1,32 @@
+import pandas as pd
+
+from py.prediction_cache import PredictionCache
+
+
+def _key(day, mtime=1.0, horizon=5):
+    return ("TSLA", pd.Timestamp(day, tz="America/New_York"), ("/models/model_2.keras", mtime, None), horizon)
+
+
+def test_workers_share_results_through_disk(tmp_path):
+    # 兩個 worker 各自的快取，只有第一個執行預先計算
+    leader, other = PredictionCache(directory=str(tmp_path)), PredictionCache(directory=str(tmp_path))
+    leader.put(_key("2026-10-16"), [1.0, 2.0])
+
+    assert other.get(_key("2026-10-16")) == [1.0, 2.0]
+    assert other.get(_key("2026-10-16")) == [1.0, 2.0]
+    assert other.stats()["disk_hits"] == 1 and other.stats()["hits"] == 1
+
+
+def test_disk_result_for_another_key_is_ignored(tmp_path):
+    leader, other = PredictionCache(directory=str(tmp_path)), PredictionCache(directory=str(tmp_path))
+    leader.put(_key("2026-10-16"), [1.0])
+    # 新K棒收盤或模型更新後，磁碟上的舊結果不再使用
+    assert other.get(_key("2026-10-19")) is None
+    assert other.get(_key("2026-10-16", mtime=2.0)) is None
+    assert other.get(_key("2026-10-16", horizon=1)) is None
+
+
+def test_memory_only_without_directory():
+    cache = PredictionCache()
+    cache.put(_key("2026-10-16"), [1.0])
+    assert cache.get(_key("2026-10-16")) == [1.0] and cache.get(_key("2026-10-19")) is None
@@ -0,0 +1,43 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from py.market_calendar import is_trading_day, last_close, next_close
+from py.scheduler import PrecomputeScheduler
+
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def test_us_holidays():
+    assert not is_trading_day("US", date(2026, 11, 26))  # 感恩節
+    assert not is_trading_day("US", date(2026, 4, 3))    # 耶穌受難日
+    assert not is_trading_day("US", date(2026, 7, 3))    # 獨立紀念日落在週六，提前到週五
+    assert is_trading_day("US", date(2021, 12, 31))      # 2022 元旦落在週六，不提前休市
+    assert is_trading_day("US", date(2026, 11, 27))
+
+
+def test_closes_skip_holidays():
+    # 感恩節當天晚上，最近一次收盤是前一天，下一次收盤是隔天
+    now = datetime(2026, 11, 26, 20, 0, tzinfo=NEW_YORK)
+    assert last_close("US", now).date() == date(2026, 11, 25)
+    assert next_close("TSLA", now).date() == date(2026, 11, 27)
+
+
+def test_holiday_does_not_trigger_a_run():
+    runs = []
+    scheduler = PrecomputeScheduler(["TSLA"], runs.append)
+    scheduler.run_pending(datetime(2026, 11, 25, 20, 0, tzinfo=NEW_YORK))
+    scheduler.run_pending(datetime(2026, 11, 26, 20, 0, tzinfo=NEW_YORK))
+    assert runs == [["TSLA"]]
+
+
+def test_only_the_lock_holder_runs(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    first = PrecomputeScheduler(["TSLA"], print, lock_path=path)
+    second = PrecomputeScheduler(["TSLA"], print, lock_path=path)
+    assert first.is_leader()
+    assert not second.is_leader()
+
+    # 持有者結束後由下一個重試的排程接手
+    first._lock_file.close()
+    assert second.is_leader()
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from py.windowing import _create_dataset_loop, create_dataset, last_window
+
+
+@pytest.mark.parametrize("future_days", [1, 5])
+@pytest.mark.parametrize("rows", [36, 300, 2520])
+def test_create_dataset_matches_loop(rows, future_days):
+    data = np.random.default_rng(rows).random((rows, 10))
+    X_loop, y_loop = _create_dataset_loop(data, 30, future_days)
+    X_view, y_view = create_dataset(data, 30, future_days)
+    assert X_view.shape == X_loop.shape and y_view.shape == y_loop.shape
+    np.testing.assert_array_equal(X_view, X_loop)
+    np.testing.assert_array_equal(y_view, y_loop)
+
+
+def test_create_dataset_is_a_view():
+    data = np.random.default_rng(0).random((200, 10))
+    X, y = create_dataset(data, 30, 5)
+    assert np.shares_memory(X, data) and np.shares_memory(y, data)
+
+
+def test_create_dataset_too_short():
+    X, y = create_dataset(np.zeros((20, 10)), 30, 5)
+    assert X.shape == (0, 30, 9) and y.shape == (0, 5)
+
+
+@pytest.mark.parametrize("future_days", [1, 5])
+def test_last_window_matches_loop(future_days):
+    data = np.random.default_rng(1).random((120, 10))
+    X_loop, _ = _create_dataset_loop(data, 30, future_days)
+    np.testing.assert_array_equal(last_window(data, 30, future_days), X_loop[-1:])
+
+
+def test_last_window_too_short():
+    with pytest.raises(ValueError):
+        last_window(np.zeros((30, 10)), 30, 5)
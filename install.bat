@@ -4,12 +4,16 @@ pip install yfinance
 pip install TA-Lib
 py -3.10 -m pip install TA_Lib-0.4.28-cp310-cp310-win_amd64.whl
 pip install tensorflow
+pip install ai-edge-litert
 pip install flask
+pip install starlette uvicorn
 pip install numpy
 pip install pandas
+pip install pyarrow
 pip install matplotlib
 pip install scikit-learn
 pip install keras
+pip install pytest
 npm install concurrently
 echo The packages installation is complete.
 pause